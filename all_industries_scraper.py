@@ -1,24 +1,193 @@
-import requests
-from bs4 import BeautifulSoup
 import json
-import csv
-import pandas as pd
 import time
 import logging
 import re
-from urllib.parse import urljoin
+import asyncio
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
 import os
+import hashlib
+
+from page_cache import PageCache
+from record_sink import RecordSink, FLAT_METADATA_FIELDS, flatten_records, iter_flat_records, write_flat_csv, write_nested_json
+from job_ledger import JobLedger
+from availability_index import AvailabilityIndex
+from naics_discovery import NaicsDiscovery, code_matches, naics_level
+from page_archive import PageArchive, read_archive_record
+from columnar_store import write_columnar_store
+from industry_cube import build_cube
+from incremental_refresh import RefreshState
+from compact_rows import RecordTable, intern_schema, unique_columns, json_default
+from run_metrics import RunMetrics, profiled
+from run_stats import RunStats, format_bytes
+from fetch_control import RateBudget, CircuitBreaker, RETRYABLE_STATUSES, THROTTLE_STATUSES, parse_retry_after, backoff_delay
+from table_parsers import get_table_parser, utf8_body
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Header words that mark a column as numeric
+NUMERIC_INDICATORS = [
+    'revenue', 'profit', 'gdp', 'export', 'import', 'balance', 'growth',
+    'percentage', '%', 'million', 'employer', 'business', 'establishment',
+    'micro', 'small', 'medium', 'large', 'total', 'average', 'quartile'
+]
+NUMERIC_HEADER = re.compile('|'.join(re.escape(indicator) for indicator in NUMERIC_INDICATORS))
+NUMERIC_HINT = re.compile(r'[\d$%,.]')
+NON_NUMERIC_CHARS = re.compile(r'[^\d.-]')
+LETTERS = re.compile(r'[^\W\d_]')
+TABLE_TAG = re.compile(rb'<table', re.IGNORECASE)
+TABLE_BOUNDARY = re.compile(rb'<(/?)table\b[^>]*>', re.IGNORECASE)
+SCRIPT_SPAN = re.compile(rb'<script\b.*?</script>', re.IGNORECASE | re.DOTALL)
+COMMENT_SPAN = re.compile(rb'<!--.*?-->', re.DOTALL)
+
+# Rows sampled per column when inferring a table schema
+COLUMN_SAMPLE_SIZE = 25
+
+# Bump whenever extraction logic changes, so outputs of older extractors can be found
+EXTRACTOR_VERSION = 1
+
+def table_regions(content):
+    """Yield the markup of every outermost table, nested tables included (to the end if left open)"""
+    depth = 0
+    start = 0
+    for match in TABLE_BOUNDARY.finditer(content):
+        if not match.group(1):
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield content[start:match.end()]
+    if depth:
+        yield content[start:]
+
+def table_fingerprint(content):
+    """Hash the table markup the parser reads, so mirrored pages match whatever their navigation says"""
+    digest = hashlib.sha1()
+    for table in table_regions(COMMENT_SPAN.sub(b'', SCRIPT_SPAN.sub(b'', content))):
+        digest.update(table)
+    return digest.hexdigest()
+
+def count_stale_endpoints(index):
+    """Count endpoint outputs in a sink index written by an older extractor version"""
+    return sum(
+        1
+        for industry in index.values()
+        for endpoint_info in industry['endpoints'].values()
+        if endpoint_info.get('extractor_version') != EXTRACTOR_VERSION
+    )
+
+# Per-process state of reextract workers
+worker_scraper = None
+worker_archive = None
+
+def init_reextract_worker(archive_file, parser_backend):
+    """Give a reextract worker process its own scraper and archive handle"""
+    global worker_scraper, worker_archive
+    # Duplicates are resolved in the parent, in scrape order
+    worker_scraper = AllIndustriesScraper(parser_backend=parser_backend, dedup=False)
+    worker_archive = open(archive_file, 'rb')
+
+def reextract_page(task):
+    """Extract one archived page; returns (industry_name, endpoint_info or None, error)"""
+    endpoint_name, offset, length = task
+    headers, content = read_archive_record(worker_archive, offset, length)
+    
+    industry_data = {'endpoints': {}}
+    error = None
+    try:
+        worker_scraper.add_endpoint_data(industry_data, endpoint_name, headers['WARC-Target-URI'], content)
+    except Exception as e:
+        error = f"extraction failed: {e}"
+    return headers['X-Industry-Name'], industry_data['endpoints'].get(endpoint_name), error
+
+async def iter_async(items):
+    """Wrap a plain iterable as an async iterator"""
+    for item in items:
+        yield item
+
 class AllIndustriesScraper:
-    def __init__(self):
-        self.base_url = "https://ised-isde.canada.ca/app/ixb/cis"
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(self, base_url="https://ised-isde.canada.ca/app/ixb/cis", requests_per_second=5.0, max_in_flight=10, cache=None, parser_backend='auto', sink=None, ledger=None,
+                 connect_timeout=10, read_timeout=30, max_retries=3, backoff_base=1.0, max_retry_after=120.0, availability=None, archive=None, metrics=None, dedup=True, state_dir='.'):
+        self.base_url = base_url.rstrip('/')
+        
+        # requests is only imported once a page is fetched, so offline commands start fast
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        self.session = None
+        
+        # Adaptive fetch budget (ceilings), applied per host
+        self.requests_per_second = requests_per_second
+        self.max_in_flight = max_in_flight
+        self.rate_budgets = {}
+        
+        # Every request gets explicit timeouts and jittered retries
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retries = 0
+        
+        # A Retry-After longer than this fails the request instead of stalling the whole host
+        self.max_retry_after = max_retry_after
+        
+        # Optional PageCache; network_requests counts pages that were not served from it
+        self.cache = cache
+        self.network_requests = 0
+        
+        # Pages a discovery crawl already fetched, by URL, taken by the scrape instead of requesting them again
+        self.prefetched_pages = {}
+        
+        # Table-only HTML parser (lxml fast path, BeautifulSoup fallback)
+        self.table_parser = get_table_parser(parser_backend)
+        
+        # Numeric/text column flags, cached by header signature across pages
+        self.column_types = {}
+        
+        # Optional RecordSink; when set, records are streamed to disk instead of kept in memory
+        self.sink = sink
+        
+        # Optional JobLedger tracking each (naics_code, endpoint) task; its done
+        # tasks point into the sink's record stream, so it needs a sink
+        if ledger and not sink:
+            raise ValueError("A job ledger requires a record sink")
+        self.ledger = ledger
+        
+        # Optional AvailabilityIndex used to skip pages known to be empty;
+        # wasted_requests counts fetched pages that turned out to have no data
+        self.availability = availability
+        self.wasted_requests = 0
+        
+        # Optional PageArchive keeping every fetched page for offline re-extraction
+        self.archive = archive
+        
+        # Directory for the batch progress and in-memory batch data files
+        self.state_dir = state_dir
+        
+        # (endpoint, table fingerprint) -> (first naics_code, its tables_count or None if it had no data);
+        # later pages with the same tables are stored as aliases of that code without being parsed
+        self.dedup = dedup
+        self.table_fingerprints = {}
+        self.duplicate_pages = 0
+        if sink:
+            for naics_code, industry in sink.index.items():
+                for endpoint_name, endpoint_info in industry['endpoints'].items():
+                    if 'fingerprint' in endpoint_info and 'alias_of' not in endpoint_info:
+                        self.table_fingerprints.setdefault((endpoint_name, endpoint_info['fingerprint']), (naics_code, endpoint_info['tables_count']))
+        
+        # Per-stage timers and counters, shared with the sink so flatten/write are timed too
+        self.metrics = metrics or RunMetrics()
+        if sink is not None and sink.metrics is None:
+            sink.metrics = self.metrics
+        
+        # Report aggregates kept up to date as industries finish, starting from what the sink already holds
+        self.stats = RunStats.from_index(sink.index) if sink else RunStats()
         
         # All endpoints to try
         self.endpoints = {
@@ -29,10 +198,15 @@ class AllIndustriesScraper:
             'trade': 'trade-commerce'
         }
         
-        # Complete list of all NAICS codes
+        # One circuit breaker per endpoint, so a failing endpoint is not hammered
+        self.circuit_breakers = {name: CircuitBreaker(name) for name in self.endpoints}
+        
+        # Complete list of all NAICS codes, and an optional naics_code -> bool filter on what is scraped
         self.all_naics_codes = self.get_all_naics_codes()
+        self.code_filter = None
         
-    def get_all_naics_codes(self):
+    @staticmethod
+    def get_all_naics_codes():
         """Return complete dictionary of all available NAICS codes"""
         return {
             # 2-digit sectors
@@ -198,48 +372,240 @@ class AllIndustriesScraper:
             "31111": "Animal food manufacturing"
         }
     
-    def get_page(self, url):
-        """Get webpage with error handling"""
-        try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
-        except requests.RequestException as e:
-            logger.debug(f"Could not access {url}: {e}")
-            return None
-    
-    def clean_number(self, text):
-        """Clean and convert text to number"""
-        if not text or text == '':
-            return 0
-        
-        # Handle percentage signs
-        if '%' in text:
-            cleaned = re.sub(r'[^\d.-]', '', text)
+    def get_session(self):
+        """Return the keep-alive requests session, creating it on first use"""
+        if self.session is None:
+            import requests
+            
+            self.session = requests.Session()
+            self.session.headers.update(self.headers)
+        return self.session
+
+    def take_prefetched(self, url):
+        """Return (content, None) of a page the discovery crawl already fetched, or None"""
+        page = self.prefetched_pages.pop(url, None)
+        if page is not None:
+            self.metrics.inc('pages_total', source='discovery')
+            self.stats.add_page()
+        return page
+    
+    def drop_prefetched(self, naics_codes):
+        """Forget discovery pages of codes whose scrape is over (or was not planned)"""
+        for naics_code in naics_codes:
+            for endpoint_name in self.endpoints:
+                self.prefetched_pages.pop(self.endpoint_url(endpoint_name, naics_code), None)
+    
+    def fetch_result(self, url, endpoint_name=None):
+        """Get raw page content and an error message (None on success or for a missing page)"""
+        page = self.take_prefetched(url)
+        if page is not None:
+            return page
+        
+        if self.cache:
+            content = self.cache.cached_body(url)
+            if content is not None:
+                self.metrics.inc('pages_total', source='cache')
+                self.stats.add_page()
+                return content, None
+            if self.cache.offline:
+                return None, "not in offline cache"
+        
+        breaker = self.circuit_breakers.get(endpoint_name)
+        if breaker and not breaker.allow_request():
+            return None, "circuit open"
+        
+        import requests
+        
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        budget = self.get_rate_budget(url)
+        
+        for attempt in range(self.max_retries + 1):
+            time.sleep(budget.reserve_slot())
+            self.network_requests += 1
+            try:
+                response = self.get_session().get(url, headers=headers, timeout=(self.connect_timeout, self.read_timeout))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                outcome, retry_after, error = 'retry', None, str(e)
+            except requests.RequestException as e:
+                outcome, retry_after, error = 'fail', None, str(e)
+            else:
+                outcome, retry_after = self.classify_response(response.status_code, response.headers, budget, breaker)
+                error = f"HTTP {response.status_code}"
+                
+                if outcome == 'ok':
+                    self.count_download(response.content)
+                    content = utf8_body(response.content, response.headers.get('Content-Type'))
+                    if self.cache:
+                        self.cache.store(url, content, response.headers)
+                    return content, None
+                if outcome == 'not_modified':
+                    self.metrics.inc('pages_total', source='revalidated')
+                    self.stats.add_page()
+                    return self.cache.revalidated(url, response.headers), None
+                if outcome == 'missing':
+                    return None, None
+            
+            # Every failed attempt counts, so concurrent retries trip the breaker quickly
+            if breaker:
+                breaker.record_failure()
+            if outcome == 'fail' or attempt == self.max_retries or (breaker and breaker.state == 'open'):
+                break
+            
+            # Retry-After pauses the whole host through the budget; otherwise back off with jitter
+            self.retries += 1
+            logger.debug(f"Retrying {url} after: {error}")
+            if not retry_after:
+                time.sleep(backoff_delay(attempt, self.backoff_base))
+        
+        logger.debug(f"Could not access {url}: {error}")
+        return None, error
+    
+    def count_download(self, content):
+        """Count a page downloaded from the network"""
+        self.metrics.inc('pages_total', source='network')
+        self.metrics.inc('bytes_downloaded_total', len(content))
+        self.stats.add_page()
+        self.stats.add_download(len(content))
+    
+    def classify_response(self, status, headers, budget, breaker):
+        """Classify a response as ok/not_modified/missing/retry/fail and feed the fetch controllers"""
+        if status in RETRYABLE_STATUSES:
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if status in THROTTLE_STATUSES or retry_after:
+                budget.on_throttle(min(retry_after, self.max_retry_after) if retry_after else None)
+            if retry_after and retry_after > self.max_retry_after:
+                logger.warning(f"⏳ Retry-After of {retry_after:.0f}s exceeds the {self.max_retry_after:.0f}s limit; not retrying")
+                return 'fail', None
+            return 'retry', retry_after
+        
+        if status >= 400 and status != 404:
+            return 'fail', None
+        
+        # Any answer the endpoint meant to give shows host and endpoint are healthy
+        budget.on_success()
+        if breaker:
+            breaker.record_success()
+        
+        if status == 404:
+            return 'missing', None
+        if status == 304:
+            return ('not_modified' if self.cache else 'fail'), None
+        return 'ok', None
+
+    def get_rate_budget(self, url):
+        """Return the shared rate budget for the host serving url"""
+        host = urlparse(url).netloc
+        if host not in self.rate_budgets:
+            self.rate_budgets[host] = RateBudget(self.requests_per_second, self.max_in_flight)
+        return self.rate_budgets[host]
+
+    def create_async_client(self):
+        """Create a pooled keep-alive aiohttp client matching the requests session"""
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.max_in_flight,
+            keepalive_timeout=30
+        )
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=timeout)
+
+    async def fetch_result_async(self, client, url, endpoint_name=None):
+        """Get raw page content and an error message concurrently, from the cache when possible"""
+        import aiohttp
+
+        page = self.take_prefetched(url)
+        if page is not None:
+            return page
+
+        if self.cache:
+            content = self.cache.cached_body(url)
+            if content is not None:
+                self.metrics.inc('pages_total', source='cache')
+                self.stats.add_page()
+                return content, None
+            if self.cache.offline:
+                return None, "not in offline cache"
+
+        breaker = self.circuit_breakers.get(endpoint_name)
+        if breaker and not breaker.allow_request():
+            return None, "circuit open"
+
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        budget = self.get_rate_budget(url)
+
+        for attempt in range(self.max_retries + 1):
+            async with budget:
+                self.network_requests += 1
+                try:
+                    async with client.get(url, headers=headers) as response:
+                        outcome, retry_after = self.classify_response(response.status, response.headers, budget, breaker)
+                        error = f"HTTP {response.status}"
+                        
+                        if outcome == 'ok':
+                            content = await response.read()
+                            self.count_download(content)
+                            content = utf8_body(content, response.headers.get('Content-Type'))
+                            if self.cache:
+                                self.cache.store(url, content, response.headers)
+                            return content, None
+                        if outcome == 'not_modified':
+                            self.metrics.inc('pages_total', source='revalidated')
+                            self.stats.add_page()
+                            return self.cache.revalidated(url, response.headers), None
+                        if outcome == 'missing':
+                            return None, None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    outcome, retry_after, error = 'retry', None, str(e) or type(e).__name__
+
+            # Every failed attempt counts, so concurrent retries trip the breaker quickly
+            if breaker:
+                breaker.record_failure()
+            if outcome == 'fail' or attempt == self.max_retries or (breaker and breaker.state == 'open'):
+                break
+
+            # Retry-After pauses the whole host through the budget; otherwise back off with jitter
+            self.retries += 1
+            logger.debug(f"Retrying {url} after: {error}")
+            if not retry_after:
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base))
+
+        logger.debug(f"Could not access {url}: {error}")
+        return None, error
+
+    def convert_column(self, values):
+        """Convert a whole numeric column at once (float if any value is fractional or a percentage); empty cells become 0, unparseable ones such as a suppressed 'X' keep their text"""
+        numbers = []
+        as_float = False
+        for text in values:
+            if not text:
+                numbers.append(0)
+                continue
+            cleaned = NON_NUMERIC_CHARS.sub('', text)
             try:
-                return float(cleaned)
+                numbers.append(float(cleaned))
             except ValueError:
-                return 0
+                numbers.append(None)
+                continue
+            as_float = as_float or '.' in cleaned or '%' in text
         
-        # Handle currency and large numbers
-        cleaned = re.sub(r'[^\d.-]', '', text)
-        try:
-            return float(cleaned) if '.' in cleaned else int(float(cleaned)) if cleaned else 0
-        except ValueError:
-            return 0
+        return [
+            text if number is None else float(number) if as_float else int(number)
+            for text, number in zip(values, numbers)
+        ]
     
     def extract_table_data(self, table, endpoint_type=""):
-        """Extract data from any table"""
-        data = []
+        """Extract data from any table, given as rows of cell texts, into a compact RecordTable"""
+        data = RecordTable()
         
         # Get headers
         headers = []
-        header_rows = table.find_all('tr')[:2]
+        header_rows = table[:2]
         
         for header_row in header_rows:
             row_headers = []
-            for th in header_row.find_all(['th', 'td']):
-                header_text = th.get_text(strip=True)
+            for header_text in header_row:
                 if header_text and header_text not in ['', ' ']:
                     row_headers.append(header_text)
             
@@ -252,101 +618,222 @@ class AllIndustriesScraper:
         
         # Get data rows
         start_row = 1 if len(header_rows) == 1 else 2
-        rows = table.find_all('tr')[start_row:]
-        
-        for row in rows:
-            cells = row.find_all(['td', 'th'])
-            if len(cells) >= len(headers):
-                row_data = {'endpoint': endpoint_type}
-                
-                for i, cell in enumerate(cells[:len(headers)]):
-                    cell_text = cell.get_text(strip=True)
-                    header = headers[i]
-                    
-                    # Smart type detection
-                    if self.is_numeric_column(header, cell_text):
-                        row_data[header] = self.clean_number(cell_text)
-                    else:
-                        row_data[header] = cell_text
-                
-                # Only add meaningful data
-                if self.has_meaningful_data(row_data, headers):
-                    data.append(row_data)
+        rows = [cells[:len(headers)] for cells in table[start_row:] if len(cells) >= len(headers)]
+        if not rows:
+            return data
         
-        return data
-    
-    def is_numeric_column(self, header, text):
-        """Determine if column should be numeric"""
-        numeric_indicators = [
-            'revenue', 'profit', 'gdp', 'export', 'import', 'balance', 'growth',
-            'percentage', '%', 'million', 'employer', 'business', 'establishment',
-            'micro', 'small', 'medium', 'large', 'total', 'average', 'quartile'
+        # Type each column once, then convert it in a single pass
+        column_types = self.get_column_types(headers, rows)
+        columns = [
+            self.convert_column(values) if is_numeric else list(values)
+            for values, is_numeric in zip(zip(*rows), column_types)
         ]
         
-        header_lower = header.lower()
-        text_lower = text.lower()
-        
-        if any(indicator in header_lower for indicator in numeric_indicators):
-            return True
+        # Repeated headers collapse to one column, keeping the last value as a dict would
+        column_names, positions = unique_columns(headers)
+        if len(column_names) < len(headers):
+            columns = [columns[i] for i in positions]
+        schema = intern_schema(endpoint_type, column_names)
         
-        if re.search(r'[\d$%,.]', text) and 'province' not in header_lower and 'territory' not in header_lower:
-            return True
+        # Only add meaningful data
+        rows = [row for row in zip(*columns) if self.has_meaningful_data(row)]
+        if rows:
+            data.extend(schema, rows)
         
-        return False
+        return data
     
-    def has_meaningful_data(self, row_data, headers):
-        """Check if row has meaningful data"""
-        meaningful_keys = [k for k in row_data.keys() if k != 'endpoint']
+    def get_column_types(self, headers, rows):
+        """Return cached numeric/text flags for a header signature, inferring them on first sight"""
+        signature = tuple(headers)
+        column_types = self.column_types.get(signature)
+        if column_types is None:
+            column_types, conclusive = self.infer_column_types(headers, rows[:COLUMN_SAMPLE_SIZE])
+            if conclusive:
+                self.column_types[signature] = column_types
+        return column_types
+    
+    def infer_column_types(self, headers, sample_rows):
+        """Decide per column whether it is numeric from its header and a sample of values"""
+        column_types = []
+        conclusive = True
+        
+        for i, header in enumerate(headers):
+            header_lower = header.lower()
+            if NUMERIC_HEADER.search(header_lower):
+                column_types.append(True)
+                continue
+            
+            if 'province' in header_lower or 'territory' in header_lower:
+                column_types.append(False)
+                continue
+            
+            # Strict majority vote over non-empty sample values
+            values = [row[i] for row in sample_rows if row[i]]
+            numeric_votes = sum(1 for text in values if self.looks_numeric(text))
+            column_types.append(numeric_votes * 2 > len(values))
+            
+            if not values:
+                conclusive = False
         
-        if not meaningful_keys:
+        return column_types, conclusive
+    
+    def looks_numeric(self, text):
+        """Check if a single value reads as a number (digits and number punctuation, no words)"""
+        return bool(NUMERIC_HINT.search(text)) and not LETTERS.search(text)
+    
+    def has_meaningful_data(self, row):
+        """Check if a row (values in schema column order) has meaningful data"""
+        if not row:
             return False
         
-        first_column = headers[0] if headers else None
-        if first_column and first_column in row_data:
-            identifier = row_data[first_column]
-            if identifier and identifier not in ['', 'Total', 'Canada', 'All']:
-                return True
+        identifier = row[0]
+        if identifier and identifier not in ['', 'Total', 'Canada', 'All']:
+            return True
         
         return False
     
-    def scrape_single_industry(self, naics_code, industry_name):
-        """Scrape all available data for a single industry"""
-        logger.info(f"🔍 Scraping {industry_name} ({naics_code})")
-        
-        industry_data = {
+    def new_industry_data(self, naics_code, industry_name):
+        """Create the empty result structure for one industry"""
+        return {
             'metadata': {
                 'naics_code': naics_code,
                 'industry_name': industry_name,
-                'scrape_date': pd.Timestamp.now().isoformat()
+                'scrape_date': datetime.now().isoformat()
             },
             'endpoints': {}
         }
+    
+    def add_endpoint_data(self, industry_data, endpoint_name, url, content):
+        """Extract all tables from an endpoint page into industry_data"""
+        if not content:
+            return
         
-        # Try all endpoints
-        for endpoint_name, endpoint_path in self.endpoints.items():
-            url = f"{self.base_url}/{endpoint_path}/{naics_code}"
-            
-            soup = self.get_page(url)
-            if soup:
-                # Extract all tables
-                tables = soup.find_all('table')
-                table_data = []
-                
-                for i, table in enumerate(tables):
-                    extracted_data = self.extract_table_data(table, endpoint_name)
-                    if extracted_data:
-                        table_data.extend(extracted_data)
-                
-                if table_data:
-                    industry_data['endpoints'][endpoint_name] = {
-                        'url': url,
-                        'tables_count': len(tables),
-                        'data': table_data,
-                        'records_count': len(table_data)
-                    }
-                    logger.info(f"  ✅ {endpoint_name}: {len(table_data)} records")
-            
-            time.sleep(0.5)  # Small delay between endpoints
+        # Cheap probe: most empty endpoint pages have no table at all, so skip parsing them
+        if not TABLE_TAG.search(content):
+            return
+        
+        # Tables already seen under another code are referenced, not parsed again
+        fingerprint = table_fingerprint(content)
+        if self.dedup:
+            naics_code = industry_data['metadata']['naics_code']
+            duplicate = self.duplicate_of(naics_code, endpoint_name, fingerprint)
+            if duplicate:
+                self.add_alias(industry_data, endpoint_name, url, fingerprint, *duplicate)
+                return
+        
+        # Extract all tables
+        with self.metrics.timer('parse'):
+            tables = self.table_parser.parse_tables(content)
+        table_data = RecordTable()
+        
+        with self.metrics.timer('extract'):
+            for i, table in enumerate(tables):
+                extracted_data = self.extract_table_data(table, endpoint_name)
+                if extracted_data:
+                    table_data.append_table(extracted_data)
+        
+        if table_data:
+            industry_data['endpoints'][endpoint_name] = {
+                'url': url,
+                'tables_count': len(tables),
+                'data': table_data,
+                'records_count': len(table_data),
+                'extractor_version': EXTRACTOR_VERSION,
+                'fingerprint': fingerprint
+            }
+            self.metrics.inc('records_total', len(table_data), endpoint=endpoint_name)
+            logger.info(f"  ✅ {endpoint_name}: {len(table_data)} records")
+        
+        if self.dedup:
+            self.table_fingerprints[(endpoint_name, fingerprint)] = (naics_code, len(tables) if table_data else None)
+    
+    def duplicate_of(self, naics_code, endpoint_name, fingerprint):
+        """Return (naics_code, tables_count or None) of another code whose endpoint had the same tables"""
+        duplicate = self.table_fingerprints.get((endpoint_name, fingerprint))
+        if duplicate and duplicate[0] != naics_code:
+            self.duplicate_pages += 1
+            self.metrics.inc('duplicate_pages_total', endpoint=endpoint_name)
+            return duplicate
+        return None
+    
+    def add_alias(self, industry_data, endpoint_name, url, fingerprint, canonical_code, tables_count):
+        """Reference another code's identical records instead of storing them again"""
+        if tables_count is None:
+            return
+        
+        industry_data['endpoints'][endpoint_name] = {
+            'url': url,
+            'tables_count': tables_count,
+            'data': RecordTable(),
+            'records_count': 0,
+            'extractor_version': EXTRACTOR_VERSION,
+            'fingerprint': fingerprint,
+            'alias_of': canonical_code
+        }
+        logger.info(f"  🪞 {endpoint_name}: same tables as {canonical_code}")
+    
+    def process_endpoint(self, industry_data, endpoint_name, url, content, error, started_at):
+        """Extract a fetched endpoint page, stream its records and record the task outcome"""
+        if error is None:
+            if self.archive and content:
+                self.archive.append(industry_data['metadata']['naics_code'], endpoint_name, url, industry_data['metadata']['industry_name'], content, fetched_at=started_at)
+            try:
+                self.add_endpoint_data(industry_data, endpoint_name, url, content)
+            except Exception as e:
+                error = f"extraction failed: {e}"
+                logger.error(f"❌ Error extracting {url}: {e}")
+        
+        self.record_endpoint(industry_data, endpoint_name, error, started_at)
+    
+    def record_endpoint(self, industry_data, endpoint_name, error, started_at, fetched=True):
+        """Stream an extracted endpoint's records and record the task outcome (fetched=False for archived pages, which are neither requests nor availability checks)"""
+        endpoint_info = industry_data['endpoints'].get(endpoint_name)
+        if error is None and fetched:
+            if not endpoint_info:
+                self.wasted_requests += 1
+            if self.availability:
+                self.availability.record(endpoint_name, industry_data['metadata']['naics_code'], bool(endpoint_info))
+        
+        result = None
+        if endpoint_info and self.sink:
+            result = self.sink.write_endpoint(industry_data['metadata'], endpoint_name, endpoint_info)
+        
+        if self.ledger:
+            status = 'failed' if error else 'done' if endpoint_info else 'empty'
+            self.ledger.record(
+                industry_data['metadata']['naics_code'], endpoint_name, status, started_at,
+                scrape_date=industry_data['metadata']['scrape_date'],
+                records_count=endpoint_info['records_count'] if endpoint_info else 0,
+                result=result, error=error
+            )
+    
+    def commit_industry(self):
+        """Make an industry's streamed records durable before the ledger marks its tasks done"""
+        if self.archive:
+            self.archive.sync()
+        if self.sink:
+            self.sink.sync()
+        if self.ledger:
+            self.ledger.commit()
+        if self.availability:
+            self.availability.commit()
+    
+    def select_endpoints(self, naics_code, endpoint_names):
+        """Drop endpoints the availability index knows to be empty for a code, recording them as skipped"""
+        if not self.availability:
+            return list(endpoint_names)
+        
+        selected = []
+        for endpoint_name in endpoint_names:
+            if self.availability.should_fetch(endpoint_name, naics_code):
+                selected.append(endpoint_name)
+            elif self.ledger:
+                self.ledger.record(naics_code, endpoint_name, 'skipped', time.time())
+        return selected
+    
+    def finish_industry(self, industry_data):
+        """Log the industry outcome and return it only if any endpoint had data"""
+        self.commit_industry()
         
         success = len(industry_data['endpoints']) > 0
         if success:
@@ -357,182 +844,845 @@ class AllIndustriesScraper:
             
         return industry_data if success else None
     
-    def scrape_all_industries(self, batch_size=10, start_from=0):
-        """Scrape all industries in batches with progress tracking"""
-        all_codes = list(self.all_naics_codes.items())[start_from:]
-        total_codes = len(all_codes)
+    def scrape_single_industry(self, naics_code, industry_name, endpoint_names=None):
+        """Scrape all available data for a single industry (or only the given endpoints)"""
+        logger.info(f"🔍 Scraping {industry_name} ({naics_code})")
+        
+        industry_data = self.new_industry_data(naics_code, industry_name)
+        
+        # Try all endpoints that may have data
+        if endpoint_names is None:
+            endpoint_names = list(self.endpoints)
+        for endpoint_name in self.select_endpoints(naics_code, endpoint_names):
+            url = self.endpoint_url(endpoint_name, naics_code)
+            
+            started_at = time.time()
+            requests_before = self.network_requests
+            with self.metrics.timer('fetch'):
+                content, error = self.fetch_result(url, endpoint_name)
+            self.process_endpoint(industry_data, endpoint_name, url, content, error, started_at)
+            
+            if self.network_requests > requests_before:
+                self.pause(0.5)  # Small delay between endpoints
+        
+        return self.finish_industry(industry_data)
+    
+    def pause(self, seconds):
+        """Sleep between requests, counting the time as its own stage"""
+        with self.metrics.timer('sleep'):
+            time.sleep(seconds)
+    
+    def endpoint_url(self, endpoint_name, naics_code):
+        """Return the CIS page URL of an endpoint for a NAICS code"""
+        return f"{self.base_url}/{self.endpoints[endpoint_name]}/{naics_code}"
+    
+    async def fetch_timed_async(self, client, url, endpoint_name):
+        """Fetch a page and return (started_at, content, error)"""
+        started_at = time.time()
+        with self.metrics.timer('fetch'):
+            content, error = await self.fetch_result_async(client, url, endpoint_name)
+        return started_at, content, error
+    
+    async def scrape_batch_async(self, client, batch):
+        """Scrape every (naics_code, endpoint) page of a batch concurrently"""
+        batch = [
+            (naics_code, industry_name, self.select_endpoints(naics_code, endpoint_names))
+            for naics_code, industry_name, endpoint_names in batch
+        ]
+        requests_to_make = [
+            (naics_code, endpoint_name, self.endpoint_url(endpoint_name, naics_code))
+            for naics_code, industry_name, endpoint_names in batch
+            for endpoint_name in endpoint_names
+        ]
+        
+        pages = await asyncio.gather(
+            *(self.fetch_timed_async(client, url, endpoint_name) for _, endpoint_name, url in requests_to_make),
+            return_exceptions=True
+        )
+        pages_by_request = {
+            (naics_code, endpoint_name): (url, page)
+            for (naics_code, endpoint_name, url), page in zip(requests_to_make, pages)
+        }
+        
+        # Assemble in code and endpoint order so output matches the sequential path
+        results = []
+        for naics_code, industry_name, endpoint_names in batch:
+            logger.info(f"🔍 Scraping {industry_name} ({naics_code})")
+            try:
+                industry_data = self.new_industry_data(naics_code, industry_name)
+                
+                for endpoint_name in endpoint_names:
+                    url, page = pages_by_request[(naics_code, endpoint_name)]
+                    if isinstance(page, Exception):
+                        raise page
+                    started_at, content, error = page
+                    self.process_endpoint(industry_data, endpoint_name, url, content, error, started_at)
+                
+                results.append((naics_code, self.finish_industry(industry_data)))
+            except Exception as e:
+                results.append((naics_code, e))
+        
+        return results
+    
+    def plan_tasks(self, start_from=0, retry_failed=False, naics_codes=None, first_position=0):
+        """Return [(naics_code, industry_name, endpoint_names)] still to scrape"""
+        if naics_codes is None:
+            naics_codes = self.all_naics_codes
+        if self.code_filter:
+            naics_codes = {naics_code: industry_name for naics_code, industry_name in naics_codes.items() if self.code_filter(naics_code)}
+        
+        if not self.ledger:
+            return [
+                (naics_code, industry_name, list(self.endpoints))
+                for naics_code, industry_name in list(naics_codes.items())[start_from:]
+            ]
+        
+        # The ledger knows exactly which (code, endpoint) pairs are left
+        self.ledger.add_tasks(naics_codes, self.endpoints, first_position)
+        pending = self.ledger.pending_tasks(('failed',) if retry_failed else ('pending',))
+        return [
+            (naics_code, industry_name, pending[naics_code])
+            for naics_code, industry_name in naics_codes.items()
+            if naics_code in pending
+        ]
+    
+    def plan_discovered_batch(self, chunk, first_position, retry_failed):
+        """Register a chunk of newly discovered codes and return its tasks"""
+        self.all_naics_codes.update(chunk)
+        return self.plan_tasks(retry_failed=retry_failed, naics_codes=chunk, first_position=first_position)
+    
+    def discovered_batches(self, discovery, batch_size, start_from=0, retry_failed=False):
+        """Yield task batches as the discovery crawl finds codes, so scraping starts before it ends"""
+        self.all_naics_codes = {}
+        codes = discovery.crawl()
+        for naics_code, _ in itertools.islice(codes, start_from):
+            self.drop_prefetched([naics_code])
+        position = start_from
+        
+        while True:
+            chunk = dict(itertools.islice(codes, batch_size))
+            if not chunk:
+                return
+            
+            tasks = self.plan_discovered_batch(chunk, position, retry_failed)
+            position += len(chunk)
+            if tasks:
+                yield tasks
+            self.drop_prefetched(chunk)
+    
+    async def discovered_batches_async(self, client, discovery, batch_size, start_from=0, retry_failed=False):
+        """Yield task batches from a discovery crawl running alongside the scrape"""
+        self.all_naics_codes = {}
+        queue = asyncio.Queue()
+        crawler = asyncio.create_task(discovery.crawl_async(client, queue))
+        position = start_from
+        skipped = 0
+        
+        try:
+            finished = False
+            while not finished:
+                # Wait for the next code, then take whatever else is already queued
+                chunk = {}
+                item = await queue.get()
+                while True:
+                    if item is None:
+                        finished = True
+                        break
+                    if skipped < start_from:
+                        skipped += 1
+                        self.drop_prefetched([item[0]])
+                    else:
+                        chunk[item[0]] = item[1]
+                    if len(chunk) >= batch_size or queue.empty():
+                        break
+                    item = queue.get_nowait()
+                
+                if chunk:
+                    tasks = self.plan_discovered_batch(chunk, position, retry_failed)
+                    position += len(chunk)
+                    if tasks:
+                        yield tasks
+                    self.drop_prefetched(chunk)
+            
+            # Surface crawl errors
+            await crawler
+        finally:
+            if not crawler.done():
+                crawler.cancel()
+    
+    def scrape_all_industries(self, batch_size=10, start_from=0, concurrent=False, retry_failed=False, discovery=None):
+        """Scrape all industries in batches with progress tracking (codes from a NaicsDiscovery crawl if given)"""
+        if concurrent:
+            return asyncio.run(self.scrape_all_industries_async(batch_size, start_from, retry_failed, discovery))
         
-        logger.info(f"🚀 Starting comprehensive scrape of {total_codes} industries")
+        if discovery:
+            batches = self.discovered_batches(discovery, batch_size, start_from, retry_failed)
+            total_codes = 0
+            logger.info(f"🚀 Starting comprehensive scrape of industries as they are discovered")
+        else:
+            all_tasks = self.plan_tasks(start_from, retry_failed)
+            batches = (all_tasks[i:i+batch_size] for i in range(0, len(all_tasks), batch_size))
+            total_codes = len(all_tasks)
+            logger.info(f"🚀 Starting comprehensive scrape of {total_codes} industries")
         logger.info(f"📦 Processing in batches of {batch_size}")
         
         all_data = {}
-        processed = 0
-        successful = 0
-        
-        # Create progress file
-        progress_file = "scraping_progress.json"
+        progress = {'processed': 0, 'successful': 0, 'total_codes': total_codes}
         
-        for i in range(0, len(all_codes), batch_size):
-            batch = all_codes[i:i+batch_size]
+        batch_requests_before = None
+        for batch_number, batch in enumerate(batches, 1):
+            # Longer delay between batches
+            if batch_requests_before is not None and self.network_requests > batch_requests_before:
+                logger.info("⏳ Resting 10 seconds before next batch...")
+                self.pause(10)
             
-            logger.info(f"\n📦 BATCH {i//batch_size + 1}: Processing codes {processed + start_from + 1}-{min(processed + start_from + batch_size, len(self.all_naics_codes))}")
+            if discovery:
+                progress['total_codes'] = len(self.all_naics_codes) - start_from
+            self.log_batch_start(batch_number, progress, start_from, batch_size)
             
-            for naics_code, industry_name in batch:
+            batch_requests_before = self.network_requests
+            for naics_code, industry_name, endpoint_names in batch:
+                requests_before = self.network_requests
                 try:
-                    industry_data = self.scrape_single_industry(naics_code, industry_name)
-                    
-                    if industry_data:
-                        all_data[naics_code] = industry_data
-                        successful += 1
-                    
-                    processed += 1
-                    
-                    # Progress update
-                    if processed % 5 == 0:
-                        success_rate = (successful / processed) * 100
-                        logger.info(f"📈 Progress: {processed}/{total_codes} ({success_rate:.1f}% success rate)")
-                    
-                    time.sleep(1)  # Respectful delay between industries
-                    
+                    industry_data = self.scrape_single_industry(naics_code, industry_name, endpoint_names)
                 except Exception as e:
-                    logger.error(f"❌ Error processing {naics_code}: {e}")
-                    processed += 1
-                    continue
-            
-            # Save progress after each batch
-            self.save_progress(all_data, f"batch_{i//batch_size + 1}_data.json")
-            
-            # Save progress metadata
-            progress = {
-                'processed': processed + start_from,
-                'successful': successful,
-                'total': len(self.all_naics_codes),
-                'last_batch': i//batch_size + 1,
-                'success_rate': (successful / processed) * 100 if processed > 0 else 0
-            }
+                    industry_data = e
+                
+                self.record_industry_result(all_data, progress, naics_code, industry_data)
+                
+                if not isinstance(industry_data, Exception) and self.network_requests > requests_before:
+                    self.pause(1)  # Respectful delay between industries
             
-            with open(progress_file, 'w') as f:
-                json.dump(progress, f, indent=2)
+            self.save_batch_progress(all_data, progress, batch_number, start_from)
+        
+        return self.finish_scrape(all_data, progress)
+    
+    async def scrape_all_industries_async(self, batch_size=10, start_from=0, retry_failed=False, discovery=None):
+        """Scrape all industries in concurrent batches paced by the rate budget instead of fixed sleeps"""
+        if discovery:
+            total_codes = 0
+            logger.info(f"🚀 Starting concurrent scrape of industries as they are discovered")
+        else:
+            all_tasks = self.plan_tasks(start_from, retry_failed)
+            total_codes = len(all_tasks)
+            logger.info(f"🚀 Starting concurrent scrape of {total_codes} industries")
+        logger.info(f"📦 Processing in batches of {batch_size} ({self.max_in_flight} in flight, {self.requests_per_second} req/s)")
+        
+        all_data = {}
+        progress = {'processed': 0, 'successful': 0, 'total_codes': total_codes}
+        
+        async with self.create_async_client() as client:
+            if discovery:
+                batches = self.discovered_batches_async(client, discovery, batch_size, start_from, retry_failed)
+            else:
+                batches = iter_async(all_tasks[i:i+batch_size] for i in range(0, len(all_tasks), batch_size))
             
-            logger.info(f"💾 Batch {i//batch_size + 1} complete. Saved progress.")
+            batch_number = 0
+            async for batch in batches:
+                batch_number += 1
+                if discovery:
+                    progress['total_codes'] = len(self.all_naics_codes) - start_from
+                self.log_batch_start(batch_number, progress, start_from, batch_size)
+                
+                for naics_code, industry_data in await self.scrape_batch_async(client, batch):
+                    self.record_industry_result(all_data, progress, naics_code, industry_data)
+                
+                self.save_batch_progress(all_data, progress, batch_number, start_from)
+        
+        return self.finish_scrape(all_data, progress)
+    
+    def reextract_archive(self, processes=None, parser_backend='auto'):
+        """Re-run extraction over the newest archived copy of every page across a process pool, without the network"""
+        pages = self.archive.latest_entries()
+        tasks = [
+            (naics_code, endpoint_name, pages[naics_code][endpoint_name])
+            for naics_code in pages
+            for endpoint_name in sorted(pages[naics_code], key=list(self.endpoints).index)
+        ]
+        logger.info(f"♻️ Re-extracting {len(tasks)} archived pages of {len(pages)} industries with {processes or os.cpu_count()} processes")
+        
+        self.archive.sync()
+        with ProcessPoolExecutor(processes, initializer=init_reextract_worker, initargs=(self.archive.data_file, parser_backend)) as pool:
+            results = pool.map(
+                reextract_page,
+                [(endpoint_name, offset, length) for _, endpoint_name, (offset, length, _) in tasks],
+                chunksize=max(1, len(tasks) // ((processes or os.cpu_count()) * 4))
+            )
             
-            # Longer delay between batches
-            if i + batch_size < len(all_codes):
-                logger.info("⏳ Resting 10 seconds before next batch...")
-                time.sleep(10)
+            all_data = {}
+            progress = {'processed': 0, 'successful': 0, 'total_codes': len(pages)}
+            tasks_by_code = itertools.groupby(zip(tasks, results), key=lambda item: item[0][0])
+            for position, (naics_code, code_results) in enumerate(tasks_by_code):
+                code_results = list(code_results)
+                industry_name = code_results[0][1][0]
+                
+                # The data dates from when its pages were fetched
+                industry_data = self.new_industry_data(naics_code, industry_name)
+                fetched_at = max(fetched_at for (_, _, (_, _, fetched_at)), _ in code_results)
+                industry_data['metadata']['scrape_date'] = datetime.fromtimestamp(fetched_at).isoformat()
+                if self.ledger:
+                    self.ledger.add_tasks({naics_code: industry_name}, self.endpoints, position)
+                
+                for (_, endpoint_name, (_, _, fetched_at)), (_, endpoint_info, error) in code_results:
+                    self.stats.add_page()
+                    if endpoint_info:
+                        self.add_extracted_endpoint(industry_data, endpoint_name, endpoint_info)
+                    self.record_endpoint(industry_data, endpoint_name, error, fetched_at, fetched=False)
+                
+                self.commit_industry()
+                self.record_industry_result(all_data, progress, naics_code, industry_data if industry_data['endpoints'] else None)
+        
+        return self.finish_scrape(all_data, progress)
+    
+    def add_extracted_endpoint(self, industry_data, endpoint_name, endpoint_info):
+        """Add an endpoint extracted elsewhere, turning it into an alias if its tables were seen before"""
+        naics_code = industry_data['metadata']['naics_code']
+        fingerprint = endpoint_info['fingerprint']
+        if self.dedup:
+            duplicate = self.duplicate_of(naics_code, endpoint_name, fingerprint)
+            if duplicate:
+                self.add_alias(industry_data, endpoint_name, endpoint_info['url'], fingerprint, *duplicate)
+                return
+            self.table_fingerprints[(endpoint_name, fingerprint)] = (naics_code, endpoint_info['tables_count'])
+        industry_data['endpoints'][endpoint_name] = endpoint_info
+    
+    def finish_scrape(self, all_data, progress):
+        """Log the run outcome and return the scraped data (everything streamed so far when using a sink)"""
+        logger.info(f"\n🎉 COMPLETE: {progress['successful']}/{progress['processed']} industries successfully scraped")
+        
+        throttled_seconds = sum(budget.throttled_seconds for budget in self.rate_budgets.values())
+        open_circuits = [name for name, breaker in self.circuit_breakers.items() if breaker.state != 'closed']
+        logger.info(f"🔁 Retries: {self.retries}, throttled for {throttled_seconds:.1f}s" + (f", open circuits: {', '.join(open_circuits)}" if open_circuits else ""))
+        
+        availability = f", {self.availability.stats['skipped']} skipped as known-empty, {self.availability.stats['revalidated']} re-validated" if self.availability else ""
+        logger.info(f"🕳️ Wasted requests: {self.wasted_requests} pages without data{availability}")
+        if self.dedup:
+            logger.info(f"🪞 Duplicate pages: {self.duplicate_pages} stored as aliases without parsing")
+        
+        if self.ledger:
+            counts = self.ledger.status_counts()
+            logger.info(f"📒 Tasks: {counts['done']} done, {counts['empty']} empty, {counts['skipped']} skipped, {counts['failed']} failed, {counts['pending']} pending")
+        
+        self.publish_metrics(progress, force=True)
+        return self.sink.index if self.sink else all_data
+    
+    def publish_metrics(self, progress, force=False):
+        """Refresh scraper-level gauges and publish the metrics file"""
+        self.metrics.set('industries_processed', progress['processed'])
+        self.metrics.set('industries_successful', progress['successful'])
+        self.metrics.set('industries_planned', progress['total_codes'])
+        self.metrics.set('network_requests', self.network_requests)
+        self.metrics.set('retries', self.retries)
+        self.metrics.set('wasted_requests', self.wasted_requests)
+        self.metrics.set('duplicate_pages', self.duplicate_pages)
+        self.metrics.set('throttled_seconds', round(sum(budget.throttled_seconds for budget in self.rate_budgets.values()), 3))
+        pages_per_second, records_per_second = self.stats.rates()
+        self.metrics.set('pages_per_second', round(pages_per_second, 3))
+        self.metrics.set('records_per_second', round(records_per_second, 3))
+        eta = self.stats.eta_seconds(progress['processed'], progress['total_codes'])
+        if eta is not None:
+            self.metrics.set('eta_seconds', round(eta, 1))
+        for name, breaker in self.circuit_breakers.items():
+            self.metrics.set('circuit_open', int(breaker.state != 'closed'), endpoint=name)
+        self.metrics.publish(force)
+    
+    def log_batch_start(self, batch_number, progress, start_from, batch_size):
+        """Log the range of codes covered by a batch"""
+        first = progress['processed'] + start_from + 1
+        last = min(progress['processed'] + start_from + batch_size, start_from + progress['total_codes'])
+        logger.info(f"\n📦 BATCH {batch_number}: Processing codes {first}-{last}")
+    
+    def record_industry_result(self, all_data, progress, naics_code, industry_data):
+        """Count one industry outcome (data, None or exception) towards progress"""
+        if isinstance(industry_data, Exception):
+            logger.error(f"❌ Error processing {naics_code}: {industry_data}")
+        elif industry_data:
+            all_data[naics_code] = self.sink.index[naics_code] if self.sink else industry_data
+            self.stats.add_industry(naics_code, all_data[naics_code])
+            progress['successful'] += 1
+        
+        progress['processed'] += 1
+        self.publish_metrics(progress)
+        
+        # Progress update with throughput and ETA
+        if progress['processed'] % 5 == 0 or progress['processed'] == progress['total_codes']:
+            success_rate = (progress['successful'] / progress['processed']) * 100
+            logger.info(f"{self.stats.progress_line(progress['processed'], progress['total_codes'])} | {success_rate:.1f}% success rate")
+    
+    def save_batch_progress(self, all_data, progress, batch_number, start_from, progress_file="scraping_progress.json"):
+        """Save batch data and resume metadata after each batch"""
+        if self.sink:
+            self.sink.checkpoint()
+        else:
+            self.save_progress(all_data, os.path.join(self.state_dir, f"batch_{batch_number}_data.json"))
+        
+        processed = progress['processed']
+        progress_metadata = {
+            'processed': processed + start_from,
+            'successful': progress['successful'],
+            'total': len(self.all_naics_codes),
+            'last_batch': batch_number,
+            'success_rate': (progress['successful'] / processed) * 100 if processed > 0 else 0
+        }
         
-        logger.info(f"\n🎉 COMPLETE: {successful}/{processed} industries successfully scraped")
+        with open(os.path.join(self.state_dir, progress_file), 'w') as f:
+            json.dump(progress_metadata, f, indent=2)
         
-        return all_data
+        logger.info(f"💾 Batch {batch_number} complete. Saved progress.")
     
     def save_progress(self, data, filename):
         """Save progress data"""
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+            json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
     
-    def save_all_data(self, data, base_filename="all_canadian_industries"):
-        """Save comprehensive data with multiple formats"""
+    def save_all_data(self, data, base_filename="all_canadian_industries", parquet=False, columnar=False, changed_partitions=None, formats=('json', 'csv'), cube=False):
+        """Save comprehensive data with multiple formats (JSON/CSV as listed in formats, Parquet, the columnar store and the cube on request)"""
         logger.info(f"💾 Saving comprehensive dataset...")
         
-        # Full JSON
-        json_file = f"{base_filename}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
-        
-        # Flatten for CSV
-        flattened_data = []
-        
-        for naics_code, industry_data in data.items():
-            metadata = industry_data['metadata']
-            
-            for endpoint_name, endpoint_info in industry_data['endpoints'].items():
-                for record in endpoint_info['data']:
-                    flat_record = {
-                        'naics_code': metadata['naics_code'],
-                        'industry_name': metadata['industry_name'],
-                        'data_source': endpoint_name,
-                        'scrape_date': metadata['scrape_date']
-                    }
-                    flat_record.update(record)
-                    flattened_data.append(flat_record)
-        
-        # Save main CSV
-        if flattened_data:
+        if columnar:
+            self.save_columnar_store(data, base_filename, changed_partitions)
+        if cube:
+            self.save_cube(data, base_filename)
+        
+        if self.sink:
+            return self.save_streamed_data(base_filename, parquet, formats)
+        
+        # Same serializers as the streamed outputs, reading the records from memory
+        files = []
+        if 'json' in formats:
+            json_file = f"{base_filename}.json"
+            with self.metrics.timer('write'):
+                write_nested_json(json_file, data, lambda metadata, endpoint_name, endpoint_info: flatten_records(metadata, endpoint_name, endpoint_info['data']))
+            files.append(json_file)
+        
+        record_count = sum(endpoint_info['records_count'] for industry_data in data.values() for endpoint_info in industry_data['endpoints'].values())
+        if record_count and 'csv' in formats:
             csv_file = f"{base_filename}.csv"
-            df = pd.DataFrame(flattened_data)
-            df.to_csv(csv_file, index=False)
+            with self.metrics.timer('write'):
+                write_flat_csv(csv_file, lambda: iter_flat_records(data))
+            files.append(csv_file)
             
-            logger.info(f"📊 Saved {len(flattened_data)} total records")
-            logger.info(f"📁 Files: {json_file}, {csv_file}")
+            logger.info(f"📊 Saved {record_count} total records")
+            logger.info(f"📁 Files: {', '.join(files)}")
         
         # Create summary report
-        self.create_final_report(data)
+        self.create_final_report(self.report_stats(data))
         
-        return len(flattened_data) if flattened_data else 0
+        return record_count
     
-    def create_final_report(self, data):
-        """Create final comprehensive report"""
-        total_industries = len(data)
-        total_records = sum(
-            sum(ep['records_count'] for ep in industry['endpoints'].values())
-            for industry in data.values()
-        )
+    def save_columnar_store(self, data, base_filename, changed_partitions=None):
+        """Write the typed per-endpoint Parquet store next to the other outputs (only changed partitions, if given)"""
+        store_dir = f"{base_filename}_store"
+        if self.sink:
+            self.sink.checkpoint()
+            with open(self.sink.records_file, 'rb') as reader:
+                write_columnar_store(self.sink.index, lambda endpoint_info: self.sink.iter_endpoint_records(reader, endpoint_info), store_dir, partitions=changed_partitions)
+        else:
+            write_columnar_store(data, lambda endpoint_info: endpoint_info['data'], store_dir, partitions=changed_partitions)
+        logger.info(f"📁 Columnar store: {store_dir}/")
+    
+    def save_cube(self, data, base_filename):
+        """Write the province × NAICS × size-class cube next to the other outputs"""
+        cube_dir = f"{base_filename}_cube"
+        if self.sink:
+            self.sink.checkpoint()
+            with open(self.sink.records_file, 'rb') as reader:
+                build_cube(self.sink.index, lambda endpoint_info: self.sink.iter_endpoint_records(reader, endpoint_info), cube_dir)
+        else:
+            build_cube(data, lambda endpoint_info: endpoint_info['data'], cube_dir)
+        logger.info(f"📁 Cube: {cube_dir}/")
+    
+    def save_streamed_data(self, base_filename, parquet=False, formats=('json', 'csv')):
+        """Assemble the JSON/CSV (and optionally Parquet) outputs from the record stream"""
+        self.sink.checkpoint()
+        
+        files = []
+        if 'json' in formats:
+            json_file = f"{base_filename}.json"
+            with self.metrics.timer('write'):
+                self.sink.write_json(json_file)
+            files.append(json_file)
         
-        # Count by data source
-        endpoint_counts = {}
-        for industry in data.values():
-            for endpoint_name in industry['endpoints'].keys():
-                endpoint_counts[endpoint_name] = endpoint_counts.get(endpoint_name, 0) + 1
+        record_count = sum(ep['records_count'] for industry in self.sink.index.values() for ep in industry['endpoints'].values())
+        if self.sink.index:
+            if 'csv' in formats:
+                csv_file = f"{base_filename}.csv"
+                with self.metrics.timer('write'):
+                    record_count = self.sink.write_csv(csv_file)
+                files.append(csv_file)
+            
+            if parquet:
+                parquet_file = f"{base_filename}.parquet"
+                with self.metrics.timer('write'):
+                    self.sink.write_parquet(parquet_file)
+                files.append(parquet_file)
+            
+            logger.info(f"📊 Saved {record_count} total records")
+            logger.info(f"📁 Files: {', '.join(files)}")
         
+        # Report covers everything in the stream, including resumed runs
+        self.create_final_report(self.report_stats(self.sink.index))
+        
+        return record_count
+    
+    def report_stats(self, data):
+        """Return the running stats when they cover data, else aggregate data in one pass"""
+        if self.stats.industries.keys() == data.keys():
+            return self.stats
+        return RunStats.from_index(data)
+    
+    @staticmethod
+    def create_final_report(stats):
+        """Create final comprehensive report from RunStats aggregates"""
         print("\n" + "="*100)
         print("🇨🇦 COMPLETE CANADIAN INDUSTRY STATISTICS EXTRACTION REPORT")
         print("="*100)
         
         print(f"📊 SUMMARY:")
-        print(f"   🏭 Total Industries Scraped: {total_industries}")
-        print(f"   📝 Total Records Extracted: {total_records:,}")
-        print(f"   📅 Coverage: All available NAICS codes (2-digit to 5-digit)")
+        print(f"   🏭 Total Industries Scraped: {len(stats.industries)}")
+        print(f"   📝 Total Records Extracted: {stats.records:,}")
+        print(f"   🪞 Duplicate Pages Stored as Aliases: {stats.aliased_endpoints}")
+        if stats.pages:
+            pages_per_second, records_per_second = stats.rates()
+            print(f"   ⚡ This Run: {stats.pages:,} pages ({pages_per_second:.1f}/s), {stats.run_records:,} records ({records_per_second:.1f}/s), {format_bytes(stats.bytes_downloaded)} downloaded")
+        print(f"   📅 Coverage: All available NAICS codes (2-digit to 6-digit)")
         
         print(f"\n📈 DATA SOURCES:")
-        for endpoint, count in sorted(endpoint_counts.items()):
-            print(f"   📋 {endpoint.title()}: {count} industries")
+        for endpoint, count in sorted(stats.endpoint_industries.items()):
+            if count:
+                print(f"   📋 {endpoint.title()}: {count} industries ({stats.endpoint_records[endpoint]:,} records)")
         
-        print(f"\n🎯 TOP INDUSTRIES BY DATA VOLUME:")
-        industry_record_counts = []
-        for naics_code, industry in data.items():
-            record_count = sum(ep['records_count'] for ep in industry['endpoints'].values())
-            industry_record_counts.append((record_count, naics_code, industry['metadata']['industry_name']))
+        print(f"\n🌳 NAICS LEVELS:")
+        for level, count in sorted(stats.level_industries.items()):
+            if count:
+                print(f"   🔢 {level}-digit: {count} industries ({stats.level_records[level]:,} records)")
         
-        # Show top 10
-        for count, code, name in sorted(industry_record_counts, reverse=True)[:10]:
+        print(f"\n🎯 TOP INDUSTRIES BY DATA VOLUME:")
+        for count, code, name in stats.top_industries():
             print(f"   {code:>8} - {name[:60]:<60} ({count:,} records)")
         
+        if stats.pure_duplicates:
+            print(f"\n🪞 PURE DUPLICATES ({len(stats.pure_duplicates)} industries with no tables of their own):")
+            for code, canonical_codes in stats.pure_duplicates.items():
+                print(f"   {code:>8} - {stats.industry_names[code][:60]:<60} (same as {', '.join(canonical_codes)})")
+        
         print("="*100)
         print("🎉 EXTRACTION COMPLETE - All available Canadian industry data captured!")
         print("="*100)
 
-if __name__ == "__main__":
-    scraper = AllIndustriesScraper()
+
+def selected_codes(naics_codes, args):
+    """Filter {naics_code: industry_name} by the --sector/--level options"""
+    if not args.sector and not args.level:
+        return naics_codes
+    return {
+        naics_code: industry_name
+        for naics_code, industry_name in naics_codes.items()
+        if code_matches(naics_code, args.sector, args.level)
+    }
+
+def load_dataset_index(args):
+    """Return the sink index of a finished or interrupted run, or None"""
+    index_file = f"{args.output}.index.json"
+    if os.path.exists(index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    if os.path.exists(args.ledger):
+        ledger = JobLedger(args.ledger)
+        index = ledger.completed_index()
+        ledger.close()
+        return index
+    return None
+
+def output_options(args):
+    """Return save_all_data keyword arguments for the --format option"""
+    return {
+        'formats': [name for name in args.format if name in ('json', 'csv')],
+        'parquet': 'parquet' in args.format,
+        'columnar': 'columnar' in args.format,
+        'cube': 'cube' in args.format
+    }
+
+def run_scrape(args):
+    """scrape/resume: fetch (or re-extract) pages and write the outputs"""
+    fresh = args.command == 'scrape'
+    reextract = fresh and args.reextract
+    if reextract and args.no_archive:
+        raise SystemExit("--reextract needs the page archive")
+    if args.incremental and getattr(args, 'in_memory', False):
+        raise SystemExit("--incremental needs the record sink and ledger")
+    
+    cache = None
+    if not args.no_cache:
+        cache = PageCache(
+            args.cache_dir,
+            ttl=args.cache_ttl_days * 24 * 3600,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            offline=args.offline
+        )
     
-    # Check if we should resume from previous progress
-    if os.path.exists("scraping_progress.json"):
-        with open("scraping_progress.json", 'r') as f:
-            progress = json.load(f)
+    # scrape starts over; resume continues exactly where the ledger left off
+    ledger = None
+    sink = None
+    resumed_codes = {}
+    if not getattr(args, 'in_memory', False):
+        ledger = JobLedger(args.ledger)
+        if reextract:
+            # Re-extraction rewrites the record stream, so the ledger is rebuilt from the archive
+            stale = count_stale_endpoints(ledger.completed_index())
+            print(f"♻️ {stale} endpoint outputs were written by an older extractor")
+        if fresh:
+            ledger.reset()
+        else:
+            resumed_codes = ledger.known_codes()
         
-        resume = input(f"Resume from industry {progress['processed']}? (y/n): ").lower() == 'y'
-        start_from = progress['processed'] if resume else 0
-    else:
-        start_from = 0
+        completed = ledger.completed_index()
+        sink = RecordSink(args.output, resume=bool(completed), index=completed)
+        if completed:
+            print(f"♻️ Resuming: {len(completed)} industries already have records in the ledger")
+    
+    availability = None
+    if not args.no_skip:
+        availability = AvailabilityIndex(args.availability, revalidate_rate=args.revalidate_rate)
+    
+    archive = None
+    if not args.no_archive:
+        archive = PageArchive(args.archive_dir)
     
-    print(f"🚀 Starting comprehensive scrape of ALL Canadian industries")
-    print(f"📋 Total industries to process: {len(scraper.all_naics_codes)}")
+    scraper = AllIndustriesScraper(
+        requests_per_second=args.rps, max_in_flight=args.max_in_flight, cache=cache,
+        parser_backend=args.parser, sink=sink, ledger=ledger,
+        connect_timeout=args.connect_timeout, read_timeout=args.read_timeout, max_retries=args.max_retries, max_retry_after=args.max_retry_after,
+        availability=availability, archive=archive, metrics=RunMetrics(args.metrics_file), dedup=not args.no_dedup
+    )
+    if args.sector or args.level:
+        scraper.code_filter = lambda naics_code: code_matches(naics_code, args.sector, args.level)
+    if resumed_codes and not args.discover:
+        # Only the codes the interrupted run planned, whatever filters it used
+        scraper.all_naics_codes = resumed_codes
     
-    # Scrape all industries
-    all_data = scraper.scrape_all_industries(batch_size=5, start_from=start_from)
+    discovery = None
+    if args.discover:
+        discovery = NaicsDiscovery(scraper, args.naics_cache, refresh=args.rediscover)
     
-    if all_data:
-        # Save comprehensive dataset
-        record_count = scraper.save_all_data(all_data)
-        print(f"\n✅ SUCCESS: Scraped {len(all_data)} industries with {record_count:,} total records!")
+    with profiled(args.profile, args.trace_memory):
+        if reextract:
+            print(f"♻️ Re-extracting ALL archived Canadian industry pages (extractor version {EXTRACTOR_VERSION})")
+            all_data = scraper.reextract_archive(processes=args.processes, parser_backend=args.parser)
+        else:
+            print(f"🚀 Starting comprehensive scrape of ALL Canadian industries")
+            if discovery and not discovery.complete:
+                print(f"📋 Discovering industries from the {len(discovery.seed_sectors())} NAICS sectors while scraping")
+            else:
+                print(f"📋 Total industries to process: {len(selected_codes(discovery.codes() if discovery else scraper.all_naics_codes, args))}")
+            
+            # Scrape all industries
+            batch_size = args.batch_size or (25 if args.concurrent else 5)
+            all_data = scraper.scrape_all_industries(batch_size=batch_size, concurrent=args.concurrent, retry_failed=args.retry_failed, discovery=discovery)
+        
+        changed_partitions = None
+        if args.incremental:
+            # Compare against the previous dataset; scrape_date becomes the last change of each row.
+            # Pages that could not be fetched keep their previous rows in the outputs
+            refresh_state = RefreshState(args.refresh_state)
+            changed_partitions = refresh_state.apply(sink, ledger.refresh_tasks(), args.changelog or f"{args.output}.changelog.ndjson")
+            refresh_state.close()
+        
+        if args.incremental and not changed_partitions and os.path.exists(f"{args.output}.json"):
+            print(f"\n✅ No changes since the previous dataset; {args.output}.* left as they are")
+        elif all_data:
+            # Save comprehensive dataset
+            record_count = scraper.save_all_data(all_data, args.output, changed_partitions=changed_partitions, **output_options(args))
+            print(f"\n✅ SUCCESS: Scraped {len(all_data)} industries with {record_count:,} total records!")
+        else:
+            print("❌ No data was scraped.")
+    
+    # Include the output stages in the final metrics
+    scraper.metrics.publish(force=True)
+    
+    if sink:
+        sink.close()
+    if ledger:
+        ledger.close()
+    if availability:
+        availability.close()
+    if archive:
+        archive.close()
+    if cache:
+        cache.close()
+        print(f"🗄️ Page cache: {cache.stats['hits']} hits, {cache.stats['revalidated']} revalidated, {cache.stats['stored']} downloaded")
+
+def run_export(args):
+    """export: rebuild the outputs of a run from its record stream, without the network"""
+    index = load_dataset_index(args)
+    if not index:
+        raise SystemExit(f"❌ No records found for {args.output}")
+    
+    target = args.to or args.output
+    selected = selected_codes(index, args)
+    if target == args.output and len(selected) < len(index):
+        raise SystemExit("❌ Filtered exports need --to, so the dataset's own index is kept")
+    
+    source = RecordSink(args.output, resume=True, index=index)
+    if target == args.output:
+        sink = source
     else:
-        print("❌ No data was scraped.")
\ No newline at end of file
+        # Copy the selected industries; aliases of codes left out carry their records
+        sink = RecordSink(target)
+        with open(source.records_file, 'rb') as reader:
+            for naics_code in selected:
+                industry = index[naics_code]
+                for endpoint_name, endpoint_info in industry['endpoints'].items():
+                    stored = endpoint_info
+                    if endpoint_info.get('alias_of') and endpoint_info['alias_of'] not in selected:
+                        stored = index[endpoint_info['alias_of']]['endpoints'][endpoint_name]
+                        endpoint_info = {key: value for key, value in stored.items() if key != 'alias_of'}
+                    records = [
+                        {key: value for key, value in flat_record.items() if key not in FLAT_METADATA_FIELDS}
+                        for flat_record in source.iter_endpoint_records(reader, stored)
+                    ]
+                    sink.write_endpoint(industry['metadata'], endpoint_name, dict(endpoint_info, data=records))
+        source.stream.close()
+    
+    scraper = AllIndustriesScraper(sink=sink)
+    record_count = scraper.save_all_data(sink.index, target, **output_options(args))
+    print(f"\n✅ Exported {len(sink.index)} industries with {record_count:,} total records to {target}.*")
+    sink.close()
+
+def run_report(args):
+    """report: print the summary report of a run"""
+    index = load_dataset_index(args)
+    if not index:
+        raise SystemExit(f"❌ No records found for {args.output}")
+    AllIndustriesScraper.create_final_report(RunStats.from_index(selected_codes(index, args)))
+
+def run_score(args):
+    """score: composite risk scores and rate tiers of every industry × province × size-class cell"""
+    from industry_cube import IndustryCube
+    from risk_scoring import RiskScorer, load_weight_tables
+    
+    cube_dir = f"{args.output}_cube"
+    if args.rebuild_cube or not os.path.exists(cube_dir):
+        index = load_dataset_index(args)
+        if not index:
+            raise SystemExit(f"❌ No records found for {args.output}")
+        sink = RecordSink(args.output, resume=True, index=index)
+        AllIndustriesScraper(sink=sink).save_cube(sink.index, args.output)
+        sink.close()
+    
+    cube = IndustryCube(cube_dir)
+    started = time.time()
+    try:
+        tables = load_weight_tables(args.weights) if args.weights else {}
+        scores = RiskScorer(cube).score(**tables)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    logger.info(f"🧮 Scored {int(scores.scorer.present.sum()):,} cells in {(time.time() - started) * 1000:.1f} ms")
+    
+    target = args.to or f"{args.output}.risk_scores.csv"
+    naics_codes = selected_codes(dict(zip(cube.dims['codes'], cube.dims['industry_names'])), args)
+    count = scores.write_csv(target, naics_codes)
+    print(f"✅ Wrote {count:,} scored cells to {target}")
+    for tier, tier_count in scores.tier_counts(naics_codes).items():
+        print(f"   🏷️ {tier}: {tier_count:,} cells")
+
+def run_list_codes(args):
+    """list-codes: print the NAICS codes a scrape would cover"""
+    naics_codes = AllIndustriesScraper.get_all_naics_codes()
+    if args.discovered:
+        if not os.path.exists(args.naics_cache):
+            raise SystemExit(f"❌ No discovered hierarchy at {args.naics_cache}; run scrape --discover first")
+        with open(args.naics_cache, 'r', encoding='utf-8') as f:
+            naics_codes = {naics_code: entry['name'] for naics_code, entry in json.load(f)['codes'].items()}
+    
+    naics_codes = selected_codes(naics_codes, args)
+    if args.json:
+        print(json.dumps(naics_codes, indent=2, ensure_ascii=False))
+        return
+    for naics_code, industry_name in naics_codes.items():
+        print(f"{naics_code}\t{naics_level(naics_code)}\t{industry_name}")
+
+def build_parser():
+    """Return the command line parser with its scrape, resume, export, report, score and list-codes commands"""
+    parser = argparse.ArgumentParser(description="Scrape Canadian Industry Statistics for all NAICS codes")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    dataset = argparse.ArgumentParser(add_help=False)
+    dataset.add_argument('--output', default="all_canadian_industries", help="base filename of the outputs")
+    dataset.add_argument('--ledger', default="scrape_ledger.sqlite", help="job ledger used to resume interrupted runs")
+    
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--sector', action='append', default=None, help="only codes in this sector or below this code, e.g. 31-33 (repeatable)")
+    filters.add_argument('--level', action='append', type=int, default=None, choices=[2, 3, 4, 5, 6], help="only codes with this many digits (repeatable)")
+    
+    formats = argparse.ArgumentParser(add_help=False)
+    formats.add_argument('--format', nargs='+', choices=['json', 'csv', 'parquet', 'columnar', 'cube'], default=['json', 'csv'],
+                         help="outputs to write: nested JSON, flat CSV, flat Parquet, the typed per-endpoint Parquet store and/or the province × NAICS × size-class cube")
+    
+    fetching = argparse.ArgumentParser(add_help=False)
+    fetching.add_argument('--concurrent', action='store_true', help="fetch pages concurrently with asyncio instead of fixed sleeps")
+    fetching.add_argument('--max-in-flight', type=int, default=10, help="ceiling for adaptive concurrent requests per host")
+    fetching.add_argument('--rps', type=float, default=5.0, help="ceiling for adaptive requests per second per host")
+    fetching.add_argument('--batch-size', type=int, default=None, help="industries per progress checkpoint")
+    fetching.add_argument('--connect-timeout', type=float, default=10, help="seconds to wait for a connection")
+    fetching.add_argument('--read-timeout', type=float, default=30, help="seconds to wait for response data")
+    fetching.add_argument('--max-retries', type=int, default=3, help="retries for throttled, failed or timed out requests")
+    fetching.add_argument('--max-retry-after', type=float, default=120, help="longest Retry-After to honour; a longer one fails the request")
+    fetching.add_argument('--cache-dir', default="http_cache", help="directory of the on-disk page cache")
+    fetching.add_argument('--cache-ttl-days', type=float, default=30, help="serve cached pages without revalidation for this long")
+    fetching.add_argument('--cache-max-mb', type=float, default=512, help="evict least recently used pages beyond this size")
+    fetching.add_argument('--no-cache', action='store_true', help="always download pages")
+    fetching.add_argument('--offline', action='store_true', help="serve pages from the cache only, never the network")
+    fetching.add_argument('--parser', choices=['auto', 'lxml', 'bs4'], default='auto', help="HTML table parser backend")
+    fetching.add_argument('--retry-failed', action='store_true', help="only retry tasks that failed in earlier runs")
+    fetching.add_argument('--availability', default="endpoint_availability.sqlite", help="index of pages known to be empty, learned across runs")
+    fetching.add_argument('--revalidate-rate', type=float, default=0.05, help="share of known-empty pages fetched anyway to catch data coming back")
+    fetching.add_argument('--no-skip', action='store_true', help="request every page, ignoring the availability index")
+    fetching.add_argument('--discover', action='store_true', help="crawl the CIS pages for every NAICS code instead of using the built-in list")
+    fetching.add_argument('--naics-cache', default="naics_hierarchy.json", help="cached NAICS hierarchy from an earlier discovery crawl")
+    fetching.add_argument('--rediscover', action='store_true', help="crawl again even if the cached NAICS hierarchy is fresh")
+    fetching.add_argument('--archive-dir', default="page_archive", help="append-only archive of every fetched page")
+    fetching.add_argument('--no-archive', action='store_true', help="do not archive fetched pages")
+    fetching.add_argument('--no-dedup', action='store_true', help="store pages whose tables repeat another code's in full instead of as aliases")
+    fetching.add_argument('--incremental', action='store_true', help="diff the run against the previous dataset, log inserts/updates/deletes and rewrite only what changed")
+    fetching.add_argument('--refresh-state', default="refresh_state.sqlite", help="last known value and change date of every row, for --incremental")
+    fetching.add_argument('--changelog', default=None, help="NDJSON changelog appended by --incremental (default: <output>.changelog.ndjson)")
+    fetching.add_argument('--metrics-file', default=None, help="publish live stage timings and counters here (.json for JSON, otherwise Prometheus text)")
+    fetching.add_argument('--profile', default=None, help="run under cProfile and write the stats to this file")
+    fetching.add_argument('--trace-memory', action='store_true', help="trace allocations with tracemalloc and log the top sites")
+    
+    scrape = commands.add_parser('scrape', parents=[dataset, filters, formats, fetching], help="start a new run, discarding the ledger of the previous one")
+    scrape.add_argument('--in-memory', action='store_true', help="keep all records in memory instead of streaming them to disk (no resume)")
+    scrape.add_argument('--reextract', action='store_true', help="rebuild the outputs from the page archive with the current extractor, without the network")
+    scrape.add_argument('--processes', type=int, default=None, help="worker processes for --reextract (default: all CPU cores)")
+    
+    commands.add_parser('resume', parents=[dataset, filters, formats, fetching], help="continue an interrupted run where its ledger left off")
+    
+    export = commands.add_parser('export', parents=[dataset, filters, formats], help="rebuild the outputs of a run without the network")
+    export.add_argument('--to', default=None, help="base filename of the exported outputs (default: --output; needed with filters)")
+    
+    commands.add_parser('report', parents=[dataset, filters], help="print the summary report of a run")
+    
+    score = commands.add_parser('score', parents=[dataset, filters], help="write composite risk scores and rate tiers from the cube")
+    score.add_argument('--weights', default=None, help="JSON file of weight tables (weights, hazard, size, province, tiers) replacing the defaults")
+    score.add_argument('--to', default=None, help="scores CSV (default: <output>.risk_scores.csv)")
+    score.add_argument('--rebuild-cube', action='store_true', help="rebuild <output>_cube from the dataset before scoring")
+    
+    list_codes = commands.add_parser('list-codes', parents=[filters], help="list the NAICS codes a scrape covers")
+    list_codes.add_argument('--discovered', action='store_true', help="list codes from the discovery cache instead of the built-in list")
+    list_codes.add_argument('--naics-cache', default="naics_hierarchy.json", help="cached NAICS hierarchy from an earlier discovery crawl")
+    list_codes.add_argument('--json', action='store_true', help="print {naics_code: industry_name} as JSON")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    commands = {
+        'scrape': run_scrape,
+        'resume': run_scrape,
+        'export': run_export,
+        'report': run_report,
+        'score': run_score,
+        'list-codes': run_list_codes
+    }
+    commands[args.command](args)
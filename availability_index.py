@@ -0,0 +1,96 @@
+import logging
+import random
+import sqlite3
+import time
+
+from naics_discovery import naics_level
+
+logger = logging.getLogger(__name__)
+
+class AvailabilityIndex:
+    """SQLite (WAL) index of which (endpoint, NAICS code) pages have data, learned from earlier fetches"""
+    def __init__(self, path="endpoint_availability.sqlite", revalidate_rate=0.05, max_age=14 * 24 * 3600, min_level_samples=10):
+        self.path = path
+        # Share of known-empty pages fetched anyway, and age after which they always are
+        self.revalidate_rate = revalidate_rate
+        self.max_age = max_age
+        # Empty observations needed before unseen codes of a level are skipped too
+        self.min_level_samples = min_level_samples
+
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS availability (
+                endpoint TEXT NOT NULL,
+                naics_code TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                available INTEGER NOT NULL,
+                checks INTEGER NOT NULL DEFAULT 1,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (endpoint, naics_code)
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS availability_level ON availability (endpoint, level, available)")
+        self.db.commit()
+
+        self.stats = {'skipped': 0, 'revalidated': 0, 'reappeared': 0}
+
+    def lookup(self, endpoint, naics_code):
+        """Return the availability entry for a page, or None"""
+        return self.db.execute(
+            "SELECT * FROM availability WHERE endpoint = ? AND naics_code = ?", (endpoint, naics_code)
+        ).fetchone()
+
+    def level_is_empty(self, endpoint, level):
+        """Check if every page seen so far for an endpoint at a NAICS level was empty"""
+        row = self.db.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(available), 0) AS available FROM availability WHERE endpoint = ? AND level = ?",
+            (endpoint, level)
+        ).fetchone()
+        return row['n'] >= self.min_level_samples and row['available'] == 0
+
+    def should_fetch(self, endpoint, naics_code):
+        """Decide whether a page is worth requesting, sampling known-empty ones for re-validation"""
+        entry = self.lookup(endpoint, naics_code)
+        if entry is not None:
+            known_empty = not entry['available']
+            stale = time.time() - entry['checked_at'] >= self.max_age
+        else:
+            known_empty = self.level_is_empty(endpoint, naics_level(naics_code))
+            stale = False
+
+        if not known_empty:
+            return True
+
+        if stale or random.random() < self.revalidate_rate:
+            self.stats['revalidated'] += 1
+            return True
+
+        self.stats['skipped'] += 1
+        return False
+
+    def record(self, endpoint, naics_code, available):
+        """Record whether a fetched page had data; call commit() to persist"""
+        previous = self.lookup(endpoint, naics_code)
+        if available and previous is not None and not previous['available']:
+            self.stats['reappeared'] += 1
+            logger.info(f"  🔄 {endpoint}: data is back for {naics_code}")
+
+        self.db.execute("""
+            INSERT INTO availability (endpoint, naics_code, level, available, checked_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (endpoint, naics_code) DO UPDATE SET
+                available = excluded.available,
+                checks = checks + 1,
+                checked_at = excluded.checked_at
+        """, (endpoint, naics_code, naics_level(naics_code), int(bool(available)), time.time()))
+
+    def commit(self):
+        """Persist recorded observations"""
+        self.db.commit()
+
+    def close(self):
+        """Close the index database"""
+        self.db.close()
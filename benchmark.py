@@ -0,0 +1,348 @@
+import argparse
+import http.server
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from all_industries_scraper import AllIndustriesScraper
+from page_archive import PageArchive, read_archive_record
+from record_sink import RecordSink
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_PROVINCES = [
+    'Newfoundland and Labrador', 'Prince Edward Island', 'Nova Scotia', 'New Brunswick', 'Quebec',
+    'Ontario', 'Manitoba', 'Saskatchewan', 'Alberta', 'British Columbia', 'Yukon',
+    'Northwest Territories', 'Nunavut'
+]
+PERFORMANCE_INDICATORS = [
+    'Total revenue', 'Total expenses', 'Net profit', 'Cost of sales', 'Wages and benefits',
+    'Occupancy costs', 'Depreciation', 'Repairs and maintenance', 'Professional fees',
+    'Advertising', 'Interest', 'Other expenses', 'Profit margin'
+]
+
+# Metrics compared between runs: (result key, True if higher is better)
+COMPARED_METRICS = [
+    ('pages_per_second', True), ('records_per_second', True),
+    ('fetch_latency_p50_ms', False), ('fetch_latency_p99_ms', False),
+    ('parse_ms_per_page', False), ('extract_ms_per_page', False),
+    ('save_seconds', False), ('peak_rss_mb', False), ('output_bytes', False)
+]
+
+def page_shell(title, body):
+    """Wrap fixture content in navigation, scripts and footer like a CIS page"""
+    nav = ''.join(f'<li><a href="/app/ixb/cis/summary-sommaire/{code}">Sector {code}</a></li>' for code in range(11, 92))
+    script = '<script>' + 'window.dataLayer=window.dataLayer||[];' * 200 + '</script>'
+    footer = '<footer><ul>' + '<li><a href="/en/terms">Terms and conditions</a></li>' * 40 + '</ul></footer>'
+    return f'<!DOCTYPE html><html><head><title>{title}</title>{script}</head><body><nav><ul>{nav}</ul></nav><main>{body}</main>{footer}</body></html>'
+
+def synthetic_pages(naics_codes, seed=0):
+    """Return {(endpoint path, naics_code): body} of CIS-like fixture pages"""
+    rng = random.Random(seed)
+    pages = {}
+    for naics_code, industry_name in naics_codes.items():
+        rows = ''.join(
+            f'<tr><th>{province}</th><td>{rng.randint(0, 50000):,}</td><td>{rng.randint(0, 80000):,}</td></tr>'
+            for province in FIXTURE_PROVINCES
+        )
+        size_rows = ''.join(
+            f'<tr><th>{province}</th>' + ''.join(f'<td>{rng.randint(0, 20000):,}</td>' for _ in range(4)) + '</tr>'
+            for province in FIXTURE_PROVINCES
+        )
+        pages[('businesses-entreprises', naics_code)] = page_shell(industry_name, (
+            '<table><thead><tr><th>Province/territory</th><th>Employers</th><th>Non-employers / Indeterminate</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table>'
+            '<table><tr><th>Province/territory</th><th colspan="4">Employment size category (number of employees)</th></tr>'
+            f'<tr><th>Micro</th><th>Small</th><th>Medium</th><th>Large</th></tr>{size_rows}</table>'
+        ))
+
+        quartile_rows = ''.join(
+            f'<tr><td>{indicator}</td>' + ''.join(f'<td>{rng.uniform(0, 100):.1f}</td>' for _ in range(5)) + f'<td>{rng.randint(50, 100)}%</td></tr>'
+            for indicator in PERFORMANCE_INDICATORS
+        )
+        pages[('performance', naics_code)] = page_shell(industry_name, (
+            '<table><tr><th>Whole<br>industry<br>(reliability)</th><th>Bottom<br>quartile<br>(25%)</th><th>Lower<br>middle<br>(25%)</th>'
+            '<th>Upper<br>middle<br>(25%)</th><th>Top<br>quartile<br>(25%)</th><th>Percentage of<br>businesses<br>reporting</th></tr>'
+            f'{quartile_rows}</table>'
+        ))
+
+        # Summary pages have no tables; gdp and trade pages are missing (404)
+        pages[('summary-sommaire', naics_code)] = page_shell(industry_name, f'<h1>{industry_name}</h1><p>Summary</p>')
+    return {key: body.encode('utf-8') for key, body in pages.items()}
+
+def archived_pages(archive_dir):
+    """Return ({(endpoint path, naics_code): body}, {naics_code: industry_name}) from a PageArchive"""
+    archive = PageArchive(archive_dir)
+    pages = {}
+    naics_codes = {}
+    try:
+        with open(archive.data_file, 'rb') as reader:
+            for naics_code, endpoints in archive.latest_entries().items():
+                for offset, length, _ in endpoints.values():
+                    headers, body = read_archive_record(reader, offset, length)
+                    endpoint_path = headers['WARC-Target-URI'].rstrip('/').split('/')[-2]
+                    pages[(endpoint_path, naics_code)] = body
+                    naics_codes[naics_code] = headers['X-Industry-Name']
+    finally:
+        archive.close()
+    return pages, naics_codes
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    """Serve recorded pages at /cis/<endpoint path>/<naics_code> with injected latency and errors"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.rstrip('/').split('/')
+        body = server.pages.get((parts[-2], parts[-1])) if len(parts) >= 2 else None
+
+        if server.latency:
+            time.sleep(server.rng.uniform(0.5, 1.5) * server.latency)
+
+        if server.rng.random() < server.error_rate:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_pages(pages, latency, error_rate, seed, port_queue):
+    """Run the replay server (in its own process, so it does not count towards the scraper's RSS)"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ReplayHandler)
+    server.daemon_threads = True
+    server.pages = pages
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+class ReplayServer:
+    """Local stand-in for the CIS site serving recorded pages"""
+    def __init__(self, pages, latency=0.05, error_rate=0.0, seed=0):
+        self.pages = pages
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.process = None
+
+    def __enter__(self):
+        port_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve_pages, args=(self.pages, self.latency, self.error_rate, self.seed, port_queue), daemon=True
+        )
+        self.process.start()
+        self.base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}/cis"
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.process.terminate()
+        self.process.join()
+        return False
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def timed(function, samples):
+    """Wrap a function so each call's duration in seconds is appended to samples"""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+def timed_async(function, samples):
+    """Wrap a coroutine function so each call's duration in seconds is appended to samples"""
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def git_commit():
+    """Return the current git commit, if any"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmark(pages, naics_codes, latency=0.05, error_rate=0.0, concurrent=True, batch_size=25,
+                  max_in_flight=10, requests_per_second=0, parser_backend='auto', parquet=False, in_memory=False, seed=0):
+    """Scrape the replayed pages through scrape_all_industries and save_all_data, returning the measurements"""
+    fetch_samples = []
+    parse_samples = []
+    extract_samples = []
+
+    # Progress files go to their own temporary directory, so neither the working directory
+    # nor the measured output sizes pick them up
+    with ReplayServer(pages, latency, error_rate, seed) as server, tempfile.TemporaryDirectory() as output_dir, \
+            tempfile.TemporaryDirectory() as state_dir:
+        base_filename = os.path.join(output_dir, "benchmark")
+        sink = None if in_memory else RecordSink(base_filename)
+        scraper = AllIndustriesScraper(
+            base_url=server.base_url, requests_per_second=requests_per_second, max_in_flight=max_in_flight,
+            parser_backend=parser_backend, sink=sink, backoff_base=0.1, state_dir=state_dir
+        )
+        scraper.all_naics_codes = dict(naics_codes)
+
+        # Time the hot paths without touching the scraper's code. Fetch latency is end
+        # to end: rate budget waits and retries count, as they do for the scrape itself
+        scraper.fetch_result = timed(scraper.fetch_result, fetch_samples)
+        scraper.fetch_result_async = timed_async(scraper.fetch_result_async, fetch_samples)
+        scraper.table_parser.parse_tables = timed(scraper.table_parser.parse_tables, parse_samples)
+        scraper.extract_table_data = timed(scraper.extract_table_data, extract_samples)
+
+        started = time.perf_counter()
+        data = scraper.scrape_all_industries(batch_size=batch_size, concurrent=concurrent)
+        scrape_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        record_count = scraper.save_all_data(data, base_filename, parquet=parquet)
+        save_seconds = time.perf_counter() - started
+
+        if sink:
+            sink.close()
+        output_files = {name: os.path.getsize(os.path.join(output_dir, name)) for name in sorted(os.listdir(output_dir))}
+
+    parsed_pages = len(parse_samples)
+    return {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': sys.version.split()[0],
+        'config': {
+            'industries': len(naics_codes), 'fixture_pages': len(pages), 'latency': latency, 'error_rate': error_rate,
+            'concurrent': concurrent, 'batch_size': batch_size, 'max_in_flight': max_in_flight,
+            'requests_per_second': requests_per_second, 'parser': scraper.table_parser.name,
+            'parquet': parquet, 'in_memory': in_memory
+        },
+        'requests': scraper.network_requests,
+        'retries': scraper.retries,
+        'pages_parsed': parsed_pages,
+        'records': record_count,
+        'scrape_seconds': round(scrape_seconds, 3),
+        'save_seconds': round(save_seconds, 3),
+        'pages_per_second': round(len(fetch_samples) / scrape_seconds, 2) if scrape_seconds else 0,
+        'records_per_second': round(record_count / scrape_seconds, 1) if scrape_seconds else 0,
+        'fetch_latency_p50_ms': round(percentile(fetch_samples, 0.5) * 1000, 2),
+        'fetch_latency_p99_ms': round(percentile(fetch_samples, 0.99) * 1000, 2),
+        'parse_ms_per_page': round(sum(parse_samples) * 1000 / parsed_pages, 3) if parsed_pages else 0,
+        'extract_ms_per_page': round(sum(extract_samples) * 1000 / parsed_pages, 3) if parsed_pages else 0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'output_bytes': sum(output_files.values()),
+        'output_files': output_files
+    }
+
+def compare_results(current, previous, tolerance=0.10):
+    """Print each compared metric against a previous run, flagging regressions beyond tolerance"""
+    print(f"\n📊 Compared with {previous.get('git_commit') or 'previous run'} ({previous.get('started_at')}):")
+    regressions = 0
+    for key, higher_is_better in COMPARED_METRICS:
+        old, new = previous.get(key), current.get(key)
+        if not old or new is None:
+            continue
+
+        change = (new - old) / old
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        regressions += worse
+        print(f"   {'⚠️' if worse else '  '} {key:<24} {old:>12,.2f} → {new:>12,.2f} ({change:+.1%})")
+    return regressions
+
+def print_results(results):
+    """Print the headline measurements of a run"""
+    print("\n" + "=" * 70)
+    print(f"⏱️ BENCHMARK: {results['config']['industries']} industries, {results['requests']} requests, {results['records']:,} records")
+    print("=" * 70)
+    print(f"   Pages/sec:           {results['pages_per_second']:,.2f}")
+    print(f"   Records/sec:         {results['records_per_second']:,.1f}")
+    print(f"   Fetch latency p50:   {results['fetch_latency_p50_ms']:,.2f} ms")
+    print(f"   Fetch latency p99:   {results['fetch_latency_p99_ms']:,.2f} ms")
+    print(f"   Parse per page:      {results['parse_ms_per_page']:,.3f} ms")
+    print(f"   Extract per page:    {results['extract_ms_per_page']:,.3f} ms")
+    print(f"   save_all_data:       {results['save_seconds']:,.3f} s")
+    print(f"   Peak RSS:            {results['peak_rss_mb']:,.1f} MB")
+    print(f"   Output:              {results['output_bytes']:,} bytes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper pipeline against a local replay of CIS pages")
+    parser.add_argument('--archive-dir', default=None, help="replay pages recorded in this page archive instead of synthetic fixtures")
+    parser.add_argument('--industries', type=int, default=100, help="number of industries (synthetic fixtures, or a cap on archived ones)")
+    parser.add_argument('--latency', type=float, default=0.05, help="mean seconds the replay server waits before answering")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument('--sequential', action='store_true', help="benchmark the sequential path (with its politeness sleeps)")
+    parser.add_argument('--batch-size', type=int, default=25, help="industries per batch")
+    parser.add_argument('--max-in-flight', type=int, default=10, help="ceiling for concurrent requests")
+    parser.add_argument('--rps', type=float, default=0, help="ceiling for requests per second (0 = unlimited)")
+    parser.add_argument('--parser', choices=['auto', 'lxml', 'bs4'], default='auto', help="HTML table parser backend")
+    parser.add_argument('--parquet', action='store_true', help="include the Parquet output")
+    parser.add_argument('--in-memory', action='store_true', help="benchmark the in-memory path instead of the record stream")
+    parser.add_argument('--seed', type=int, default=0, help="seed for fixtures, latency jitter and errors")
+    parser.add_argument('--results', default=None, help="JSON file for the results (default: benchmarks/<timestamp>.json)")
+    parser.add_argument('--compare', default=None, help="results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.archive_dir:
+        pages, naics_codes = archived_pages(args.archive_dir)
+        naics_codes = dict(list(naics_codes.items())[:args.industries])
+    else:
+        naics_codes = dict(list(AllIndustriesScraper().all_naics_codes.items())[:args.industries])
+        pages = synthetic_pages(naics_codes, args.seed)
+
+    results = run_benchmark(
+        pages, naics_codes, latency=args.latency, error_rate=args.error_rate, concurrent=not args.sequential,
+        batch_size=args.batch_size, max_in_flight=args.max_in_flight, requests_per_second=args.rps,
+        parser_backend=args.parser, parquet=args.parquet, in_memory=args.in_memory, seed=args.seed
+    )
+    print_results(results)
+
+    results_file = args.results or os.path.join("benchmarks", f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    with open(results_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {results_file}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f))
+        if regressions:
+            print(f"\n⚠️ {regressions} metrics regressed by more than 10%")
+            sys.exit(1)
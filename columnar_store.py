@@ -0,0 +1,160 @@
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from naics_discovery import naics_level
+from record_sink import FLAT_METADATA_FIELDS, merge_column_kinds
+
+logger = logging.getLogger(__name__)
+
+# Per-row fields that are stored once in industries.parquet or implied by the table
+DROPPED_FIELDS = set(FLAT_METADATA_FIELDS) | {'endpoint'}
+
+def write_columnar_store(data, read_records, store_dir, row_group_size=50000, partitions=None):
+    """Write one typed, dictionary-encoded Parquet table per endpoint, partitioned by NAICS level
+
+    data is a sink index or in-memory results ({naics_code: {metadata, endpoints}});
+    read_records(endpoint_info) yields the records of one endpoint of one industry.
+    partitions, if given, is the set of (endpoint, naics_level) that changed; other partitions
+    of an existing store are left untouched unless their endpoint's schema changed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Rebuild from scratch so partitions of dropped codes do not linger
+    if partitions is None or not os.path.exists(store_dir):
+        partitions = None
+        if os.path.exists(store_dir):
+            shutil.rmtree(store_dir)
+        os.makedirs(store_dir)
+
+    # Industry metadata, once per code instead of on every row
+    industries = pa.table({
+        'naics_code': pa.array(list(data), pa.string()).dictionary_encode(),
+        'industry_name': pa.array([industry['metadata']['industry_name'] for industry in data.values()], pa.string()),
+        'naics_level': pa.array([naics_level(naics_code) for naics_code in data], pa.int8()),
+        'scrape_date': pa.array([datetime.fromisoformat(industry['metadata']['scrape_date']) for industry in data.values()], pa.timestamp('us'))
+    })
+    pq.write_table(industries, os.path.join(store_dir, 'industries.parquet'))
+
+    endpoint_names = {}
+    for industry in data.values():
+        endpoint_names.update(dict.fromkeys(industry['endpoints']))
+
+    # Endpoints that disappeared entirely
+    if partitions is not None:
+        for name in os.listdir(store_dir):
+            if os.path.isdir(os.path.join(store_dir, name)) and name not in endpoint_names:
+                shutil.rmtree(os.path.join(store_dir, name))
+
+    arrow_types = {'string': pa.dictionary(pa.int32(), pa.string()), 'float': pa.float64(), 'int': pa.int64(), None: pa.string()}
+    row_counts = {}
+    rewritten = 0
+    for endpoint_name in endpoint_names:
+        # Aliases get their canonical code's rows under their own code, so every code queries alike
+        sources = [
+            (naics_code, stored_endpoint(data, endpoint_name, industry['endpoints'][endpoint_name]))
+            for naics_code, industry in data.items()
+            if endpoint_name in industry['endpoints']
+        ]
+
+        # First pass: settle one Arrow type per column of this endpoint only
+        kinds = {}
+        for _, endpoint_info in sources:
+            for record in read_records(endpoint_info):
+                merge_column_kinds(kinds, {key: value for key, value in record.items() if key not in DROPPED_FIELDS})
+
+        schema = pa.schema(
+            [('naics_code', arrow_types['string'])] +
+            [(key, arrow_types[kind]) for key, kind in kinds.items()]
+        )
+        string_columns = {key for key, kind in kinds.items() if kind in ('string', None)}
+
+        # Only changed partitions are rewritten, unless the endpoint's schema moved on
+        endpoint_dir = os.path.join(store_dir, endpoint_name)
+        levels = {naics_level(naics_code) for naics_code, _ in sources}
+        if partitions is not None and os.path.exists(endpoint_dir) and stored_schema(endpoint_dir) == schema:
+            rewrite = {level for endpoint, level in partitions if endpoint == endpoint_name}
+        else:
+            rewrite = levels
+            if os.path.exists(endpoint_dir):
+                shutil.rmtree(endpoint_dir)
+        for level in rewrite:
+            partition_dir = os.path.join(endpoint_dir, f"naics_level={level}")
+            if os.path.exists(partition_dir):
+                shutil.rmtree(partition_dir)
+        row_counts[endpoint_name] = sum(endpoint_info['records_count'] for _, endpoint_info in sources)
+        rewritten += len(rewrite & levels)
+        if not rewrite:
+            continue
+
+        # Second pass: stream rows into one Parquet file per NAICS level
+        writers = {}
+        chunks = {}
+
+        def flush(level):
+            writers[level].write_table(pa.Table.from_pylist(chunks[level], schema=schema))
+            chunks[level] = []
+
+        try:
+            for naics_code, endpoint_info in sources:
+                level = naics_level(naics_code)
+                if level not in rewrite:
+                    continue
+                if level not in writers:
+                    partition_dir = os.path.join(store_dir, endpoint_name, f"naics_level={level}")
+                    os.makedirs(partition_dir)
+                    writers[level] = pq.ParquetWriter(os.path.join(partition_dir, 'part-0.parquet'), schema)
+                    chunks[level] = []
+
+                for record in read_records(endpoint_info):
+                    row = {key: value for key, value in record.items() if key not in DROPPED_FIELDS}
+                    for key in string_columns:
+                        value = row.get(key)
+                        if value is not None and not isinstance(value, str):
+                            row[key] = str(value)
+                    row['naics_code'] = naics_code
+                    chunks[level].append(row)
+
+                    if len(chunks[level]) >= row_group_size:
+                        flush(level)
+
+            for level in writers:
+                if chunks[level]:
+                    flush(level)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    logger.info(f"🧱 Columnar store {store_dir} ({rewritten} partitions written): " + ", ".join(f"{name} ({count:,} rows)" for name, count in row_counts.items()))
+    return row_counts
+
+def stored_endpoint(data, endpoint_name, endpoint_info):
+    """Return the endpoint entry that holds the records of an endpoint (its canonical one for an alias)"""
+    if 'alias_of' in endpoint_info:
+        return data[endpoint_info['alias_of']]['endpoints'][endpoint_name]
+    return endpoint_info
+
+def stored_schema(endpoint_dir):
+    """Return the Arrow schema of an endpoint's existing partitions, or None"""
+    import pyarrow.parquet as pq
+
+    for name in sorted(os.listdir(endpoint_dir)):
+        part_file = os.path.join(endpoint_dir, name, 'part-0.parquet')
+        if os.path.exists(part_file):
+            return pq.read_schema(part_file).remove_metadata()
+    return None
+
+def read_endpoint_table(store_dir, endpoint_name, columns=None, naics_levels=None):
+    """Memory-map one endpoint's table, reading only the given columns and NAICS levels"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    partitioning = ds.partitioning(pa.schema([('naics_level', pa.int8())]), flavor='hive')
+    filters = [('naics_level', 'in', list(naics_levels))] if naics_levels else None
+    return pq.read_table(
+        os.path.join(store_dir, endpoint_name), columns=columns, filters=filters,
+        partitioning=partitioning, memory_map=True
+    )
@@ -0,0 +1,85 @@
+import sys
+
+# Interned schemas: (endpoint, column names) -> the one shared TableSchema
+schemas = {}
+
+class TableSchema:
+    """Column names of one kind of table, shared by every row of every industry that has it"""
+    __slots__ = ('endpoint', 'columns', 'record_keys', 'flat_keys')
+
+    def __init__(self, endpoint, columns):
+        self.endpoint = endpoint
+        self.columns = columns
+        # Keys of a materialized record and of a flat output record, in output order
+        self.record_keys = ('endpoint',) + columns
+        self.flat_keys = ('naics_code', 'industry_name', 'data_source', 'scrape_date') + self.record_keys
+
+    def __reduce__(self):
+        # Unpickle through intern_schema so process pool results share schemas too
+        return intern_schema, (self.endpoint, self.columns)
+
+def intern_schema(endpoint, columns):
+    """Return the shared schema of a table with these (unique) column names"""
+    key = (endpoint, tuple(columns))
+    schema = schemas.get(key)
+    if schema is None:
+        schema = schemas[key] = TableSchema(sys.intern(endpoint), tuple(sys.intern(column) for column in columns))
+    return schema
+
+def unique_columns(headers):
+    """Return (column names, value positions) with repeated headers collapsed as a dict would, last value winning"""
+    positions = {}
+    for i, header in enumerate(headers):
+        positions[header] = i
+    return list(positions), list(positions.values())
+
+class RecordTable:
+    """Rows of an endpoint as tuples grouped under shared schemas, materialized to dicts only for output"""
+    __slots__ = ('segments', 'count')
+
+    def __init__(self):
+        # [(TableSchema, [row tuple, ...])], one segment per extracted table
+        self.segments = []
+        self.count = 0
+
+    def extend(self, schema, rows):
+        """Add rows (tuples ordered like schema.columns)"""
+        self.segments.append((schema, rows))
+        self.count += len(rows)
+
+    def append_table(self, other):
+        """Add every row of another RecordTable"""
+        self.segments.extend(other.segments)
+        self.count += other.count
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        """Yield each row as a record dict"""
+        for schema, rows in self.segments:
+            keys = schema.record_keys
+            prefix = (schema.endpoint,)
+            for row in rows:
+                yield dict(zip(keys, prefix + row))
+
+    def iter_flat(self, naics_code, industry_name, data_source, scrape_date):
+        """Yield each row as a flat output record with the industry metadata in front"""
+        for schema, rows in self.segments:
+            keys = schema.flat_keys
+            prefix = (naics_code, industry_name, data_source, scrape_date, schema.endpoint)
+            for row in rows:
+                yield dict(zip(keys, prefix + row))
+
+    def to_list(self):
+        """Materialize every row as a record dict"""
+        return list(self)
+
+def json_default(value):
+    """json.dump default that materializes RecordTables and stringifies anything else"""
+    if isinstance(value, RecordTable):
+        return value.to_list()
+    return str(value)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying after a pause; anything else is final. All but a
+# plain 500 (an endpoint bug rather than overload) also slow the host down.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 502, 503, 504}
+
+def parse_retry_after(value):
+    """Return the Retry-After header as seconds to wait, or None"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Full-jitter exponential backoff for a retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class RateBudget:
+    """Adaptive (AIMD) requests-per-second and in-flight budget shared by fetches to one host"""
+    def __init__(self, requests_per_second=5.0, max_in_flight=10, min_requests_per_second=0.2):
+        self.max_requests_per_second = requests_per_second
+        self.min_requests_per_second = min(min_requests_per_second, requests_per_second or min_requests_per_second)
+        self.max_in_flight = max_in_flight
+
+        # Start at half speed and ramp up while responses stay healthy
+        self.requests_per_second = requests_per_second / 2 if requests_per_second else 0
+        self.limit = max(1.0, max_in_flight / 2)
+        self.in_flight = 0
+
+        self.paused_until = 0.0
+        self.throttled_seconds = 0.0
+        self.throttle_events = 0
+        self._next_slot = 0.0
+        self._last_decrease = 0.0
+        self._condition = None
+
+    async def __aenter__(self):
+        # Created lazily so the budget binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+        try:
+            await asyncio.sleep(self.reserve_slot())
+        except BaseException:
+            await self.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+        return False
+
+    async def release(self):
+        """Free an in-flight slot and wake waiting fetches"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def reserve_slot(self):
+        """Reserve the next start time and return how long to wait for it"""
+        now = time.monotonic()
+        start = max(now, self._next_slot, self.paused_until)
+
+        if self.paused_until > now:
+            self.throttled_seconds += start - max(now, self._next_slot)
+
+        if self.requests_per_second:
+            self._next_slot = start + 1.0 / self.requests_per_second
+        return start - now
+
+    def on_success(self):
+        """Additively raise concurrency and rate after a healthy response"""
+        self.limit = min(self.max_in_flight, self.limit + 1.0 / self.limit)
+        if self.requests_per_second:
+            self.requests_per_second = min(
+                self.max_requests_per_second,
+                self.requests_per_second + self.max_requests_per_second * 0.05
+            )
+
+    def on_throttle(self, retry_after=None):
+        """Halve concurrency and rate, and pause the host for Retry-After seconds"""
+        now = time.monotonic()
+        self.throttle_events += 1
+
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+        # Concurrent failures from one overload only back off once
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+
+        self.limit = max(1.0, self.limit / 2)
+        if self.requests_per_second:
+            self.requests_per_second = max(self.min_requests_per_second, self.requests_per_second / 2)
+        logger.info(f"🐢 Throttled: {int(self.limit)} in flight, {self.requests_per_second:.2f} req/s")
+
+class CircuitBreaker:
+    """Stop requesting an endpoint after repeated failures, probing again after a cool-down"""
+    def __init__(self, name, failure_threshold=5, reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_progress = False
+
+    def allow_request(self):
+        """Check if a request may go out (one trial request when half-open)"""
+        if self.state == 'closed':
+            return True
+
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = 'half-open'
+
+        if self.state == 'half-open' and not self.trial_in_progress:
+            self.trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self):
+        """Close the circuit after a working response"""
+        if self.state != 'closed':
+            logger.info(f"🔌 {self.name}: circuit closed")
+        self.state = 'closed'
+        self.failures = 0
+        self.trial_in_progress = False
+
+    def record_failure(self):
+        """Count a failure and open the circuit once the threshold is reached"""
+        self.failures += 1
+        self.trial_in_progress = False
+
+        if self.state == 'half-open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.warning(f"🔌 {self.name}: circuit open after {self.failures} failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from naics_discovery import naics_level
+from record_sink import FLAT_METADATA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Changelog operations
+CHANGE_OPS = ('insert', 'update', 'delete')
+
+def row_keys(records):
+    """Key each record by its table (column names) and first-column label, numbering repeated labels"""
+    keys = []
+    seen = {}
+    for record in records:
+        columns = [key for key in record if key != 'endpoint']
+        table = hashlib.sha1('\x1f'.join(columns).encode('utf-8')).hexdigest()[:8]
+        label = f"{table}:{record[columns[0]] if columns else ''}"
+        seen[label] = seen.get(label, 0) + 1
+        keys.append(label if seen[label] == 1 else f"{label}#{seen[label]}")
+    return keys
+
+class RefreshState:
+    """SQLite (WAL) store of the last value of every (naics_code, endpoint, row key) and when it last changed"""
+    def __init__(self, path="refresh_state.sqlite"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                naics_code TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                record TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                PRIMARY KEY (naics_code, endpoint, row_key)
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS endpoints (
+                naics_code TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                industry_name TEXT,
+                url TEXT,
+                tables_count INTEGER,
+                PRIMARY KEY (naics_code, endpoint)
+            )
+        """)
+        self.db.commit()
+
+        self.stats = dict.fromkeys(CHANGE_OPS, 0)
+        self.kept = 0
+
+    def stored_endpoint(self, naics_code, endpoint):
+        """Return (page details, records, changed_at per record) of an endpoint as last seen, in page order"""
+        details = self.db.execute(
+            "SELECT industry_name, url, tables_count FROM endpoints WHERE naics_code = ? AND endpoint = ?", (naics_code, endpoint)
+        ).fetchone()
+        rows = self.db.execute(
+            "SELECT record, changed_at FROM rows WHERE naics_code = ? AND endpoint = ? ORDER BY rowid", (naics_code, endpoint)
+        ).fetchall()
+        return (
+            dict(details) if details else {'industry_name': None, 'url': None, 'tables_count': None},
+            [json.loads(row['record']) for row in rows],
+            [row['changed_at'] for row in rows]
+        )
+
+    def keep_endpoint(self, sink, naics_code, endpoint):
+        """Append the stored rows of an endpoint not fetched this run to the sink; returns their dates"""
+        details, records, dates = self.stored_endpoint(naics_code, endpoint)
+        if not records:
+            return []
+
+        if naics_code in sink.index:
+            metadata = sink.index[naics_code]['metadata']
+        else:
+            metadata = {'naics_code': naics_code, 'industry_name': details['industry_name'], 'scrape_date': max(dates)}
+        entry = sink.write_endpoint(metadata, endpoint, {
+            'url': details['url'], 'tables_count': details['tables_count'], 'records_count': len(records), 'data': records
+        })
+        entry['row_dates'] = dates
+        self.kept += len(records)
+        return dates
+
+    def known_rows(self, naics_code, endpoint):
+        """Return {row_key: (record JSON, changed_at)} of an endpoint as last seen"""
+        return {
+            row['row_key']: (row['record'], row['changed_at'])
+            for row in self.db.execute(
+                "SELECT row_key, record, changed_at FROM rows WHERE naics_code = ? AND endpoint = ?", (naics_code, endpoint)
+            )
+        }
+
+    def diff_endpoint(self, naics_code, endpoint, records, seen_at):
+        """Compare an endpoint's fresh records with the stored ones and store them
+
+        Returns (changes, changed_at per record in record order).
+        """
+        known = self.known_rows(naics_code, endpoint)
+        changes = []
+        row_dates = []
+        upserts = []
+        for row_key, record in zip(row_keys(records), records):
+            record_json = json.dumps(record, ensure_ascii=False, default=str)
+            before = known.pop(row_key, None)
+            if before is not None and before[0] == record_json:
+                row_dates.append(before[1])
+                continue
+
+            op = 'insert' if before is None else 'update'
+            changes.append({
+                'op': op, 'naics_code': naics_code, 'endpoint': endpoint, 'row_key': row_key, 'changed_at': seen_at,
+                'before': json.loads(before[0]) if before else None, 'after': record
+            })
+            upserts.append((naics_code, endpoint, row_key, record_json, seen_at))
+            row_dates.append(seen_at)
+
+        # Rows no longer on the page
+        for row_key, (record_json, _) in known.items():
+            changes.append({
+                'op': 'delete', 'naics_code': naics_code, 'endpoint': endpoint, 'row_key': row_key, 'changed_at': seen_at,
+                'before': json.loads(record_json), 'after': None
+            })
+
+        self.db.executemany("""
+            INSERT INTO rows (naics_code, endpoint, row_key, record, changed_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (naics_code, endpoint, row_key) DO UPDATE SET record = excluded.record, changed_at = excluded.changed_at
+        """, upserts)
+        self.db.executemany(
+            "DELETE FROM rows WHERE naics_code = ? AND endpoint = ? AND row_key = ?",
+            [(naics_code, endpoint, row_key) for row_key in known]
+        )
+
+        for change in changes:
+            self.stats[change['op']] += 1
+        return changes, row_dates
+
+    def store_details(self, naics_code, endpoint, industry_name, endpoint_info):
+        """Remember an endpoint's page details, so its rows can be written out when a later run cannot fetch it"""
+        if endpoint_info is None:
+            self.db.execute("DELETE FROM endpoints WHERE naics_code = ? AND endpoint = ?", (naics_code, endpoint))
+            return
+        self.db.execute("""
+            INSERT INTO endpoints (naics_code, endpoint, industry_name, url, tables_count) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (naics_code, endpoint) DO UPDATE SET
+                industry_name = excluded.industry_name, url = excluded.url, tables_count = excluded.tables_count
+        """, (naics_code, endpoint, industry_name, endpoint_info['url'], endpoint_info['tables_count']))
+
+    def apply(self, sink, tasks, changelog_file):
+        """Diff every (naics_code, endpoint) of a fresh run against the stored state
+
+        tasks maps naics_code -> {endpoint: scrape_date} in scrape order; the scrape_date is None
+        for pages that were not fetched, e.g. after an error. Fetched pages (with or without data)
+        are diffed; the others keep their stored rows, which are appended to the sink so the
+        outputs still carry them. Records per-row last-changed dates in the sink index (so later
+        exports keep them), appends the changes to changelog_file and returns the set of changed
+        (endpoint, naics_level) partitions.
+        """
+        partitions = set()
+        started = time.time()
+
+        sink.stream.flush()
+        with open(sink.records_file, 'rb') as reader, open(changelog_file, 'a', encoding='utf-8') as changelog:
+            for naics_code, endpoints in tasks.items():
+                industry = sink.index.get(naics_code, {'endpoints': {}})
+                last_changed = []
+
+                for endpoint_name, seen_at in endpoints.items():
+                    if seen_at is None:
+                        last_changed.extend(self.keep_endpoint(sink, naics_code, endpoint_name))
+                        continue
+
+                    endpoint_info = industry['endpoints'].get(endpoint_name)
+                    records = []
+                    if endpoint_info:
+                        # Aliases carry the same rows as the code they point at
+                        source = endpoint_info
+                        if 'alias_of' in endpoint_info:
+                            source = sink.index[endpoint_info['alias_of']]['endpoints'][endpoint_name]
+                        records = [
+                            {key: value for key, value in flat_record.items() if key not in FLAT_METADATA_FIELDS}
+                            for flat_record in sink.iter_endpoint_records(reader, source)
+                        ]
+
+                    changes, dates = self.diff_endpoint(naics_code, endpoint_name, records, seen_at)
+                    for change in changes:
+                        changelog.write(json.dumps(change, ensure_ascii=False, default=str) + '\n')
+                    if changes:
+                        partitions.add((endpoint_name, naics_level(naics_code)))
+
+                    if endpoint_info and 'alias_of' not in endpoint_info:
+                        endpoint_info['row_dates'] = dates
+                    last_changed.extend(dates)
+                    self.store_details(naics_code, endpoint_name, industry['metadata']['industry_name'] if endpoint_info else None, endpoint_info)
+
+                # scrape_date now says when the industry's data last changed
+                if naics_code in sink.index and last_changed:
+                    sink.index[naics_code]['metadata']['scrape_date'] = max(last_changed)
+
+                self.db.commit()
+
+        # Kept rows were appended last; put industries and their endpoints back in scrape order
+        positions = {naics_code: position for position, naics_code in enumerate(tasks)}
+        industries = sorted(sink.index.items(), key=lambda item: positions.get(item[0], len(positions)))
+        sink.index.clear()
+        for naics_code, industry in industries:
+            order = list(tasks.get(naics_code, ()))
+            industry['endpoints'] = dict(sorted(
+                industry['endpoints'].items(), key=lambda item: order.index(item[0]) if item[0] in order else len(order)
+            ))
+            sink.index[naics_code] = industry
+
+        logger.info(
+            f"🔄 Refresh: {self.stats['insert']} inserted, {self.stats['update']} updated, {self.stats['delete']} deleted rows "
+            f"in {len(partitions)} partitions, {self.kept} kept from unfetched pages ({time.time() - started:.1f}s), changelog {changelog_file}"
+        )
+        return partitions
+
+    def close(self):
+        """Close the state database"""
+        self.db.close()
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+
+from naics_discovery import SECTOR_RANGES, naics_level, naics_prefixes
+from record_sink import FLAT_METADATA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Per-row fields that are not table columns
+DROPPED_FIELDS = set(FLAT_METADATA_FIELDS) | {'endpoint'}
+
+# Count columns of the employer status table (Employers, Non-employers / Indeterminate); these
+# partition all businesses, while the size table's columns only break down the employers
+STATUS_COLUMN = re.compile(r'employers', re.IGNORECASE)
+
+# Value columns of the performance tables that are quartiles (not the share of businesses reporting)
+QUARTILE_COLUMN = re.compile(r'quartile|middle', re.IGNORECASE)
+
+def parent_code(naics_code):
+    """Return the code one level up the NAICS hierarchy, or None for a sector"""
+    level = naics_level(naics_code)
+    if level <= 2:
+        return None
+    prefix = naics_code[:level - 1]
+    if level == 3:
+        for sector in SECTOR_RANGES:
+            if prefix in naics_prefixes(sector):
+                return sector
+    return prefix
+
+def numeric(value):
+    """Return a table value as a float, or None if it is not a number"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return float(value)
+
+def table_cells(records):
+    """Yield (row label, column, number) of every numeric cell
+
+    A label repeated under the same columns (e.g. 'Total revenue' in several performance
+    tables) is numbered '#2', '#3'...; tables with other columns share labels as they are.
+    """
+    seen = {}
+    for record in records:
+        columns = [key for key in record if key not in DROPPED_FIELDS]
+        if not columns:
+            continue
+        label = str(record[columns[0]])
+        table_label = (tuple(columns), label)
+        seen[table_label] = seen.get(table_label, 0) + 1
+        if seen[table_label] > 1:
+            label = f"{label} #{seen[table_label]}"
+        for column in columns[1:]:
+            value = numeric(record[column])
+            if value is not None:
+                yield label, column, value
+
+def build_cube(data, read_records, cube_dir):
+    """Materialize the businesses and performance tables as dense arrays with NAICS roll-ups
+
+    data is a sink index or in-memory results ({naics_code: {metadata, endpoints}});
+    read_records(endpoint_info) yields the records of one endpoint of one industry.
+    Writes businesses[code, province, employer status], employers_by_size[code, province,
+    size class] and performance[code, metric, quartile] as .npy files plus dims.json naming
+    every axis position. Statuses, size classes and quartiles are the count and value columns
+    the tables actually have; statuses add up to all businesses, size classes only to the
+    employers. Codes without a table of their own are filled from their children (5→4→3→2
+    digits): counts are summed, performance values averaged weighted by business counts.
+    """
+    import numpy as np
+
+    def endpoint_cells(naics_code, endpoint_name):
+        endpoint_info = data[naics_code]['endpoints'].get(endpoint_name)
+        if not endpoint_info:
+            return []
+        # Aliases carry the same tables as the code they point at
+        if 'alias_of' in endpoint_info:
+            endpoint_info = data[endpoint_info['alias_of']]['endpoints'][endpoint_name]
+        return list(table_cells(read_records(endpoint_info)))
+
+    # Every scraped code plus the ancestors roll-ups fill in
+    codes = {}
+    for naics_code in data:
+        while naics_code and naics_code not in codes:
+            codes[naics_code] = ''
+            naics_code = parent_code(naics_code)
+    codes = {
+        naics_code: data[naics_code]['metadata']['industry_name'] if naics_code in data else ''
+        for naics_code in sorted(codes, key=lambda naics_code: (naics_level(naics_code), naics_code))
+    }
+    code_positions = {naics_code: i for i, naics_code in enumerate(codes)}
+
+    # One pass over the tables settles the axes; percent distribution rows are shares, not counts
+    business_cells = {}
+    performance_cells = {}
+    provinces = {}
+    statuses = {}
+    size_classes = {}
+    metrics = {}
+    quartiles = {}
+    for naics_code in data:
+        cells = [cell for cell in endpoint_cells(naics_code, 'businesses') if '%' not in cell[0]]
+        for province, column, _ in cells:
+            provinces.setdefault(province, len(provinces))
+            columns = statuses if STATUS_COLUMN.search(column) else size_classes
+            columns.setdefault(column, len(columns))
+        business_cells[naics_code] = cells
+
+        cells = [cell for cell in endpoint_cells(naics_code, 'performance') if QUARTILE_COLUMN.search(cell[1])]
+        for metric, quartile, _ in cells:
+            metrics.setdefault(metric, len(metrics))
+            quartiles.setdefault(quartile, len(quartiles))
+        performance_cells[naics_code] = cells
+
+    businesses = np.full((len(codes), len(provinces), len(statuses)), np.nan)
+    employers_by_size = np.full((len(codes), len(provinces), len(size_classes)), np.nan)
+    performance = np.full((len(codes), len(metrics), len(quartiles)), np.nan)
+    for naics_code, cells in business_cells.items():
+        for province, column, value in cells:
+            if column in statuses:
+                businesses[code_positions[naics_code], provinces[province], statuses[column]] = value
+            else:
+                employers_by_size[code_positions[naics_code], provinces[province], size_classes[column]] = value
+    for naics_code, cells in performance_cells.items():
+        for metric, quartile, value in cells:
+            performance[code_positions[naics_code], metrics[metric], quartiles[quartile]] = value
+
+    business_rolled_up = roll_up(businesses, codes, code_positions)
+    roll_up(employers_by_size, codes, code_positions)
+    weights = np.nansum(businesses, axis=(1, 2))
+    performance_rolled_up = roll_up(performance, codes, code_positions, np.where(weights > 0, weights, 1.0))
+
+    # Write next to the old cube and swap, so readers never see a half-written one
+    staging_dir = f"{cube_dir}.tmp"
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+    np.save(os.path.join(staging_dir, 'businesses.npy'), businesses)
+    np.save(os.path.join(staging_dir, 'employers_by_size.npy'), employers_by_size)
+    np.save(os.path.join(staging_dir, 'performance.npy'), performance)
+    np.save(os.path.join(staging_dir, 'businesses_rolled_up.npy'), business_rolled_up)
+    np.save(os.path.join(staging_dir, 'performance_rolled_up.npy'), performance_rolled_up)
+    with open(os.path.join(staging_dir, 'dims.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'built_at': datetime.now().isoformat(),
+            'codes': list(codes),
+            'industry_names': list(codes.values()),
+            'provinces': list(provinces),
+            'statuses': list(statuses),
+            'size_classes': list(size_classes),
+            'metrics': list(metrics),
+            'quartiles': list(quartiles)
+        }, f, indent=2, ensure_ascii=False)
+    if os.path.exists(cube_dir):
+        shutil.rmtree(cube_dir)
+    os.rename(staging_dir, cube_dir)
+
+    logger.info(
+        f"🧊 Cube {cube_dir}: {len(codes)} codes ({int(business_rolled_up.sum())} business and "
+        f"{int(performance_rolled_up.sum())} performance roll-ups) × {len(provinces)} provinces × "
+        f"{len(statuses)} employer statuses / {len(size_classes)} size classes, {len(metrics)} performance metrics"
+    )
+    return len(codes)
+
+def roll_up(values, codes, code_positions, weights=None):
+    """Fill codes without values of their own from their children, deepest level first
+
+    Children are summed, or averaged by weight if weights are given; cells no child has stay
+    NaN. Returns a per-code flag of the codes that were filled.
+    """
+    import numpy as np
+
+    observed = ~np.isnan(values).all(axis=tuple(range(1, values.ndim)))
+    rolled_up = np.zeros(len(codes), dtype=bool)
+    levels = sorted({naics_level(naics_code) for naics_code in codes}, reverse=True)
+    for level in levels[:-1]:
+        children = np.array([code_positions[naics_code] for naics_code in codes if naics_level(naics_code) == level])
+        parents = np.array([code_positions[parent_code(naics_code)] for naics_code in codes if naics_level(naics_code) == level])
+
+        child_values = values[children]
+        present = ~np.isnan(child_values)
+        child_weights = np.ones(len(children)) if weights is None else weights[children]
+        child_weights = child_weights.reshape((-1,) + (1,) * (values.ndim - 1))
+
+        totals = np.zeros(values.shape)
+        counts = np.zeros(values.shape)
+        np.add.at(totals, parents, np.where(present, child_values * child_weights, 0.0))
+        np.add.at(counts, parents, present * child_weights)
+
+        targets = np.unique(parents[~observed[parents]])
+        if weights is None:
+            filled = np.where(counts[targets] > 0, totals[targets], np.nan)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                filled = np.where(counts[targets] > 0, totals[targets] / counts[targets], np.nan)
+        values[targets] = filled
+        rolled_up[targets] = ~np.isnan(filled).all(axis=tuple(range(1, values.ndim)))
+        observed[targets] = rolled_up[targets]
+
+    return rolled_up
+
+class IndustryCube:
+    """Memory-mapped read access to a cube written by build_cube"""
+    def __init__(self, cube_dir):
+        import numpy as np
+
+        self.np = np
+        self.cube_dir = cube_dir
+        with open(os.path.join(cube_dir, 'dims.json'), 'r', encoding='utf-8') as f:
+            self.dims = json.load(f)
+
+        # Arrays stay on disk; the OS pages in only the cells a query touches
+        self.businesses = np.load(os.path.join(cube_dir, 'businesses.npy'), mmap_mode='r')
+        self.employers_by_size = np.load(os.path.join(cube_dir, 'employers_by_size.npy'), mmap_mode='r')
+        self.performance = np.load(os.path.join(cube_dir, 'performance.npy'), mmap_mode='r')
+        self.businesses_rolled_up = np.load(os.path.join(cube_dir, 'businesses_rolled_up.npy'), mmap_mode='r')
+        self.performance_rolled_up = np.load(os.path.join(cube_dir, 'performance_rolled_up.npy'), mmap_mode='r')
+
+        self.codes = {naics_code: i for i, naics_code in enumerate(self.dims['codes'])}
+        self.provinces = {province: i for i, province in enumerate(self.dims['provinces'])}
+        self.statuses = {status: i for i, status in enumerate(self.dims['statuses'])}
+        self.size_classes = {size_class: i for i, size_class in enumerate(self.dims['size_classes'])}
+        self.metrics = {metric: i for i, metric in enumerate(self.dims['metrics'])}
+        self.quartiles = {quartile: i for i, quartile in enumerate(self.dims['quartiles'])}
+
+    def position(self, axis, key):
+        """Return the array position of a key on an axis (a slice over the whole axis for None)"""
+        if key is None:
+            return slice(None)
+        try:
+            return getattr(self, axis)[key]
+        except KeyError:
+            raise KeyError(f"{key!r} is not in the cube's {axis}") from None
+
+    def total(self, cells):
+        """Sum a cell or block of cells, NaN if none is published"""
+        if not isinstance(cells, self.np.ndarray) or cells.ndim == 0:
+            return float(cells)
+        if self.np.isnan(cells).all():
+            return float('nan')
+        return float(self.np.nansum(cells))
+
+    def count(self, naics_code, province=None, status=None):
+        """Return a business count, summed over the provinces and employer statuses not given"""
+        return self.total(self.businesses[
+            self.position('codes', naics_code), self.position('provinces', province), self.position('statuses', status)
+        ])
+
+    def employers(self, naics_code, province=None, size_class=None):
+        """Return an employer count, summed over the provinces and size classes not given"""
+        return self.total(self.employers_by_size[
+            self.position('codes', naics_code), self.position('provinces', province), self.position('size_classes', size_class)
+        ])
+
+    def by_province(self, naics_code, status=None):
+        """Return {province: business count} of a code"""
+        return {province: self.count(naics_code, province, status) for province in self.provinces}
+
+    def by_status(self, naics_code, province=None):
+        """Return {employer status: business count} of a code"""
+        return {status: self.count(naics_code, province, status) for status in self.statuses}
+
+    def by_size_class(self, naics_code, province=None):
+        """Return {size class: employer count} of a code"""
+        return {size_class: self.employers(naics_code, province, size_class) for size_class in self.size_classes}
+
+    def metric(self, naics_code, metric, quartile=None):
+        """Return a performance value, or {quartile: value} if no quartile is given"""
+        values = self.performance[self.position('codes', naics_code), self.position('metrics', metric)]
+        if quartile is not None:
+            return float(values[self.position('quartiles', quartile)])
+        return {quartile: float(value) for quartile, value in zip(self.quartiles, values)}
+
+    def is_rolled_up(self, naics_code):
+        """Check if a code's business counts were filled from its children"""
+        return bool(self.businesses_rolled_up[self.position('codes', naics_code)])
+
+    def top_codes(self, level, province=None, status=None, limit=10):
+        """Return [(naics_code, count)] of the codes at a NAICS level with the most businesses"""
+        np = self.np
+        positions = np.array([i for naics_code, i in self.codes.items() if naics_level(naics_code) == level], dtype=int)
+        if not len(positions):
+            return []
+
+        block = self.businesses[positions][:, self.position('provinces', province), self.position('statuses', status)]
+        counts = np.nansum(block.reshape(len(positions), -1), axis=1)
+        order = np.argsort(-counts, kind='stable')[:limit]
+        return [(self.dims['codes'][positions[i]], float(counts[i])) for i in order if counts[i] > 0]
@@ -0,0 +1,141 @@
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Task states: pending (not yet attempted), done (records written), empty (page
+# had no usable tables or does not exist), skipped (known to be empty, not
+# requested), failed (network or extraction error)
+TASK_STATUSES = ('pending', 'done', 'empty', 'skipped', 'failed')
+
+class JobLedger:
+    """SQLite (WAL) ledger of (naics_code, endpoint) scrape tasks for exact resume"""
+    def __init__(self, path="scrape_ledger.sqlite"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                naics_code TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                industry_name TEXT,
+                position INTEGER NOT NULL,
+                endpoint_position INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                started_at REAL,
+                finished_at REAL,
+                duration REAL,
+                scrape_date TEXT,
+                records_count INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                PRIMARY KEY (naics_code, endpoint)
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, position, endpoint_position)")
+        self.db.commit()
+
+    def add_tasks(self, naics_codes, endpoints, first_position=0):
+        """Register every (naics_code, endpoint) task, keeping the state of known ones"""
+        rows = [
+            (naics_code, endpoint_name, industry_name, position, endpoint_position)
+            for position, (naics_code, industry_name) in enumerate(naics_codes.items(), first_position)
+            for endpoint_position, endpoint_name in enumerate(endpoints)
+        ]
+        with self.db:
+            self.db.executemany("""
+                INSERT INTO tasks (naics_code, endpoint, industry_name, position, endpoint_position)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (naics_code, endpoint) DO UPDATE SET
+                    industry_name = excluded.industry_name,
+                    position = excluded.position,
+                    endpoint_position = excluded.endpoint_position
+            """, rows)
+
+    def reset(self):
+        """Forget all task state for a fresh run"""
+        with self.db:
+            self.db.execute("DELETE FROM tasks")
+
+    def pending_tasks(self, statuses=('pending',)):
+        """Return {naics_code: [endpoint, ...]} of tasks in the given states, in scrape order"""
+        placeholders = ', '.join('?' for _ in statuses)
+        pending = {}
+        for row in self.db.execute(
+            f"SELECT naics_code, endpoint FROM tasks WHERE status IN ({placeholders}) ORDER BY position, endpoint_position",
+            tuple(statuses)
+        ):
+            pending.setdefault(row['naics_code'], []).append(row['endpoint'])
+        return pending
+
+    def record(self, naics_code, endpoint, status, started_at, scrape_date=None, records_count=0, result=None, error=None):
+        """Record one task attempt; call commit() once its records are durable"""
+        finished_at = time.time()
+        self.db.execute("""
+            UPDATE tasks SET
+                status = ?, attempts = attempts + 1, last_error = ?,
+                started_at = ?, finished_at = ?, duration = ?,
+                scrape_date = ?, records_count = ?, result = ?
+            WHERE naics_code = ? AND endpoint = ?
+        """, (
+            status, error, started_at, finished_at, finished_at - started_at,
+            scrape_date, records_count, json.dumps(result) if result is not None else None,
+            naics_code, endpoint
+        ))
+
+    def commit(self):
+        """Commit recorded task attempts"""
+        self.db.commit()
+
+    def completed_index(self):
+        """Rebuild the RecordSink index of done tasks, in scrape order"""
+        index = {}
+        for row in self.db.execute(
+            "SELECT * FROM tasks WHERE status = 'done' ORDER BY position, endpoint_position"
+        ):
+            industry = index.setdefault(row['naics_code'], {
+                'metadata': {
+                    'naics_code': row['naics_code'],
+                    'industry_name': row['industry_name'],
+                    'scrape_date': row['scrape_date']
+                },
+                'endpoints': {}
+            })
+            industry['endpoints'][row['endpoint']] = json.loads(row['result'])
+        return index
+
+    def known_codes(self):
+        """Return {naics_code: industry_name} of every code with tasks, in scrape order"""
+        return {
+            row['naics_code']: row['industry_name']
+            for row in self.db.execute("SELECT naics_code, industry_name FROM tasks GROUP BY naics_code ORDER BY MIN(position)")
+        }
+
+    def refresh_tasks(self):
+        """Return {naics_code: {endpoint: scrape_date}} of tasks an incremental refresh compares, in scrape order
+
+        The scrape_date is None for tasks whose page was not fetched (pending or failed);
+        fetched ones (done or empty) carry when they were fetched.
+        """
+        tasks = {}
+        for row in self.db.execute(
+            "SELECT naics_code, endpoint, status, scrape_date FROM tasks WHERE status IN ('done', 'empty', 'pending', 'failed') ORDER BY position, endpoint_position"
+        ):
+            tasks.setdefault(row['naics_code'], {})[row['endpoint']] = row['scrape_date'] if row['status'] in ('done', 'empty') else None
+        return tasks
+
+    def status_counts(self):
+        """Return the number of tasks in each state"""
+        counts = {status: 0 for status in TASK_STATUSES}
+        for row in self.db.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+            counts[row['status']] = row['n']
+        return counts
+
+    def close(self):
+        """Close the ledger database"""
+        self.db.close()
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger(__name__)
+
+# A NAICS code in a CIS link: a 2-digit sector (possibly a range like 31-33) or a 3 to 6 digit code
+NAICS_CODE = re.compile(r'^(\d{2}(?:-\d{2})?|\d{3,6})$')
+
+# Sectors published as a range of 2-digit prefixes; their 3-digit codes roll up into the range
+SECTOR_RANGES = ('31-33', '44-45', '48-49')
+
+def naics_level(naics_code):
+    """Return the number of digits of a NAICS code ('31-33' is a 2-digit sector)"""
+    return len(naics_code.split('-')[0])
+
+def naics_prefixes(naics_code):
+    """Return the 2-digit prefixes a code covers ('31-33' covers 31, 32 and 33)"""
+    if '-' in naics_code:
+        first, last = naics_code.split('-')
+        return [str(sector) for sector in range(int(first), int(last) + 1)]
+    return [naics_code]
+
+def naics_sector(naics_code):
+    """Return the sector a code belongs to ('311' and '32' belong to '31-33')"""
+    for sector in SECTOR_RANGES:
+        if naics_code == sector or naics_code[:2] in naics_prefixes(sector):
+            return sector
+    return naics_code[:2]
+
+def is_descendant(naics_code, parent_code):
+    """Check if naics_code sits below parent_code in the NAICS hierarchy"""
+    return (
+        naics_level(naics_code) > naics_level(parent_code)
+        and any(naics_code.startswith(prefix) for prefix in naics_prefixes(parent_code))
+    )
+
+def code_matches(naics_code, sectors=None, levels=None):
+    """Check if a code is or sits below one of the sectors (any code) and is at one of the levels"""
+    if levels and naics_level(naics_code) not in levels:
+        return False
+    if sectors and not any(naics_code == sector or is_descendant(naics_code, sector) for sector in sectors):
+        return False
+    return True
+
+class NaicsDiscovery:
+    """Breadth-first crawl of NAICS codes from the CIS pages, cached on disk as a parent/child hierarchy"""
+    def __init__(self, scraper, cache_file="naics_hierarchy.json", endpoint='summary', max_age=30 * 24 * 3600, max_level=6, refresh=False):
+        self.scraper = scraper
+        self.cache_file = cache_file
+        # Endpoint whose pages link to an industry's child codes
+        self.endpoint = endpoint
+        self.max_age = max_age
+        # Codes at this level (6-digit national industries) have no children to crawl for
+        self.max_level = max_level
+
+        # hierarchy: naics_code -> name, level, parent and children, in discovery (BFS) order
+        self.hierarchy = {}
+        self.complete = False
+        self.failed_pages = 0
+
+        if not refresh:
+            self.load()
+
+    def load(self):
+        """Load a complete, fresh hierarchy from the cache file"""
+        if not os.path.exists(self.cache_file):
+            return
+
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+
+        # A crawl that stopped short of max_level is missing the deeper codes; older caches stopped at 5
+        deep_enough = cached.get('max_level', 5) >= self.max_level
+        if cached.get('complete') and deep_enough and time.time() - cached.get('discovered_at', 0) < self.max_age:
+            self.hierarchy = cached['codes']
+            self.complete = True
+            logger.info(f"🗂️ Loaded {len(self.hierarchy)} NAICS codes from {self.cache_file}")
+
+    def save(self):
+        """Write the hierarchy to the cache file atomically"""
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'discovered_at': time.time(),
+                'complete': self.complete,
+                'max_level': self.max_level,
+                'codes': self.hierarchy
+            }, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def codes(self):
+        """Return {naics_code: industry_name} of every code known so far"""
+        return {naics_code: entry['name'] for naics_code, entry in self.hierarchy.items()}
+
+    def seed_sectors(self):
+        """Return the 2-digit sectors the crawl starts from"""
+        return {
+            naics_code: industry_name
+            for naics_code, industry_name in self.scraper.get_all_naics_codes().items()
+            if naics_level(naics_code) == 2
+        }
+
+    def add_code(self, naics_code, industry_name, parent=None):
+        """Add a code to the hierarchy, returning False if it was already known"""
+        if naics_code in self.hierarchy:
+            return False
+
+        self.hierarchy[naics_code] = {
+            'name': industry_name,
+            'level': naics_level(naics_code),
+            'parent': parent,
+            'children': []
+        }
+        if parent is not None:
+            self.hierarchy[parent]['children'].append(naics_code)
+        return True
+
+    def child_codes(self, parent_code, url, content):
+        """Return [(naics_code, industry_name)] of the child codes linked from a page"""
+        endpoint_paths = set(self.scraper.endpoints.values())
+        children = {}
+
+        for href, text in self.scraper.table_parser.parse_links(content):
+            path = urlparse(urljoin(url, href)).path.rstrip('/').split('/')
+            if len(path) < 2 or path[-2] not in endpoint_paths or not NAICS_CODE.match(path[-1]):
+                continue
+
+            naics_code = path[-1]
+            if not is_descendant(naics_code, parent_code) or naics_code in children:
+                continue
+
+            # Link texts may repeat the code before the name
+            if text.startswith(naics_code):
+                text = text[len(naics_code):].lstrip(' -–:')
+            children[naics_code] = text or naics_code
+
+        return list(children.items())
+
+    def expand(self, naics_code, url, content, error):
+        """Add a page's new child codes to the hierarchy and return them"""
+        if error is not None:
+            self.failed_pages += 1
+            logger.warning(f"⚠️ Could not discover children of {naics_code}: {error}")
+            return []
+
+        if not content:
+            return []
+
+        discovered = []
+        for child_code, child_name in self.child_codes(naics_code, url, content):
+            if self.add_code(child_code, child_name, naics_code):
+                discovered.append((child_code, child_name))
+        return discovered
+
+    def finish(self):
+        """Mark the crawl complete (unless pages failed) and cache the hierarchy"""
+        self.complete = self.failed_pages == 0
+        self.save()
+        logger.info(f"🗂️ Discovered {len(self.hierarchy)} NAICS codes" + ("" if self.complete else f" ({self.failed_pages} pages failed, will crawl again next run)"))
+
+    def hand_over(self, url, content, error):
+        """Leave a fetched page for the scrape, which would otherwise download it a second time"""
+        if error is None and self.endpoint in self.scraper.endpoints:
+            self.scraper.prefetched_pages[url] = (content, None)
+
+    def crawl(self):
+        """Yield (naics_code, industry_name) breadth-first, each once its own page has been crawled"""
+        if self.complete:
+            yield from self.codes().items()
+            return
+
+        self.hierarchy = {}
+        self.failed_pages = 0
+        frontier = deque()
+        for naics_code, industry_name in self.seed_sectors().items():
+            self.add_code(naics_code, industry_name)
+            frontier.append(naics_code)
+
+        while frontier:
+            naics_code = frontier.popleft()
+            if naics_level(naics_code) < self.max_level:
+                url = self.scraper.endpoint_url(self.endpoint, naics_code)
+                content, error = self.scraper.fetch_result(url, self.endpoint)
+                frontier.extend(child_code for child_code, _ in self.expand(naics_code, url, content, error))
+                self.hand_over(url, content, error)
+            yield naics_code, self.hierarchy[naics_code]['name']
+
+        self.finish()
+
+    async def crawl_async(self, client, queue):
+        """Put (naics_code, industry_name) on queue level by level, each once its own page has been crawled, then None"""
+        try:
+            if self.complete:
+                for item in self.codes().items():
+                    await queue.put(item)
+                return
+
+            self.hierarchy = {}
+            self.failed_pages = 0
+            frontier = []
+            for naics_code, industry_name in self.seed_sectors().items():
+                self.add_code(naics_code, industry_name)
+                frontier.append(naics_code)
+
+            while frontier:
+                crawled = [naics_code for naics_code in frontier if naics_level(naics_code) < self.max_level]
+                urls = [self.scraper.endpoint_url(self.endpoint, naics_code) for naics_code in crawled]
+                pages = await asyncio.gather(*(self.scraper.fetch_result_async(client, url, self.endpoint) for url in urls))
+                pages = dict(zip(crawled, zip(urls, pages)))
+
+                next_frontier = []
+                for naics_code in frontier:
+                    if naics_code in pages:
+                        url, (content, error) = pages[naics_code]
+                        next_frontier.extend(child_code for child_code, _ in self.expand(naics_code, url, content, error))
+                        self.hand_over(url, content, error)
+                    await queue.put((naics_code, self.hierarchy[naics_code]['name']))
+                frontier = next_frontier
+
+            self.finish()
+        finally:
+            await queue.put(None)
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import logging
+import os
+import struct
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width index record: offset, length, fetched_at, status, naics_code, endpoint, sha1 of body.
+# A page seen again unchanged gets another index record pointing at its stored copy.
+INDEX_RECORD = struct.Struct('<QIdH8s16s20s')
+INDEX_FIELDS = [
+    ('offset', '<u8'), ('length', '<u4'), ('fetched_at', '<f8'), ('status', '<u2'),
+    ('naics_code', 'S8'), ('endpoint', 'S16'), ('digest', 'S20')
+]
+
+def read_archive_record(reader, offset, length):
+    """Return (headers, body) of the archive record stored at offset"""
+    reader.seek(offset)
+    record = gzip.decompress(reader.read(length))
+    head, _, body = record.partition(b'\r\n\r\n')
+
+    headers = {}
+    for line in head.decode('utf-8').split('\r\n')[1:]:
+        name, _, value = line.partition(': ')
+        headers[name] = value
+    return headers, body[:int(headers['Content-Length'])]
+
+class PageArchive:
+    """Append-only WARC-like archive of fetched pages, one gzip member per record, with a memory-mappable index"""
+    def __init__(self, archive_dir="page_archive"):
+        self.archive_dir = archive_dir
+        self.data_file = os.path.join(archive_dir, "pages.warc.gz")
+        self.index_file = os.path.join(archive_dir, "pages.idx")
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # Drop index records of a write cut short by a crash
+        data_size = os.path.getsize(self.data_file) if os.path.exists(self.data_file) else 0
+        valid_records = 0
+        self.latest = {}
+        for entry in self.iter_index():
+            if entry['offset'] + entry['length'] > data_size:
+                break
+            self.latest[(entry['naics_code'], entry['endpoint'])] = (entry['digest'], entry['offset'], entry['length'])
+            valid_records += 1
+
+        self.data = open(self.data_file, 'ab')
+        self.index = open(self.index_file, 'ab')
+        self.index.truncate(valid_records * INDEX_RECORD.size)
+        self.stats = {'archived': 0, 'unchanged': 0}
+
+    def iter_index(self):
+        """Yield index records as dicts, in archive order"""
+        if not os.path.exists(self.index_file):
+            return
+
+        with open(self.index_file, 'rb') as f:
+            while True:
+                chunk = f.read(INDEX_RECORD.size)
+                if len(chunk) < INDEX_RECORD.size:
+                    return
+                offset, length, fetched_at, status, naics_code, endpoint, digest = INDEX_RECORD.unpack(chunk)
+                yield {
+                    'offset': offset, 'length': length, 'fetched_at': fetched_at, 'status': status,
+                    'naics_code': naics_code.rstrip(b'\0').decode('ascii'),
+                    'endpoint': endpoint.rstrip(b'\0').decode('ascii'),
+                    'digest': digest
+                }
+
+    def append(self, naics_code, endpoint, url, industry_name, body, status=200, fetched_at=None):
+        """Archive a page unless its latest archived copy has the same body, which is only marked as seen again"""
+        digest = hashlib.sha1(body).digest()
+        fetched_at = fetched_at or time.time()
+        latest = self.latest.get((naics_code, endpoint))
+        if latest and latest[0] == digest:
+            self.index.write(INDEX_RECORD.pack(
+                latest[1], latest[2], fetched_at, status,
+                naics_code.encode('ascii'), endpoint.encode('ascii'), digest
+            ))
+            self.stats['unchanged'] += 1
+            return False
+
+        head = '\r\n'.join([
+            'WARC/1.0',
+            'WARC-Type: response',
+            f'WARC-Target-URI: {url}',
+            f'WARC-Date: {datetime.fromtimestamp(fetched_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}',
+            f'X-NAICS-Code: {naics_code}',
+            f'X-Industry-Name: {industry_name}',
+            f'X-Endpoint: {endpoint}',
+            f'X-Status: {status}',
+            f'Content-Length: {len(body)}'
+        ])
+        record = gzip.compress(head.encode('utf-8') + b'\r\n\r\n' + body + b'\r\n\r\n', compresslevel=6)
+
+        offset = self.data.tell()
+        self.data.write(record)
+        self.index.write(INDEX_RECORD.pack(
+            offset, len(record), fetched_at, status,
+            naics_code.encode('ascii'), endpoint.encode('ascii'), digest
+        ))
+
+        self.latest[(naics_code, endpoint)] = (digest, offset, len(record))
+        self.stats['archived'] += 1
+        return True
+
+    def sync(self):
+        """Flush archived records to stable storage, data before index"""
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.index.flush()
+
+    def index_array(self):
+        """Memory-map the index as a numpy structured array"""
+        import numpy as np
+
+        self.sync()
+        dtype = np.dtype(INDEX_FIELDS)
+        if os.path.getsize(self.index_file) < dtype.itemsize:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.index_file, dtype=dtype, mode='r')
+
+    def latest_entries(self):
+        """Return {naics_code: {endpoint: (offset, length, fetched_at)}} of the newest copy of each page, in archive order
+
+        fetched_at is when the page was last seen, even if its body has not changed since it was stored.
+        """
+        entries = {}
+        index = self.index_array()
+        for offset, length, fetched_at, naics_code, endpoint in zip(
+            index['offset'].tolist(), index['length'].tolist(), index['fetched_at'].tolist(),
+            index['naics_code'].tolist(), index['endpoint'].tolist()
+        ):
+            entries.setdefault(naics_code.decode('ascii'), {})[endpoint.decode('ascii')] = (offset, length, fetched_at)
+        return entries
+
+    def close(self):
+        """Flush and close the archive files"""
+        if not self.data.closed:
+            self.sync()
+            self.data.close()
+            self.index.close()
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+class PageCache:
+    """Content-addressed on-disk HTTP cache with ETag/Last-Modified revalidation"""
+    def __init__(self, cache_dir="http_cache", ttl=30 * 24 * 3600, max_bytes=512 * 1024 * 1024, offline=False):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.db.commit()
+
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+        # Apply a max_bytes lowered since the last run
+        self.evict()
+
+    def object_path(self, body_hash):
+        """Return the on-disk path of a body, fanned out by hash prefix"""
+        return os.path.join(self.objects_dir, body_hash[:2], body_hash)
+
+    def lookup(self, url):
+        """Return the cache entry for url, or None"""
+        return self.db.execute("SELECT * FROM entries WHERE url = ?", (url,)).fetchone()
+
+    def is_fresh(self, entry):
+        """Check if entry is young enough to serve without revalidation"""
+        return entry is not None and time.time() - entry['stored_at'] < self.ttl
+
+    def cached_body(self, url):
+        """Return the body if it can be served without the network, otherwise None"""
+        entry = self.lookup(url)
+        if entry is None:
+            if self.offline:
+                self.stats['misses'] += 1
+            return None
+
+        if self.offline or self.is_fresh(entry):
+            body = self.load_body(entry)
+            if body is not None:
+                self.stats['hits'] += 1
+            return body
+
+        return None
+
+    def conditional_headers(self, url):
+        """Return If-None-Match / If-Modified-Since headers for a stale entry"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_body(self, entry):
+        """Read a cached body and mark it recently used"""
+        try:
+            with open(self.object_path(entry['body_hash']), 'rb') as f:
+                body = f.read()
+        except OSError:
+            # Object went missing on disk, forget the entry
+            self.db.execute("DELETE FROM entries WHERE url = ?", (entry['url'],))
+            self.db.commit()
+            return None
+
+        self.db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), entry['url']))
+        self.db.commit()
+        return body
+
+    def revalidated(self, url, headers):
+        """Refresh an entry after a 304 response and return its stored body"""
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+
+        now = time.time()
+        self.db.execute(
+            "UPDATE entries SET stored_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (now, headers.get('ETag'), headers.get('Last-Modified'), url)
+        )
+        self.db.commit()
+
+        body = self.load_body(entry)
+        if body is not None:
+            self.stats['revalidated'] += 1
+        return body
+
+    def store(self, url, body, headers):
+        """Store a fresh 200 response body under its content hash"""
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self.object_path(body_hash)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        previous = self.lookup(url)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (url, body_hash, size, etag, last_modified, stored_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, body_hash, len(body), headers.get('ETag'), headers.get('Last-Modified'), now, now)
+        )
+        self.db.commit()
+        self.stats['stored'] += 1
+
+        if previous is not None and previous['body_hash'] != body_hash:
+            self.remove_object_if_unused(previous['body_hash'])
+
+        self.evict()
+
+    def remove_object_if_unused(self, body_hash):
+        """Delete a body once no URL references it"""
+        in_use = self.db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if in_use is None:
+            try:
+                os.remove(self.object_path(body_hash))
+            except OSError:
+                pass
+
+    def total_bytes(self):
+        """Return the total size of all cached bodies"""
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        if not self.max_bytes:
+            return
+
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+
+        victims = []
+        for entry in self.db.execute("SELECT url, body_hash, size FROM entries ORDER BY last_access"):
+            victims.append(entry)
+            excess -= entry['size']
+            if excess <= 0:
+                break
+
+        self.db.executemany("DELETE FROM entries WHERE url = ?", [(entry['url'],) for entry in victims])
+        self.db.commit()
+
+        for body_hash in {entry['body_hash'] for entry in victims}:
+            self.remove_object_if_unused(body_hash)
+
+        self.stats['evicted'] += len(victims)
+        logger.debug(f"Evicted {len(victims)} cached pages")
+
+    def close(self):
+        """Close the index database"""
+        self.db.close()
@@ -0,0 +1,235 @@
+import csv
+import json
+import logging
+import os
+
+from compact_rows import RecordTable
+
+logger = logging.getLogger(__name__)
+
+# Industry metadata copied onto every flattened record
+FLAT_METADATA_FIELDS = ['naics_code', 'industry_name', 'data_source', 'scrape_date']
+
+def merge_column_kinds(kinds, record):
+    """Widen per-column kinds (int -> float -> string, None while only empty) to fit a record"""
+    for key, value in record.items():
+        kind = 'string' if isinstance(value, str) else 'float' if isinstance(value, float) else 'int' if isinstance(value, int) else None
+        if kind and kinds.get(key) != 'string' and not (kinds.get(key) == 'float' and kind == 'int'):
+            kinds[key] = kind
+        kinds.setdefault(key, None)
+    return kinds
+
+def flatten_records(metadata, endpoint_name, records):
+    """Yield records with the industry metadata prepended, as in the flat CSV"""
+    if isinstance(records, RecordTable):
+        yield from records.iter_flat(metadata['naics_code'], metadata['industry_name'], endpoint_name, metadata['scrape_date'])
+        return
+
+    for record in records:
+        flat_record = {
+            'naics_code': metadata['naics_code'],
+            'industry_name': metadata['industry_name'],
+            'data_source': endpoint_name,
+            'scrape_date': metadata['scrape_date']
+        }
+        flat_record.update(record)
+        yield flat_record
+
+def iter_flat_records(data):
+    """Yield the flattened records of in-memory results, in the order a sink would store them"""
+    for industry in data.values():
+        for endpoint_name, endpoint_info in industry['endpoints'].items():
+            yield from flatten_records(industry['metadata'], endpoint_name, endpoint_info['data'])
+
+def write_nested_json(json_file, data, read_records):
+    """Write the nested per-industry JSON one industry at a time
+
+    data is a sink index or in-memory results; read_records(metadata, endpoint_name,
+    endpoint_info) yields the flattened records of one endpoint. Both kinds of run write
+    their JSON here, so they match byte for byte.
+    """
+    with open(json_file, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for i, (naics_code, industry) in enumerate(data.items()):
+            endpoints = {}
+            for endpoint_name, endpoint_info in industry['endpoints'].items():
+                records = [
+                    {key: value for key, value in flat_record.items() if key not in FLAT_METADATA_FIELDS}
+                    for flat_record in read_records(industry['metadata'], endpoint_name, endpoint_info)
+                ]
+                endpoints[endpoint_name] = {
+                    'url': endpoint_info['url'],
+                    'tables_count': endpoint_info['tables_count'],
+                    'data': records,
+                    'records_count': endpoint_info['records_count']
+                }
+                if 'extractor_version' in endpoint_info:
+                    endpoints[endpoint_name]['extractor_version'] = endpoint_info['extractor_version']
+                if 'alias_of' in endpoint_info:
+                    endpoints[endpoint_name]['alias_of'] = endpoint_info['alias_of']
+
+            industry_json = json.dumps(
+                {'metadata': industry['metadata'], 'endpoints': endpoints},
+                indent=2, ensure_ascii=False, default=str
+            )
+            key_json = json.dumps(naics_code, ensure_ascii=False)
+            f.write(f"{',' if i else ''}\n  {key_json}: {industry_json.replace(chr(10), chr(10) + '  ')}")
+        f.write('\n}' if data else '}')
+
+def write_flat_csv(csv_file, iter_records):
+    """Write the flat CSV in two streaming passes (columns, then rows); iter_records() starts a pass"""
+    columns = {}
+    for flat_record in iter_records():
+        for key in flat_record:
+            columns.setdefault(key, None)
+
+    count = 0
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(columns))
+        writer.writeheader()
+        for flat_record in iter_records():
+            writer.writerow(flat_record)
+            count += 1
+    return count
+
+class RecordSink:
+    """Append-only NDJSON stream of flattened records, indexed by industry and endpoint"""
+    def __init__(self, base_filename="all_canadian_industries", resume=False, index=None, metrics=None):
+        # Optional RunMetrics timing the flatten and write stages
+        self.metrics = metrics
+        self.records_file = f"{base_filename}.records.ndjson"
+        self.index_file = f"{base_filename}.index.json"
+
+        # index: naics_code -> metadata plus per-endpoint url, tables_count,
+        # records_count and the byte offset of its first record in the stream
+        # (and row_dates, each record's last change, after an incremental refresh).
+        # A resumed run may pass an index rebuilt elsewhere (e.g. a JobLedger).
+        self.index = {}
+        if resume and os.path.exists(self.records_file):
+            if index is not None:
+                self.index = index
+            elif os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+        else:
+            resume = False
+
+        self.stream = open(self.records_file, 'ab' if resume else 'wb')
+
+    def write_industry(self, industry_data):
+        """Append an industry's records and return its index entry (without the records)"""
+        metadata = industry_data['metadata']
+        for endpoint_name, endpoint_info in industry_data['endpoints'].items():
+            self.write_endpoint(metadata, endpoint_name, endpoint_info)
+        return self.index.get(metadata['naics_code'])
+
+    def write_endpoint(self, metadata, endpoint_name, endpoint_info):
+        """Append one endpoint's records and return its index entry (without the records)"""
+        offset = self.stream.tell()
+        if self.metrics:
+            # Records are flattened as they are written; each stage gets its own share of the time
+            flat_records = self.metrics.timed_iter('flatten', flatten_records(metadata, endpoint_name, endpoint_info['data']))
+            with self.metrics.timer('write', exclude='flatten'):
+                self.write_lines(flat_records)
+        else:
+            self.write_lines(flatten_records(metadata, endpoint_name, endpoint_info['data']))
+
+        entry = {key: value for key, value in endpoint_info.items() if key != 'data'}
+        entry['offset'] = offset
+
+        industry = self.index.setdefault(metadata['naics_code'], {'metadata': metadata, 'endpoints': {}})
+        industry['endpoints'][endpoint_name] = entry
+        return entry
+
+    def write_lines(self, flat_records):
+        """Append flattened records to the stream, one JSON object per line"""
+        for flat_record in flat_records:
+            line = json.dumps(flat_record, ensure_ascii=False, default=str)
+            self.stream.write(line.encode('utf-8') + b'\n')
+    
+    def sync(self):
+        """Flush appended records to stable storage"""
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+
+    def checkpoint(self):
+        """Make appended records durable, then publish the index that points at them"""
+        self.sync()
+
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, default=str)
+        os.replace(tmp_file, self.index_file)
+
+    def close(self):
+        """Checkpoint and close the record stream"""
+        if not self.stream.closed:
+            self.checkpoint()
+            self.stream.close()
+
+    def iter_endpoint_records(self, reader, endpoint_info):
+        """Read one endpoint's flattened records back from the stream"""
+        reader.seek(endpoint_info['offset'])
+        for _ in range(endpoint_info['records_count']):
+            yield json.loads(reader.readline())
+
+    def iter_records(self):
+        """Yield every indexed flattened record in scrape order"""
+        self.stream.flush()
+        with open(self.records_file, 'rb') as reader:
+            for naics_code, industry in self.index.items():
+                for endpoint_name, endpoint_info in industry['endpoints'].items():
+                    records = self.iter_endpoint_records(reader, endpoint_info)
+                    # An incremental refresh dates each row by when it last changed
+                    row_dates = endpoint_info.get('row_dates')
+                    if row_dates is None:
+                        yield from records
+                        continue
+                    
+                    for flat_record, row_date in zip(records, row_dates):
+                        flat_record['scrape_date'] = row_date
+                        yield flat_record
+
+    def write_json(self, json_file):
+        """Write the nested per-industry JSON one industry at a time"""
+        self.stream.flush()
+        with open(self.records_file, 'rb') as reader:
+            write_nested_json(json_file, self.index, lambda metadata, endpoint_name, endpoint_info: self.iter_endpoint_records(reader, endpoint_info))
+
+    def write_csv(self, csv_file):
+        """Write the flat CSV in two streaming passes (columns, then rows)"""
+        return write_flat_csv(csv_file, self.iter_records)
+
+    def write_parquet(self, parquet_file, row_group_size=50000):
+        """Write the flat records to Parquet, one row group per chunk"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # First pass: settle one Arrow type per column
+        kinds = {}
+        for flat_record in self.iter_records():
+            merge_column_kinds(kinds, flat_record)
+
+        arrow_types = {'string': pa.string(), 'float': pa.float64(), 'int': pa.int64(), None: pa.string()}
+        schema = pa.schema([(key, arrow_types[kind]) for key, kind in kinds.items()])
+        string_columns = {key for key, kind in kinds.items() if kind in ('string', None)}
+
+        count = 0
+        chunk = []
+        with pq.ParquetWriter(parquet_file, schema) as writer:
+            for flat_record in self.iter_records():
+                for key in string_columns:
+                    value = flat_record.get(key)
+                    if value is not None and not isinstance(value, str):
+                        flat_record[key] = str(value)
+                chunk.append(flat_record)
+
+                if len(chunk) >= row_group_size:
+                    writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                    count += len(chunk)
+                    chunk = []
+
+            if chunk:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+        return count
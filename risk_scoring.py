@@ -0,0 +1,210 @@
+import csv
+import json
+import logging
+
+from industry_cube import QUARTILE_COLUMN
+from naics_discovery import naics_level, is_descendant
+
+logger = logging.getLogger(__name__)
+
+# Composite score = hazard × 0.4 + size × 0.3 + geographic × 0.2 + financial stability × 0.1
+DEFAULT_WEIGHTS = {'hazard': 0.4, 'size': 0.3, 'geographic': 0.2, 'financial': 0.1}
+
+# Starting GL hazard relativities by sector; the most specific matching code wins, 1.0 where none does
+DEFAULT_HAZARD = {
+    '11': 1.3, '21': 1.5, '22': 1.2, '23': 1.6, '31-33': 1.3, '41': 1.0, '44-45': 1.1, '48-49': 1.4,
+    '51': 0.7, '52': 0.6, '53': 1.0, '54': 0.7, '55': 0.6, '56': 1.2, '61': 0.9, '62': 1.0,
+    '71': 1.2, '72': 1.2, '81': 1.0, '91': 0.8
+}
+
+# Size class relativities by (lowercase) label fragment, first match wins; today's extraction
+# keeps the micro (1-4 employees) column of the size table under its 'employment size' heading
+DEFAULT_SIZE = (('micro', 0.8), ('employment size', 0.8), ('small', 0.9), ('medium', 1.1), ('large', 1.3))
+
+# Rate tiers as (upper score bound, name); None bounds the last tier from above
+DEFAULT_TIERS = ((0.9, 'preferred'), (1.0, 'standard'), (1.1, 'rated'), (None, 'refer'))
+
+# Performance metric whose quartiles measure profitability
+FINANCIAL_METRIC = 'Net profit/loss'
+
+def check_tiers(tiers):
+    """Raise ValueError unless tier bounds ascend, with only the last one left open (None)"""
+    if not tiers:
+        raise ValueError("At least one rate tier is needed")
+    bounds = [bound for bound, _ in tiers]
+    if None in bounds[:-1]:
+        raise ValueError("Only the last rate tier can have an open (null) upper bound")
+    closed = [bound for bound in bounds if bound is not None]
+    if any(not isinstance(bound, (int, float)) or isinstance(bound, bool) for bound in closed):
+        raise ValueError(f"Rate tier bounds must be numbers: {bounds}")
+    if any(lower >= upper for lower, upper in zip(closed, closed[1:])):
+        raise ValueError(f"Rate tier bounds must ascend: {bounds}")
+
+def load_weight_tables(path):
+    """Read score() keyword arguments (weights, hazard, size, province, tiers) from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tables = json.load(f)
+    unknown = set(tables) - {'weights', 'hazard', 'size', 'province', 'tiers'}
+    if unknown:
+        raise ValueError(f"Unknown weight tables: {', '.join(sorted(unknown))}")
+    if 'size' in tables and isinstance(tables['size'], dict):
+        tables['size'] = tuple(tables['size'].items())
+    if 'tiers' in tables:
+        if any(not isinstance(tier, list) or len(tier) != 2 for tier in tables['tiers']):
+            raise ValueError("Rate tiers must be [upper bound, name] pairs")
+        tables['tiers'] = tuple(tuple(tier) for tier in tables['tiers'])
+        check_tiers(tables['tiers'])
+    return tables
+
+class RiskScorer:
+    """Composite GL risk scores for every industry × province × size-class cell of an IndustryCube
+
+    Cells are the employer counts by size class; geographic concentration is measured on all
+    businesses (employers and non-employers). Factors that come from the data (geographic concentration, financial stability) are
+    computed once; score() only combines them with the weight tables, so rescoring with new
+    weights is a few array operations. Every factor is a relativity around 1.0, and a cell
+    whose industry lacks an endpoint gets the neutral 1.0 for the factors that endpoint feeds.
+    """
+    def __init__(self, cube, financial_metric=FINANCIAL_METRIC):
+        import numpy as np
+
+        self.np = np
+        self.cube = cube
+        self.codes = cube.dims['codes']
+        self.provinces = cube.dims['provinces']
+        self.size_classes = cube.dims['size_classes']
+
+        self.present = ~np.isnan(np.asarray(cube.employers_by_size))
+        businesses = np.asarray(cube.businesses)
+
+        # Geographic: location quotient of each industry in each province, against the
+        # provincial spread of all sectors (roll-ups would count businesses twice)
+        by_province = np.nansum(businesses, axis=2)
+        sectors = np.array([naics_level(naics_code) == 2 for naics_code in self.codes], dtype=bool)
+        overall = by_province[sectors].sum(axis=0) if sectors.any() and by_province[sectors].sum() else by_province.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            province_share = overall / overall.sum()
+            industry_share = by_province / by_province.sum(axis=1, keepdims=True)
+            quotient = industry_share / province_share
+        self.geographic = np.clip(np.where(np.isfinite(quotient), quotient, 1.0), 0.5, 2.0)
+
+        # Financial stability: less profitable industries (mean margin across quartiles) rank riskier
+        self.financial = np.ones(len(self.codes))
+        quartiles = [i for quartile, i in cube.quartiles.items() if QUARTILE_COLUMN.search(quartile)]
+        if financial_metric in cube.metrics and quartiles and len(self.codes):
+            margins = np.asarray(cube.performance[:, cube.metrics[financial_metric], quartiles])
+            reported = ~np.isnan(margins).all(axis=1)
+            if reported.any():
+                mean_margins = np.nanmean(margins[reported], axis=1)
+                ranks = mean_margins.argsort(kind='stable').argsort()
+                self.financial[reported] = 1.5 - ranks / max(len(ranks) - 1, 1)
+        else:
+            logger.warning(f"⚠️ No '{financial_metric}' performance data; financial stability is neutral")
+
+    def hazard_factors(self, hazard):
+        """Return the hazard relativity of every code: the most specific matching entry, else 1.0"""
+        factors = self.np.ones(len(self.codes))
+        entries = sorted(hazard.items(), key=lambda item: naics_level(item[0]), reverse=True)
+        for i, naics_code in enumerate(self.codes):
+            for parent_code, factor in entries:
+                if naics_code == parent_code or is_descendant(naics_code, parent_code):
+                    factors[i] = factor
+                    break
+        return factors
+
+    def size_factors(self, size):
+        """Return the relativity of every size class: the first label fragment it contains, else 1.0"""
+        factors = self.np.ones(len(self.size_classes))
+        for i, size_class in enumerate(self.size_classes):
+            for fragment, factor in size:
+                if fragment.lower() in size_class.lower():
+                    factors[i] = factor
+                    break
+        return factors
+
+    def score(self, weights=None, hazard=None, size=None, province=None, tiers=None):
+        """Score every cell in one broadcast pass
+
+        weights override DEFAULT_WEIGHTS by factor name; hazard ({naics_code: factor}), size
+        ((label fragment, factor) pairs) and tiers ((upper bound, name) pairs) replace the
+        defaults; province ({province: factor}) scales the geographic factor.
+        """
+        np = self.np
+        weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        unknown = set(weights) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown score weights: {', '.join(sorted(unknown))}")
+        tiers = DEFAULT_TIERS if tiers is None else tiers
+        check_tiers(tiers)
+
+        hazard_factors = self.hazard_factors(DEFAULT_HAZARD if hazard is None else hazard)
+        size_factors = self.size_factors(DEFAULT_SIZE if size is None else size)
+        province_factors = np.array([(province or {}).get(name, 1.0) for name in self.provinces])
+
+        scores = (
+            weights['hazard'] * hazard_factors[:, None, None]
+            + weights['size'] * size_factors[None, None, :]
+            + weights['geographic'] * (self.geographic * province_factors[None, :])[:, :, None]
+            + weights['financial'] * self.financial[:, None, None]
+        )
+        scores = np.where(self.present, scores, np.nan)
+
+        # Tier index per cell, -1 where no employer count was published
+        bounds = np.array([np.inf if bound is None else bound for bound, _ in tiers])
+        tier_index = np.searchsorted(bounds, np.where(self.present, scores, 0.0), side='left')
+        tier_index = np.where(self.present, np.minimum(tier_index, len(tiers) - 1), -1).astype(np.int8)
+
+        return RiskScores(self, scores, tier_index, [name for _, name in tiers])
+
+class RiskScores:
+    """Scores and rate tiers of every cell, indexed like the cube's employers_by_size array"""
+    def __init__(self, scorer, scores, tier_index, tier_names):
+        self.scorer = scorer
+        self.scores = scores
+        self.tier_index = tier_index
+        self.tier_names = tier_names
+
+    def cell(self, naics_code, province, size_class):
+        """Return (score, tier name) of one cell, (nan, None) if it has no employer count"""
+        cube = self.scorer.cube
+        position = (cube.position('codes', naics_code), cube.position('provinces', province), cube.position('size_classes', size_class))
+        tier = self.tier_index[position]
+        return float(self.scores[position]), self.tier_names[tier] if tier >= 0 else None
+
+    def tier_counts(self, naics_codes=None):
+        """Return {tier name: scored cells}, optionally only for the given codes"""
+        np = self.scorer.np
+        tier_index = self.tier_index
+        if naics_codes is not None:
+            tier_index = tier_index[np.array([naics_code in naics_codes for naics_code in self.scorer.codes], dtype=bool)]
+        counts = np.bincount(tier_index[tier_index >= 0].ravel(), minlength=len(self.tier_names))
+        return dict(zip(self.tier_names, counts.tolist()))
+
+    def rows(self, naics_codes=None):
+        """Yield one dict per scored cell, optionally only for the given codes"""
+        np = self.scorer.np
+        codes = self.scorer.codes
+        industry_names = self.scorer.cube.dims['industry_names']
+        for i, j, k in zip(*np.nonzero(self.tier_index >= 0)):
+            if naics_codes is not None and codes[i] not in naics_codes:
+                continue
+            yield {
+                'naics_code': codes[i],
+                'industry_name': industry_names[i],
+                'province': self.scorer.provinces[j],
+                'size_class': self.scorer.size_classes[k],
+                'employers': float(self.scorer.cube.employers_by_size[i, j, k]),
+                'score': round(float(self.scores[i, j, k]), 4),
+                'tier': self.tier_names[self.tier_index[i, j, k]]
+            }
+
+    def write_csv(self, csv_file, naics_codes=None):
+        """Write the scored cells as CSV and return how many were written"""
+        count = 0
+        with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['naics_code', 'industry_name', 'province', 'size_class', 'employers', 'score', 'tier'])
+            writer.writeheader()
+            for row in self.rows(naics_codes):
+                writer.writerow(row)
+                count += 1
+        return count
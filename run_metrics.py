@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages timed by the scraper, in pipeline order
+STAGES = ['fetch', 'parse', 'extract', 'flatten', 'write', 'sleep']
+
+class RunMetrics:
+    """Per-stage timers and counters of a scrape run, published live as Prometheus text or JSON"""
+    def __init__(self, path=None, interval=2.0, prefix='cis_scraper'):
+        # Format follows the extension: .json for JSON, anything else Prometheus text
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self.started = time.time()
+        self.last_published = 0.0
+
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        # (name, labels) -> value; labels is a sorted tuple of (key, value)
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def timer(self, stage, exclude=None):
+        """Time a block as one call of a stage, less the time an excluded stage spent inside it"""
+        started = time.perf_counter()
+        excluded_before = self.stage_seconds.get(exclude, 0.0)
+        try:
+            yield
+        finally:
+            excluded = self.stage_seconds.get(exclude, 0.0) - excluded_before
+            self.observe(stage, time.perf_counter() - started - excluded)
+
+    def timed_iter(self, stage, iterable):
+        """Yield from an iterable, timing the work of producing its items as one call of a stage"""
+        iterator = iter(iterable)
+        seconds = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - started
+                yield item
+        finally:
+            self.observe(stage, seconds)
+
+    def observe(self, stage, seconds):
+        """Add a call of a stage that took seconds"""
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self):
+        """Return every metric as a JSON-serializable dict"""
+        def grouped(values):
+            metrics = {}
+            for (name, labels), value in values.items():
+                if labels:
+                    metrics.setdefault(name, {})[','.join(f"{key}={label}" for key, label in labels)] = value
+                else:
+                    metrics[name] = value
+            return metrics
+
+        return {
+            'updated_at': time.time(),
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'stages': {
+                stage: {'seconds': round(self.stage_seconds[stage], 6), 'calls': self.stage_calls[stage]}
+                for stage in self.stage_seconds
+            },
+            'counters': grouped(self.counters),
+            'gauges': grouped(self.gauges)
+        }
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        def sample(name, labels, value):
+            label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+            return f"{self.prefix}_{name}{{{label_text}}} {value}" if labels else f"{self.prefix}_{name} {value}"
+
+        lines = [
+            f"# TYPE {self.prefix}_uptime_seconds gauge",
+            sample('uptime_seconds', (), round(time.time() - self.started, 3)),
+            f"# TYPE {self.prefix}_stage_seconds_total counter"
+        ]
+        lines += [sample('stage_seconds_total', (('stage', stage),), round(seconds, 6)) for stage, seconds in self.stage_seconds.items()]
+        lines.append(f"# TYPE {self.prefix}_stage_calls_total counter")
+        lines += [sample('stage_calls_total', (('stage', stage),), calls) for stage, calls in self.stage_calls.items()]
+
+        for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+            typed = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+                    typed.add(name)
+                lines.append(sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+    def publish(self, force=False):
+        """Rewrite the metrics file atomically, at most once per interval unless forced"""
+        if not self.path or (not force and time.time() - self.last_published < self.interval):
+            return
+
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            if self.path.endswith('.json'):
+                json.dump(self.snapshot(), f, indent=2)
+            else:
+                f.write(self.prometheus_text())
+        os.replace(tmp_file, self.path)
+        self.last_published = time.time()
+
+@contextmanager
+def profiled(profile_file=None, trace_memory=False, top=15):
+    """Optionally run a block under cProfile and/or tracemalloc, reporting when it ends"""
+    profiler = None
+    if profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    try:
+        yield
+    finally:
+        if profiler:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            logger.info(f"🔬 cProfile stats written to {profile_file}")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            logger.info(f"🔬 tracemalloc: {current / 1024 / 1024:.1f} MB live, {peak / 1024 / 1024:.1f} MB peak")
+            for stat in snapshot.statistics('lineno')[:top]:
+                logger.info(f"   {stat}")
@@ -0,0 +1,141 @@
+import heapq
+import time
+
+from naics_discovery import naics_level
+
+def format_duration(seconds):
+    """Format seconds as 1h02m, 3m05s or 42s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def format_bytes(count):
+    """Format a byte count as KB, MB or GB"""
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+class RunStats:
+    """Running aggregates of a scrape, updated as each industry completes, so reports need no pass over the data"""
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.started = time.time()
+
+        # naics_code -> (records, level, endpoint names, aliased endpoint names); an industry
+        # counted again (e.g. completed after a resume) replaces its earlier contribution
+        self.industries = {}
+        self.industry_names = {}
+        self.records = 0
+        self.endpoint_industries = {}
+        self.endpoint_records = {}
+        self.level_industries = {}
+        self.level_records = {}
+        self.aliased_endpoints = 0
+        self.pure_duplicates = {}
+
+        # Min-heap of the top_n (records, naics_code); rebuilt only after a replacement
+        self.top = []
+        self.top_stale = False
+
+        # Throughput of this run only
+        self.pages = 0
+        self.run_records = 0
+        self.bytes_downloaded = 0
+
+    @classmethod
+    def from_index(cls, data, top_n=10):
+        """Aggregate a sink index or in-memory results in one pass"""
+        stats = cls(top_n)
+        for naics_code, industry in data.items():
+            stats.add_industry(naics_code, industry, count_run=False)
+        return stats
+
+    def add_page(self):
+        """Count a fetched, cached or archived page"""
+        self.pages += 1
+
+    def add_download(self, byte_count):
+        """Count bytes downloaded from the network"""
+        self.bytes_downloaded += byte_count
+
+    def add_industry(self, naics_code, industry, count_run=True):
+        """Fold one industry's endpoints ({metadata, endpoints}) into the aggregates"""
+        endpoints = industry['endpoints']
+        records = sum(endpoint_info['records_count'] for endpoint_info in endpoints.values())
+        aliases = {endpoint_name: endpoint_info['alias_of'] for endpoint_name, endpoint_info in endpoints.items() if 'alias_of' in endpoint_info}
+        level = naics_level(naics_code)
+
+        previous = self.industries.get(naics_code)
+        if previous:
+            self.remove_industry(naics_code, *previous)
+        if count_run:
+            self.run_records += max(records - (previous[0] if previous else 0), 0)
+
+        endpoint_counts = tuple((endpoint_name, endpoint_info['records_count']) for endpoint_name, endpoint_info in endpoints.items())
+        self.industries[naics_code] = (records, level, endpoint_counts, len(aliases))
+        self.industry_names[naics_code] = industry['metadata']['industry_name']
+        self.records += records
+        self.level_industries[level] = self.level_industries.get(level, 0) + 1
+        self.level_records[level] = self.level_records.get(level, 0) + records
+        for endpoint_name, endpoint_info in endpoints.items():
+            self.endpoint_industries[endpoint_name] = self.endpoint_industries.get(endpoint_name, 0) + 1
+            self.endpoint_records[endpoint_name] = self.endpoint_records.get(endpoint_name, 0) + endpoint_info['records_count']
+        self.aliased_endpoints += len(aliases)
+        if endpoints and len(aliases) == len(endpoints):
+            self.pure_duplicates[naics_code] = sorted(set(aliases.values()))
+
+        # Aliases hold no records of their own, so mirrored codes do not crowd the top list
+        if records and not self.top_stale:
+            if len(self.top) < self.top_n:
+                heapq.heappush(self.top, (records, naics_code))
+            elif (records, naics_code) > self.top[0]:
+                heapq.heapreplace(self.top, (records, naics_code))
+
+    def remove_industry(self, naics_code, records, level, endpoint_counts, alias_count):
+        """Take an industry's earlier contribution out of the aggregates"""
+        self.records -= records
+        self.level_industries[level] -= 1
+        self.level_records[level] -= records
+        for endpoint_name, endpoint_records in endpoint_counts:
+            self.endpoint_industries[endpoint_name] -= 1
+            self.endpoint_records[endpoint_name] -= endpoint_records
+        self.aliased_endpoints -= alias_count
+        self.pure_duplicates.pop(naics_code, None)
+        # The heap cannot drop an entry cheaply; rebuild it when the report asks
+        self.top_stale = True
+
+    def top_industries(self):
+        """Return [(records, naics_code, industry_name)] of the largest industries, largest first"""
+        if self.top_stale:
+            self.top = heapq.nlargest(self.top_n, (
+                (records, naics_code) for naics_code, (records, _, _, _) in self.industries.items() if records
+            ))
+            heapq.heapify(self.top)
+            self.top_stale = False
+        return [(records, naics_code, self.industry_names[naics_code]) for records, naics_code in sorted(self.top, reverse=True)]
+
+    def rates(self):
+        """Return (pages/s, records/s) of this run"""
+        elapsed = max(time.time() - self.started, 1e-9)
+        return self.pages / elapsed, self.run_records / elapsed
+
+    def eta_seconds(self, processed, total):
+        """Estimate the seconds left from the pace so far, or None before the first industry"""
+        if not processed:
+            return None
+        return max(total - processed, 0) * (time.time() - self.started) / processed
+
+    def progress_line(self, processed, total):
+        """Return a one-line progress summary with throughput and ETA"""
+        pages_per_second, records_per_second = self.rates()
+        eta = self.eta_seconds(processed, total)
+        return (
+            f"📈 Progress: {processed}/{total} ({processed / total * 100 if total else 100:.0f}%)"
+            f" | {pages_per_second:.1f} pages/s, {records_per_second:.1f} records/s, {format_bytes(self.bytes_downloaded)} downloaded"
+            f" | ETA {format_duration(eta) if eta is not None else '?'}"
+        )
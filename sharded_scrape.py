@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from all_industries_scraper import AllIndustriesScraper
+from page_cache import PageCache
+from record_sink import RecordSink, FLAT_METADATA_FIELDS
+from work_queue import WorkQueue, default_worker_id
+
+logger = logging.getLogger(__name__)
+
+def worker_output(base_filename, worker):
+    """Return the base filename of a worker's partial output"""
+    return f"{base_filename}.worker-{worker}"
+
+def finish_leased(queue, worker, scraper, naics_code, industry_data):
+    """Make a worker's records durable, then mark the code finished in the shared queue"""
+    scraper.sink.checkpoint()
+    if isinstance(industry_data, Exception):
+        logger.error(f"❌ Error processing {naics_code}: {industry_data}")
+        queue.complete(worker, naics_code, 'failed', str(industry_data))
+    elif not queue.complete(worker, naics_code):
+        logger.warning(f"⚠️ Lease on {naics_code} was lost; another worker owns it now")
+
+async def renew_leases(queue, worker, leased):
+    """Renew a worker's leases every third of the lease length until cancelled"""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        queue.renew(worker, leased)
+
+async def work_async(queue, worker, scraper, batch_size, shard, steal, poll_interval):
+    """Lease and scrape batches concurrently until the queue has no open work"""
+    async with scraper.create_async_client() as client:
+        while True:
+            leased = queue.lease(worker, batch_size, shard, steal)
+            if not leased:
+                if not queue.has_open_work():
+                    return
+                # Other workers hold the rest; wait for them or for their leases to expire
+                await asyncio.sleep(poll_interval)
+                continue
+
+            batch = [(naics_code, industry_name, list(scraper.endpoints)) for naics_code, industry_name in leased.items()]
+            # The whole batch is in flight at once; keep its leases alive until it comes back
+            renewer = asyncio.create_task(renew_leases(queue, worker, leased))
+            try:
+                results = await scraper.scrape_batch_async(client, batch)
+            finally:
+                renewer.cancel()
+            for naics_code, industry_data in results:
+                finish_leased(queue, worker, scraper, naics_code, industry_data)
+                queue.renew(worker, leased)
+
+def run_worker(queue, worker, scraper, batch_size=10, shard=None, steal=True, concurrent=False, poll_interval=5.0):
+    """Scrape leased industries into the worker's own sink until the queue has no open work"""
+    logger.info(f"👷 Worker {worker} starting" + (f" on shard {shard}" if shard is not None else ""))
+
+    if concurrent:
+        asyncio.run(work_async(queue, worker, scraper, batch_size, shard, steal, poll_interval))
+    else:
+        while True:
+            leased = queue.lease(worker, batch_size, shard, steal)
+            if not leased:
+                if not queue.has_open_work():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            for naics_code, industry_name in leased.items():
+                try:
+                    industry_data = scraper.scrape_single_industry(naics_code, industry_name)
+                except Exception as e:
+                    industry_data = e
+                finish_leased(queue, worker, scraper, naics_code, industry_data)
+
+                # Each finished industry shows the worker is alive
+                queue.renew(worker, leased)
+
+    logger.info(f"👷 Worker {worker} done: {queue.status_counts()}")
+
+def merge_outputs(queue, base_filename):
+    """Combine worker partial outputs into one RecordSink, in queue order whatever the worker timing"""
+    sink = RecordSink(base_filename)
+    indexes = {}
+    readers = {}
+    try:
+        done_codes = queue.done_codes()
+        for naics_code, worker in done_codes:
+            if worker not in indexes:
+                partial = worker_output(base_filename, worker)
+                with open(f"{partial}.index.json", 'r', encoding='utf-8') as f:
+                    indexes[worker] = json.load(f)
+                readers[worker] = open(f"{partial}.records.ndjson", 'rb')
+
+        # Workers dedupe only what they saw themselves; find the stored copy of every table set
+        stored_copies = {}
+        for naics_code, worker in done_codes:
+            for endpoint_name, endpoint_info in indexes[worker].get(naics_code, {'endpoints': {}})['endpoints'].items():
+                if 'fingerprint' in endpoint_info and 'alias_of' not in endpoint_info:
+                    stored_copies.setdefault((endpoint_name, endpoint_info['fingerprint']), (worker, endpoint_info))
+
+        # The first code in queue order keeps the records, later ones become its aliases
+        canonical_codes = {}
+        for naics_code, worker in done_codes:
+            # Codes without data have no index entry
+            industry = indexes[worker].get(naics_code)
+            if industry is None:
+                continue
+
+            for endpoint_name, endpoint_info in industry['endpoints'].items():
+                source = (worker, endpoint_info)
+                if 'fingerprint' in endpoint_info:
+                    table_key = (endpoint_name, endpoint_info['fingerprint'])
+                    canonical_code = canonical_codes.setdefault(table_key, naics_code)
+                    entry = {name: value for name, value in endpoint_info.items() if name != 'alias_of'}
+                    if canonical_code != naics_code:
+                        sink.write_endpoint(industry['metadata'], endpoint_name, dict(entry, data=[], records_count=0, alias_of=canonical_code))
+                        continue
+                    source = stored_copies.get(table_key, source)
+                    endpoint_info = dict(entry, records_count=source[1]['records_count'], extractor_version=source[1]['extractor_version'])
+
+                records = [
+                    {key: value for key, value in flat_record.items() if key not in FLAT_METADATA_FIELDS}
+                    for flat_record in sink.iter_endpoint_records(readers[source[0]], source[1])
+                ]
+                sink.write_endpoint(industry['metadata'], endpoint_name, dict(endpoint_info, data=records))
+    finally:
+        for reader in readers.values():
+            reader.close()
+
+    sink.checkpoint()
+    logger.info(f"🔀 Merged {len(sink.index)} industries from {len(indexes)} workers")
+    return sink
+
+def spawn_workers(args, count, round_number):
+    """Start local worker processes, one per shard"""
+    processes = []
+    for shard in range(count):
+        command = [
+            sys.executable, os.path.abspath(__file__), 'worker',
+            '--queue', args.queue, '--output', args.output, '--worker-id', f"local{shard}",
+            '--shard', str(shard), '--batch-size', str(args.batch_size),
+            '--rps', str(args.rps), '--max-in-flight', str(args.max_in_flight), '--parser', args.parser,
+            '--cache-dir', args.cache_dir, '--lease-seconds', str(args.lease_seconds)
+        ]
+        if args.concurrent:
+            command.append('--concurrent')
+        if args.no_cache:
+            command.append('--no-cache')
+        processes.append(subprocess.Popen(command))
+    logger.info(f"🚀 Round {round_number}: started {count} local workers")
+    return processes
+
+def add_scraper_arguments(parser):
+    """Add the options every command that scrapes shares"""
+    parser.add_argument('--queue', default="work_queue.sqlite", help="shared queue database (on storage every node can reach)")
+    parser.add_argument('--output', default="all_canadian_industries", help="base filename of the merged outputs; partial outputs go next to it")
+    parser.add_argument('--batch-size', type=int, default=10, help="industries leased at a time")
+    parser.add_argument('--concurrent', action='store_true', help="fetch each leased batch concurrently")
+    parser.add_argument('--rps', type=float, default=5.0, help="ceiling for adaptive requests per second per worker")
+    parser.add_argument('--max-in-flight', type=int, default=10, help="ceiling for concurrent requests per worker")
+    parser.add_argument('--parser', choices=['auto', 'lxml', 'bs4'], default='auto', help="HTML table parser backend")
+    parser.add_argument('--cache-dir', default="http_cache", help="page cache shared by the workers")
+    parser.add_argument('--no-cache', action='store_true', help="always download pages")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded coordinator/worker scraping over a shared SQLite work queue")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinate = commands.add_parser('coordinate', help="queue every NAICS code, optionally run local workers, then merge")
+    add_scraper_arguments(coordinate)
+    coordinate.add_argument('--shards', type=int, default=4, help="number of shards (and local workers)")
+    coordinate.add_argument('--shard-by', choices=['hash', 'sector'], default='hash', help="spread codes by stable hash or keep NAICS sectors together")
+    coordinate.add_argument('--naics-cache', default=None, help="queue the codes of a cached NAICS discovery hierarchy instead of the built-in list")
+    coordinate.add_argument('--lease-seconds', type=float, default=600, help="requeue an industry if its worker has not finished it by then")
+    coordinate.add_argument('--no-local-workers', action='store_true', help="only queue the work; workers on other nodes run 'worker' and 'merge' follows")
+    coordinate.add_argument('--rounds', type=int, default=3, help="times to restart local workers while work is left (e.g. after crashes)")
+    coordinate.add_argument('--fresh', action='store_true', help="discard the queue and partial outputs and start over")
+    coordinate.add_argument('--parquet', action='store_true', help="also write the merged flat records as Parquet")
+
+    worker = commands.add_parser('worker', help="lease and scrape industries until the queue is drained")
+    add_scraper_arguments(worker)
+    worker.add_argument('--worker-id', default=None, help="stable id so a restarted worker resumes its partial output")
+    worker.add_argument('--shard', type=int, default=None, help="prefer this shard (default: any)")
+    worker.add_argument('--no-steal', action='store_true', help="never take work from other shards")
+    worker.add_argument('--lease-seconds', type=float, default=600, help="lease length; keep equal to the coordinator's")
+
+    merge = commands.add_parser('merge', help="merge finished partial outputs into the usual JSON/CSV outputs")
+    merge.add_argument('--queue', default="work_queue.sqlite", help="shared queue database")
+    merge.add_argument('--output', default="all_canadian_industries", help="base filename of the outputs")
+    merge.add_argument('--parquet', action='store_true', help="also write the flat records as Parquet")
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        worker_id = args.worker_id or default_worker_id()
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+        cache = None if args.no_cache else PageCache(args.cache_dir)
+        partial = worker_output(args.output, worker_id)
+        sink = RecordSink(partial, resume=True)
+        scraper = AllIndustriesScraper(
+            requests_per_second=args.rps, max_in_flight=args.max_in_flight,
+            cache=cache, parser_backend=args.parser, sink=sink
+        )
+        run_worker(queue, worker_id, scraper, args.batch_size, args.shard, not args.no_steal, args.concurrent)
+        sink.close()
+        if cache:
+            cache.close()
+        queue.close()
+        sys.exit(0)
+
+    queue = WorkQueue(args.queue, lease_seconds=getattr(args, 'lease_seconds', 600))
+
+    if args.command == 'coordinate':
+        if args.fresh:
+            queue.reset()
+            for name in os.listdir(os.path.dirname(os.path.abspath(args.output))):
+                if name.startswith(f"{os.path.basename(args.output)}.worker-"):
+                    os.remove(os.path.join(os.path.dirname(os.path.abspath(args.output)), name))
+
+        if args.naics_cache:
+            with open(args.naics_cache, 'r', encoding='utf-8') as f:
+                naics_codes = {naics_code: entry['name'] for naics_code, entry in json.load(f)['codes'].items()}
+        else:
+            naics_codes = AllIndustriesScraper().all_naics_codes
+        queue.enqueue(naics_codes, args.shards, args.shard_by)
+        queue.requeue_failed()
+        print(f"📋 Queued {len(naics_codes)} industries in {args.shards} shards by {args.shard_by}: {queue.status_counts()}")
+
+        if args.no_local_workers:
+            sys.exit(0)
+
+        for round_number in range(1, args.rounds + 1):
+            processes = spawn_workers(args, args.shards, round_number)
+            exit_codes = [process.wait() for process in processes]
+            if not queue.has_open_work():
+                break
+            logger.warning(f"⚠️ Work left after round {round_number} (worker exit codes {exit_codes})")
+
+    counts = queue.status_counts()
+    print(f"📒 Queue: {counts['done']} done, {counts['failed']} failed, {counts['pending'] + counts['leased']} unfinished")
+
+    # Merge and assemble the same outputs as a single-process run
+    sink = merge_outputs(queue, args.output)
+    scraper = AllIndustriesScraper(sink=sink)
+    record_count = scraper.save_all_data(sink.index, args.output, parquet=args.parquet)
+    print(f"\n✅ SUCCESS: Merged {len(sink.index)} industries with {record_count:,} total records!")
+    sink.close()
+    queue.close()
@@ -0,0 +1,191 @@
+import codecs
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Text inside these elements is not part of a cell's visible text
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Charset declarations in a page head or a Content-Type header
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+# Elements an unclosed cell or row is implicitly closed by, and what bounds the search
+TABLE_STRUCTURE = ('table', 'tr', 'td', 'th')
+
+def decode_with(content, encoding):
+    """Decode with a declared encoding, or None if Python does not know it"""
+    try:
+        return content.decode(encoding, 'replace')
+    except LookupError:
+        return None
+
+def decode_page(content, encoding=None):
+    """Decode page bytes: declared encoding, BOM, UTF-8 if valid, <meta charset>, then Windows-1252
+
+    Both backends parse the same text, so a page without a charset declaration cannot come
+    out UTF-8 from one and Latin-1 from the other.
+    """
+    if isinstance(content, str):
+        return content
+
+    text = decode_with(content, encoding) if encoding else None
+    if text is not None:
+        return text
+    if content.startswith(codecs.BOM_UTF8):
+        return content[len(codecs.BOM_UTF8):].decode('utf-8', 'replace')
+    if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return content.decode('utf-16', 'replace')
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+
+    match = META_CHARSET.search(content[:4096])
+    text = decode_with(content, match.group(1).decode('ascii')) if match else None
+    return text if text is not None else content.decode('cp1252', 'replace')
+
+def utf8_body(content, content_type):
+    """Re-encode a downloaded body as UTF-8 when its Content-Type header declares another charset
+
+    Cached and archived pages are then decoded the same way whether or not the header is at hand.
+    """
+    match = HEADER_CHARSET.search(content_type or '')
+    if not match:
+        return content
+    try:
+        encoding = codecs.lookup(match.group(1)).name
+    except LookupError:
+        return content
+    if encoding == 'utf-8':
+        return content
+    return content.decode(encoding, 'replace').encode('utf-8')
+
+class SoupTableParser:
+    """BeautifulSoup backend that only builds <table> subtrees"""
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        self.beautiful_soup = BeautifulSoup
+        self.strainer = SoupStrainer('table')
+        self.link_strainer = SoupStrainer('a', href=True)
+
+    def parse_tables(self, content):
+        """Return every table on the page as rows of stripped cell texts"""
+        soup = self.beautiful_soup(decode_page(content), 'html.parser', parse_only=self.strainer)
+        self.close_implied_tags(soup)
+
+        tables = []
+        for table in soup.find_all('table'):
+            tables.append([
+                [cell.get_text(strip=True) for cell in row.find_all(['th', 'td'])]
+                for row in table.find_all('tr')
+            ])
+        return tables
+
+    def parse_links(self, content):
+        """Return every link on the page as (href, stripped text)"""
+        soup = self.beautiful_soup(decode_page(content), 'html.parser', parse_only=self.link_strainer)
+        return [(link['href'], link.get_text(strip=True)) for link in soup.find_all('a', href=True)]
+
+    def close_implied_tags(self, soup):
+        """Move cells and rows that html.parser nested inside an unclosed cell or row out beside it
+
+        A browser (and libxml2) ends an open cell at the next cell and an open row at the next
+        row; html.parser instead nests them, repeating their text in every enclosing cell.
+        """
+        for element in soup.find_all(['tr', 'td', 'th']):
+            container = element.find_parent(TABLE_STRUCTURE)
+            if container is None or container.name == 'table' or (container.name == 'tr' and element.name != 'tr'):
+                continue
+
+            # A cell goes after the open cell, a row after the open row
+            anchor = container
+            if element.name == 'tr' and container.name != 'tr':
+                anchor = container.find_parent('tr') or container
+
+            previous = anchor
+            for node in [element] + list(element.next_siblings):
+                node.extract()
+                previous.insert_after(node)
+                previous = node
+
+class LxmlTableParser:
+    """lxml backend that walks only <table> elements of the libxml2 tree"""
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+
+        self.document_fromstring = lxml.html.document_fromstring
+        self.parser_error = etree.ParserError
+
+    def parse_tables(self, content):
+        """Return every table on the page as rows of stripped cell texts"""
+        try:
+            document = self.document_fromstring(self.page_text(content))
+        except self.parser_error:
+            # Empty or whitespace-only document
+            return []
+
+        tables = []
+        for table in document.iter('table'):
+            tables.append([
+                [self.cell_text(cell) for cell in row.iter('th', 'td')]
+                for row in table.iter('tr')
+            ])
+        return tables
+
+    def parse_links(self, content):
+        """Return every link on the page as (href, stripped text)"""
+        try:
+            document = self.document_fromstring(self.page_text(content))
+        except self.parser_error:
+            return []
+
+        return [(link.get('href'), self.cell_text(link)) for link in document.iter('a') if link.get('href') is not None]
+
+    def page_text(self, content):
+        """Decode a page like the BeautifulSoup backend; lxml rejects text with an XML encoding declaration"""
+        return XML_DECLARATION.sub('', decode_page(content), count=1)
+
+    def cell_text(self, element):
+        """Join stripped text nodes like BeautifulSoup's get_text(strip=True)"""
+        parts = []
+        self.collect_text(element, parts)
+        return ''.join(parts)
+
+    def collect_text(self, element, parts):
+        """Append the stripped text nodes under element, skipping comments and scripts"""
+        if isinstance(element.tag, str) and element.tag not in NON_TEXT_TAGS:
+            if element.text:
+                text = element.text.strip()
+                if text:
+                    parts.append(text)
+
+            for child in element:
+                self.collect_text(child, parts)
+                if child.tail:
+                    tail = child.tail.strip()
+                    if tail:
+                        parts.append(tail)
+
+def get_table_parser(backend='auto'):
+    """Return a table parser for 'lxml', 'bs4' or 'auto' (lxml when installed)"""
+    if backend in ('auto', 'lxml'):
+        try:
+            return LxmlTableParser()
+        except ImportError:
+            if backend == 'lxml':
+                raise
+            logger.info("lxml not installed, parsing tables with BeautifulSoup")
+
+    if backend in ('auto', 'bs4'):
+        return SoupTableParser()
+
+    raise ValueError(f"Unknown parser backend: {backend}")
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The scraper modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def fixture_page(name):
+    """Return the bytes of a saved fixture page"""
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
@@ -0,0 +1,88 @@
+import http.server
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+from conftest import fixture_page
+
+# Fixture page served for each CIS endpoint; any other endpoint is a 404
+ENDPOINT_PAGES = {
+    'businesses-entreprises': 'businesses.html',
+    'performance': 'performance.html',
+    'summary-sommaire': 'summary.html'
+}
+
+def fixture_endpoint_page(endpoint, naics_code):
+    """Return the fixture page of an endpoint, the same for every code"""
+    page = ENDPOINT_PAGES.get(endpoint)
+    return fixture_page(page) if page else None
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, time.monotonic()))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fault = server.faults[self.path].popleft() if server.faults[self.path] else None
+        try:
+            time.sleep(server.latency)
+            if fault:
+                self.respond(*fault)
+                return
+
+            match = re.match(r'.*/([^/]+)/([\d-]+)$', self.path)
+            body = server.page(*match.groups()) if match else None
+            if body is None:
+                self.respond(404)
+            else:
+                self.respond(200, {'Content-Type': 'text/html; charset=utf-8'}, body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self, status, headers=None, body=b''):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """Local CIS stand-in serving page(endpoint, naics_code) bodies, with scripted faults per path"""
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, page=fixture_endpoint_page):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.page = page
+        self.lock = threading.Lock()
+        self.faults = defaultdict(deque)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}/app/ixb/cis"
+
+    def fail(self, path, status, headers=None, times=1):
+        """Answer the next requests for a path (below /app/ixb/cis) with an error status"""
+        for _ in range(times):
+            self.faults[f"/app/ixb/cis/{path}"].append((status, headers or {}))
+
+    def hits(self, path):
+        """Return how many requests a path (below /app/ixb/cis) got"""
+        return sum(1 for request_path, _ in self.requests if request_path == f"/app/ixb/cis/{path}")
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
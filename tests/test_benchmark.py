@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from benchmark import run_benchmark, synthetic_pages
+
+CODES = {'11': 'Agriculture', '21': 'Mining', '22': 'Utilities'}
+
+@pytest.mark.parametrize('in_memory', [False, True])
+def test_benchmark_leaves_the_working_directory_alone(tmp_path, monkeypatch, in_memory):
+    monkeypatch.chdir(tmp_path)
+    result = run_benchmark(synthetic_pages(CODES), CODES, latency=0, batch_size=2, in_memory=in_memory)
+    assert os.listdir(tmp_path) == []
+    assert not any(name.endswith('progress.json') or name.startswith('batch_') for name in result['output_files'])
+    assert result['output_bytes'] > 0
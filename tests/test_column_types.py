@@ -0,0 +1,48 @@
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from conftest import fixture_page
+
+@pytest.fixture
+def scraper():
+    return AllIndustriesScraper(parser_backend='bs4')
+
+def test_numeric_headers_and_province_columns_skip_the_vote(scraper):
+    column_types, conclusive = scraper.infer_column_types(['Province/territory', 'Employers'], [['Ontario', 'X']])
+    assert column_types == [False, True]
+    assert conclusive
+
+def test_columns_need_a_strict_majority_of_numbers(scraper):
+    headers = ['Region', 'Notes', 'Count']
+    sample_rows = [['North', 'Employers', '1,024'], ['South', '2,304', '$87'], ['East', 'X', '12%']]
+    column_types, conclusive = scraper.infer_column_types(headers, sample_rows)
+    assert column_types == [False, False, True]
+    assert conclusive
+
+    column_types, _ = scraper.infer_column_types(['Notes'], [['Employers'], ['2,304']])
+    assert column_types == [False]
+
+def test_empty_sample_columns_are_not_cached(scraper):
+    column_types, conclusive = scraper.infer_column_types(['Region', 'Notes'], [['North', ''], ['South', '']])
+    assert column_types == [False, False]
+    assert not conclusive
+
+    scraper.get_column_types(['Region', 'Notes'], [['North', '']])
+    assert scraper.column_types == {}
+    scraper.get_column_types(['Region', 'Notes'], [['North', '5'], ['South', '6']])
+    assert scraper.column_types == {('Region', 'Notes'): [False, True]}
+
+def test_cached_types_are_reused_for_the_same_headers(scraper):
+    scraper.get_column_types(['Region', 'Count'], [['North', '1'], ['South', '2']])
+    # Later pages with these headers are not sampled again
+    assert scraper.get_column_types(['Region', 'Count'], [['North', 'n/a'], ['South', 'n/a']]) == [False, True]
+    assert scraper.get_column_types(['Region', 'Other'], [['North', 'n/a']]) == [False, False]
+
+def test_cells_that_do_not_parse_keep_their_text(scraper):
+    assert scraper.convert_column(['1,024', 'X', '', '..']) == [1024, 'X', 0, '..']
+    assert scraper.convert_column(['12.5%', 'F', '3']) == [12.5, 'F', 3.0]
+
+def test_tied_columns_keep_their_text(scraper):
+    tables = scraper.table_parser.parse_tables(fixture_page('nested_tables.html'))
+    records = scraper.extract_table_data(tables[0], 'businesses').to_list()
+    assert [record['Notes'] for record in records] == ['Employers', '2,304']
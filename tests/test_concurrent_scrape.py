@@ -0,0 +1,78 @@
+import re
+
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from record_sink import RecordSink
+from stub_server import StubServer, fixture_endpoint_page
+
+pytest.importorskip('aiohttp')
+
+NAICS_CODES = {
+    '11': 'Agriculture, forestry, fishing and hunting',
+    '111': 'Crop production',
+    '1111': 'Oilseed and grain farming',
+    '1112': 'Vegetable and melon farming',
+    '112': 'Animal production and aquaculture',
+    '21': 'Mining, quarrying, and oil and gas extraction',
+    '31-33': 'Manufacturing',
+    '311': 'Food manufacturing'
+}
+
+SCRAPE_DATE = re.compile(rb'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+')
+
+def code_page(endpoint, naics_code):
+    """Fixture pages with a row naming the code, except 1111 and 1112 which share theirs"""
+    body = fixture_endpoint_page(endpoint, naics_code)
+    if body is None or naics_code in ('1111', '1112'):
+        return body
+    head, tail = body.rsplit(b'</table>', 1)
+    return head + f'<tr><td>Code</td><td>{len(naics_code)},{naics_code[:3]}</td></tr></table>'.encode() + tail
+
+def scrape(server, base_filename, concurrent, **options):
+    sink = RecordSink(base_filename)
+    scraper = AllIndustriesScraper(base_url=server.base_url, sink=sink, backoff_base=0.01, **options)
+    scraper.all_naics_codes = dict(NAICS_CODES)
+    # Fixed sequential courtesy sleeps are not under test
+    scraper.pause = lambda seconds: None
+    scraper.scrape_all_industries(batch_size=3, concurrent=concurrent)
+    scraper.save_streamed_data(base_filename)
+    sink.close()
+    return scraper
+
+def output(base_filename, extension):
+    with open(f"{base_filename}.{extension}", 'rb') as f:
+        return SCRAPE_DATE.sub(b'<scrape_date>', f.read())
+
+def test_async_and_sequential_outputs_match(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubServer(page=code_page) as server:
+        server.fail('performance/21', 503, {'Retry-After': '0'})
+        sequential = scrape(server, str(tmp_path / 'sequential'), False, requests_per_second=0)
+        server.fail('performance/21', 503, {'Retry-After': '0'})
+        concurrent = scrape(server, str(tmp_path / 'concurrent'), True, requests_per_second=0)
+
+    for extension in ('json', 'csv', 'records.ndjson', 'index.json'):
+        assert output(tmp_path / 'sequential', extension) == output(tmp_path / 'concurrent', extension), extension
+    assert len(sequential.sink.index) == len(NAICS_CODES)
+    assert sequential.duplicate_pages == concurrent.duplicate_pages == 3
+    assert sequential.retries == concurrent.retries == 1
+
+def test_concurrent_scrape_keeps_to_the_request_rate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    requests_per_second = 20
+    with StubServer(latency=0.01, page=code_page) as server:
+        scrape(server, str(tmp_path / 'rate'), True, requests_per_second=requests_per_second, max_in_flight=10)
+
+    # Any run of 10 consecutive requests spans at least 9 start intervals
+    starts = sorted(started for _, started in server.requests)
+    assert len(starts) == len(NAICS_CODES) * 5
+    window = 10
+    spans = [starts[i + window - 1] - starts[i] for i in range(len(starts) - window + 1)]
+    assert min(spans) >= 0.9 * (window - 1) / requests_per_second
+
+def test_concurrent_scrape_keeps_to_the_in_flight_limit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubServer(latency=0.1, page=code_page) as server:
+        scrape(server, str(tmp_path / 'in_flight'), True, requests_per_second=0, max_in_flight=3)
+    assert 1 < server.max_in_flight <= 3
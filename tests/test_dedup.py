@@ -0,0 +1,45 @@
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper, table_fingerprint
+from record_sink import RecordSink
+
+def page(outer_rows, navigation='', script=''):
+    return f'''<html><body><nav>{navigation}</nav><script>{script}</script>
+<table><tr><th>Layout</th><th>Notes</th></tr>
+  <tr><td><table><tr><th>Province/territory</th><th>Employers</th></tr><tr><td>Manitoba</td><td>2,304</td></tr></table></td>
+  <td>Source</td></tr>
+  {outer_rows}
+</table></body></html>'''.encode()
+
+def test_rows_after_a_nested_table_count():
+    first = page('<tr><td>Ontario</td><td>13,520</td></tr>')
+    second = page('<tr><td>Ontario</td><td>99,999</td></tr>')
+    assert table_fingerprint(first) != table_fingerprint(second)
+
+def test_navigation_scripts_and_comments_do_not_count():
+    first = page('<tr><td>Ontario</td><td>13,520</td></tr>', '<a href="/11">11</a>', 'var t = "<table>";')
+    second = page('<tr><td>Ontario</td><td>13,520</td></tr><!-- built 2026-10-17 -->', '<a href="/111">111</a>', 'var t = "</table>";')
+    assert table_fingerprint(first) == table_fingerprint(second)
+
+def test_unclosed_table_runs_to_the_end():
+    assert table_fingerprint(b'<table><tr><td>1</td></tr>') != table_fingerprint(b'<table><tr><td>2</td></tr>')
+    assert table_fingerprint(b'<p>no tables</p></table>') == table_fingerprint(b'')
+
+def test_columnar_store_expands_aliases(tmp_path):
+    pytest.importorskip('pyarrow')
+    from columnar_store import read_endpoint_table
+
+    sink = RecordSink(str(tmp_path / 'dataset'))
+    scraper = AllIndustriesScraper(sink=sink)
+    content = page('<tr><td>Ontario</td><td>13,520</td></tr>')
+    for naics_code, industry_name in (('1111', 'Oilseed and grain farming'), ('1112', 'Vegetable and melon farming')):
+        industry_data = scraper.new_industry_data(naics_code, industry_name)
+        scraper.process_endpoint(industry_data, 'businesses', f"https://example.test/{naics_code}", content, None, 0.0)
+        scraper.finish_industry(industry_data)
+    assert sink.index['1112']['endpoints']['businesses']['alias_of'] == '1111'
+
+    scraper.save_columnar_store(sink.index, str(tmp_path / 'dataset'))
+    table = read_endpoint_table(str(tmp_path / 'dataset_store'), 'businesses').to_pylist()
+    rows = {naics_code: [row for row in table if row['naics_code'] == naics_code] for naics_code in ('1111', '1112')}
+    assert rows['1111'] and [dict(row, naics_code=None) for row in rows['1111']] == [dict(row, naics_code=None) for row in rows['1112']]
+    sink.close()
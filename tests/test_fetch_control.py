@@ -0,0 +1,129 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from fetch_control import CircuitBreaker, parse_retry_after
+from stub_server import StubServer
+
+pytest.importorskip('requests')
+
+PATH = 'businesses-entreprises/11'
+
+@pytest.fixture
+def server():
+    with StubServer() as server:
+        yield server
+
+def make_scraper(server, **options):
+    options = dict({'requests_per_second': 0, 'max_retries': 3, 'backoff_base': 0.01, 'max_retry_after': 5.0}, **options)
+    return AllIndustriesScraper(base_url=server.base_url, **options)
+
+def fetch(scraper, concurrent):
+    url = f"{scraper.base_url}/{PATH}"
+    if not concurrent:
+        return scraper.fetch_result(url, 'businesses')
+
+    async def fetch_async():
+        async with scraper.create_async_client() as client:
+            return await scraper.fetch_result_async(client, url, 'businesses')
+    return asyncio.run(fetch_async())
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+@pytest.mark.parametrize('concurrent', [False, True])
+@pytest.mark.parametrize('status', [429, 503])
+def test_retry_after_pauses_then_succeeds(server, concurrent, status):
+    server.fail(PATH, status, {'Retry-After': '1'})
+    scraper = make_scraper(server)
+
+    started = time.monotonic()
+    content, error = fetch(scraper, concurrent)
+    assert error is None and b'Employers' in content
+    assert server.hits(PATH) == 2
+    assert scraper.retries == 1
+    # The retry waited out the pause the whole host was given
+    retry_gap = server.requests[1][1] - server.requests[0][1]
+    assert retry_gap >= 0.9 and time.monotonic() - started < 3
+    assert next(iter(scraper.rate_budgets.values())).throttle_events == 1
+
+@pytest.mark.parametrize('concurrent', [False, True])
+@pytest.mark.parametrize('retry_after', ['3600', formatdate(time.time() + 86400, usegmt=True)])
+def test_retry_after_beyond_the_limit_fails(server, concurrent, retry_after):
+    server.fail(PATH, 503, {'Retry-After': retry_after})
+    scraper = make_scraper(server)
+
+    started = time.monotonic()
+    content, error = fetch(scraper, concurrent)
+    assert content is None and error == 'HTTP 503'
+    assert server.hits(PATH) == 1
+    assert scraper.retries == 0
+    assert scraper.circuit_breakers['businesses'].failures == 1
+    # The host pause is clamped too
+    budget = next(iter(scraper.rate_budgets.values()))
+    assert budget.paused_until - time.monotonic() <= scraper.max_retry_after
+    assert time.monotonic() - started < 1
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_errors_without_retry_after_back_off_and_give_up(server, concurrent, monkeypatch):
+    delays = []
+    import all_industries_scraper
+    real_backoff = all_industries_scraper.backoff_delay
+    monkeypatch.setattr(all_industries_scraper, 'backoff_delay', lambda attempt, base: delays.append(attempt) or real_backoff(attempt, base))
+
+    server.fail(PATH, 500, times=10)
+    scraper = make_scraper(server, max_retries=2)
+    content, error = fetch(scraper, concurrent)
+    assert content is None and error == 'HTTP 500'
+    assert server.hits(PATH) == 3
+    assert delays == [0, 1]
+    # A plain 500 is an endpoint bug, not overload, so the host is not slowed down
+    assert next(iter(scraper.rate_budgets.values())).throttle_events == 0
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_circuit_opens_then_half_opens(server, concurrent):
+    scraper = make_scraper(server, max_retries=0)
+    breaker = scraper.circuit_breakers['businesses'] = CircuitBreaker('businesses', failure_threshold=2, reset_timeout=0.5)
+    server.fail(PATH, 502, times=2)
+
+    assert fetch(scraper, concurrent) == (None, 'HTTP 502')
+    assert fetch(scraper, concurrent) == (None, 'HTTP 502')
+    assert breaker.state == 'open'
+
+    # Open: no request reaches the host
+    assert fetch(scraper, concurrent) == (None, 'circuit open')
+    assert server.hits(PATH) == 2
+
+    # After the cool-down one trial goes out; it succeeds and closes the circuit
+    time.sleep(0.6)
+    content, error = fetch(scraper, concurrent)
+    assert error is None and content
+    assert breaker.state == 'closed'
+    assert server.hits(PATH) == 3
+
+def test_failed_trial_reopens_the_circuit(server):
+    scraper = make_scraper(server, max_retries=0)
+    breaker = scraper.circuit_breakers['businesses'] = CircuitBreaker('businesses', failure_threshold=1, reset_timeout=0.3)
+    server.fail(PATH, 503, times=2)
+
+    assert fetch(scraper, False) == (None, 'HTTP 503')
+    time.sleep(0.4)
+    assert fetch(scraper, False) == (None, 'HTTP 503')
+    assert breaker.state == 'open'
+    assert fetch(scraper, False) == (None, 'circuit open')
+    assert server.hits(PATH) == 2
+
+def test_half_open_allows_one_trial_at_a_time():
+    breaker = CircuitBreaker('businesses', failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request() and breaker.state == 'half-open'
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.allow_request() and breaker.allow_request()
@@ -0,0 +1,97 @@
+import csv
+
+from all_industries_scraper import build_parser, run_export
+from incremental_refresh import RefreshState
+from record_sink import RecordSink
+
+METADATA = {'naics_code': '11', 'industry_name': 'Agriculture', 'data_source': 'businesses', 'scrape_date': ''}
+
+def refresh(base_filename, state_file, employers, seen_at):
+    """Write one run's businesses rows, refresh them against the state and close the sink"""
+    sink = RecordSink(base_filename)
+    sink.write_endpoint(dict(METADATA, scrape_date=seen_at), 'businesses', {
+        'url': 'https://example.test/businesses-entreprises/11', 'tables_count': 1, 'records_count': 2,
+        'data': [
+            {'Province/territory': 'Ontario', 'Employers': employers},
+            {'Province/territory': 'Quebec', 'Employers': 9874}
+        ]
+    })
+    state = RefreshState(state_file)
+    state.apply(sink, {'11': {'businesses': seen_at}}, f"{base_filename}.changelog.ndjson")
+    state.close()
+    sink.close()
+
+def test_row_dates_survive_into_export(tmp_path):
+    base_filename = str(tmp_path / 'dataset')
+    state_file = str(tmp_path / 'refresh_state.sqlite')
+    refresh(base_filename, state_file, 13520, '2026-01-01T00:00:00')
+    refresh(base_filename, state_file, 13600, '2026-02-01T00:00:00')
+
+    # A later process only has the files on disk
+    resumed = RecordSink(base_filename, resume=True)
+    assert [record['scrape_date'] for record in resumed.iter_records()] == ['2026-02-01T00:00:00', '2026-01-01T00:00:00']
+    resumed.close()
+
+    args = build_parser().parse_args(['export', '--output', base_filename, '--to', str(tmp_path / 'export'), '--format', 'csv'])
+    run_export(args)
+    with open(tmp_path / 'export.csv', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['Province/territory'], row['scrape_date']) for row in rows] == [
+        ('Ontario', '2026-02-01T00:00:00'), ('Quebec', '2026-01-01T00:00:00')
+    ]
+
+def scrape_and_refresh(server, tmp_path, naics_codes):
+    """One incremental run: scrape into a fresh sink and ledger, refresh against the state and save the CSV"""
+    from all_industries_scraper import AllIndustriesScraper
+    from job_ledger import JobLedger
+
+    base_filename = str(tmp_path / 'dataset')
+    ledger = JobLedger(str(tmp_path / 'ledger.sqlite'))
+    ledger.reset()
+    sink = RecordSink(base_filename)
+    scraper = AllIndustriesScraper(base_url=server.base_url, sink=sink, ledger=ledger, requests_per_second=0, max_retries=0)
+    scraper.all_naics_codes = dict(naics_codes)
+    scraper.pause = lambda seconds: None
+    scraper.scrape_all_industries(batch_size=5)
+
+    state = RefreshState(str(tmp_path / 'refresh_state.sqlite'))
+    state.apply(sink, ledger.refresh_tasks(), f"{base_filename}.changelog.ndjson")
+    state.close()
+    scraper.save_streamed_data(base_filename, formats=('csv',))
+    sink.close()
+    ledger.close()
+    with open(f"{base_filename}.csv", encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def code_page(endpoint, naics_code):
+    """Fixture pages with a row naming the code, so no page is an alias of another"""
+    from stub_server import fixture_endpoint_page
+
+    body = fixture_endpoint_page(endpoint, naics_code)
+    if body is None:
+        return None
+    head, tail = body.rsplit(b'</table>', 1)
+    return head + f'<tr><td>Code</td><td>{naics_code}</td></tr></table>'.encode() + tail
+
+def test_pages_that_fail_on_a_rerun_keep_their_rows(tmp_path, monkeypatch):
+    import json
+
+    from stub_server import StubServer
+
+    monkeypatch.chdir(tmp_path)
+    naics_codes = {'11': 'Agriculture', '21': 'Mining', '22': 'Utilities'}
+    with StubServer(page=code_page) as server:
+        first = scrape_and_refresh(server, tmp_path, naics_codes)
+        with open(tmp_path / 'dataset.changelog.ndjson', encoding='utf-8') as f:
+            first_changes = len(f.readlines())
+
+        server.fail('businesses-entreprises/11', 503, {'Retry-After': '0'})
+        server.fail('performance/21', 503, {'Retry-After': '0'})
+        server.fail('businesses-entreprises/22', 503, {'Retry-After': '0'})
+        server.fail('performance/22', 503, {'Retry-After': '0'})
+        second = scrape_and_refresh(server, tmp_path, naics_codes)
+
+    assert {(row['naics_code'], row['data_source']) for row in first} >= {('11', 'businesses'), ('21', 'performance'), ('22', 'businesses'), ('22', 'performance')}
+    assert second == first
+    with open(tmp_path / 'dataset.changelog.ndjson', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f.readlines()[first_changes:]] == []
@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip('numpy')
+from industry_cube import IndustryCube, build_cube
+
+def industry(name, businesses=None, performance=None):
+    endpoints = {}
+    if businesses is not None:
+        endpoints['businesses'] = {'data': businesses}
+    if performance is not None:
+        endpoints['performance'] = {'data': performance}
+    return {'metadata': {'industry_name': name}, 'endpoints': endpoints}
+
+def status_rows(counts):
+    return [
+        {'Province/territory': province, 'Employers': employers, 'Non-employers / Indeterminate': non_employers}
+        for province, (employers, non_employers) in counts.items()
+    ]
+
+def size_rows(counts):
+    rows = [{'Province/territory': province, 'Employment size category (number of employees)': count} for province, count in counts.items()]
+    return rows + [{'Province/territory': 'Percent distribution %', 'Employment size category (number of employees)': 56.9}]
+
+def margin_rows(quartiles, reporting):
+    return [{
+        'Wholeindustry(reliability)': 'Net profit/loss',
+        'Bottomquartile(25%)': quartiles[0], 'Lowermiddle(25%)': quartiles[1],
+        'Uppermiddle(25%)': quartiles[2], 'Topquartile(25%)': quartiles[3],
+        'Percentage ofbusinessesreporting': reporting
+    }]
+
+@pytest.fixture
+def cube(tmp_path):
+    data = {
+        '11': industry('Agriculture', status_rows({'Ontario': (8620, 42996)}) + size_rows({'Ontario': 25163})),
+        '111': industry(
+            'Crop production',
+            status_rows({'Ontario': (3000, 20000), 'Quebec': (1000, 5000)}) + size_rows({'Ontario': 9000}),
+            margin_rows((1.0, 2.0, 3.0, 4.0), 90.0)
+        ),
+        '112': industry(
+            'Animal production',
+            status_rows({'Ontario': (1000, 4000)}) + size_rows({'Ontario': 1500}),
+            margin_rows((5.0, 6.0, 7.0, 8.0), 70.0)
+        )
+    }
+    build_cube(data, lambda endpoint_info: endpoint_info['data'], str(tmp_path / 'cube'))
+    return IndustryCube(str(tmp_path / 'cube'))
+
+def test_totals_are_employers_plus_non_employers(cube):
+    assert cube.count('11', 'Ontario') == 8620 + 42996
+    assert cube.by_status('111', 'Ontario') == {'Employers': 3000, 'Non-employers / Indeterminate': 20000}
+    assert cube.count('111') == 29000
+
+def test_size_classes_break_down_employers_only(cube):
+    assert list(cube.statuses) == ['Employers', 'Non-employers / Indeterminate']
+    assert list(cube.size_classes) == ['Employment size category (number of employees)']
+    assert cube.employers('11', 'Ontario') == 25163
+    assert cube.by_size_class('111') == {'Employment size category (number of employees)': 9000}
+
+def test_quartile_axis_has_only_quartiles(cube):
+    assert list(cube.quartiles) == ['Bottomquartile(25%)', 'Lowermiddle(25%)', 'Uppermiddle(25%)', 'Topquartile(25%)']
+    assert cube.metric('111', 'Net profit/loss', 'Topquartile(25%)') == 4.0
+
+def test_performance_roll_up_is_weighted_by_business_totals(cube):
+    # 111 has 29000 businesses and 112 has 5000
+    assert cube.is_rolled_up('11') is False
+    assert cube.metric('11', 'Net profit/loss', 'Bottomquartile(25%)') == pytest.approx((1.0 * 29000 + 5.0 * 5000) / 34000)
+
+def test_top_codes_rank_by_business_totals(cube):
+    assert cube.top_codes(3) == [('111', 29000.0), ('112', 5000.0)]
+    assert cube.top_codes(3, province='Ontario', status='Employers') == [('111', 3000.0), ('112', 1000.0)]
@@ -0,0 +1,53 @@
+import json
+import time
+
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from naics_discovery import NaicsDiscovery
+from stub_server import StubServer
+
+def chain_page(endpoint, naics_code):
+    """Summary pages of sector 11 link one child per level, down past 6 digits"""
+    if endpoint != 'summary-sommaire' or not naics_code.startswith('11'):
+        return b'<html><body><p>No children</p></body></html>'
+    child = naics_code + '1' if len(naics_code) > 2 else '111'
+    return f'<html><body><a href="/app/ixb/cis/summary-sommaire/{child}">Child of {naics_code}</a></body></html>'.encode()
+
+def test_crawl_reaches_6_digit_codes(tmp_path):
+    with StubServer(page=chain_page) as server:
+        scraper = AllIndustriesScraper(base_url=server.base_url, requests_per_second=0)
+        discovery = NaicsDiscovery(scraper, str(tmp_path / 'naics.json'))
+        codes = dict(discovery.crawl())
+
+    assert [naics_code for naics_code in codes if naics_code.startswith('11')] == ['11', '111', '1111', '11111', '111111']
+    assert discovery.hierarchy['111111']['parent'] == '11111'
+    assert server.hits('summary-sommaire/111111') == 0
+
+def test_cache_from_a_shallower_crawl_is_ignored(tmp_path):
+    cache_file = tmp_path / 'naics.json'
+    cache_file.write_text(json.dumps({
+        'discovered_at': time.time(), 'complete': True,
+        'codes': {'11': {'name': 'Agriculture', 'level': 2, 'parent': None, 'children': []}}
+    }))
+    assert not NaicsDiscovery(None, str(cache_file)).complete
+    assert NaicsDiscovery(None, str(cache_file), max_level=5).complete
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_scrape_reuses_the_pages_discovery_fetched(tmp_path, monkeypatch, concurrent):
+    if concurrent:
+        pytest.importorskip('aiohttp')
+    monkeypatch.chdir(tmp_path)
+    with StubServer(page=chain_page) as server:
+        scraper = AllIndustriesScraper(base_url=server.base_url, requests_per_second=0)
+        scraper.pause = lambda seconds: None
+        discovery = NaicsDiscovery(scraper, str(tmp_path / 'naics.json'))
+        scraper.scrape_all_industries(batch_size=4, concurrent=concurrent, discovery=discovery)
+
+    summary_hits = {
+        naics_code: server.hits(f'summary-sommaire/{naics_code}')
+        for naics_code in discovery.hierarchy
+    }
+    assert '111111' in summary_hits
+    assert set(summary_hits.values()) == {1}
+    assert scraper.prefetched_pages == {}
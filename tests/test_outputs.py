@@ -0,0 +1,36 @@
+from all_industries_scraper import AllIndustriesScraper
+from conftest import fixture_page
+from record_sink import RecordSink
+
+PAGES = {'businesses': 'businesses.html', 'performance': 'performance.html', 'summary': 'summary.html'}
+
+def save(base_filename, sink):
+    """Extract the same pages for three codes (two sharing every page) and save the outputs"""
+    scraper = AllIndustriesScraper(sink=sink)
+    data = {}
+    for naics_code, industry_name in (('11', 'Agriculture'), ('111', 'Crop production'), ('21', 'Mining')):
+        industry_data = scraper.new_industry_data(naics_code, industry_name)
+        industry_data['metadata']['scrape_date'] = '2026-10-17T12:00:00'
+        for endpoint_name, page in PAGES.items():
+            content = fixture_page(page)
+            if naics_code == '21':
+                content = content.replace(b'13,520', b'13,521')
+            scraper.process_endpoint(industry_data, endpoint_name, f"https://example.test/{endpoint_name}/{naics_code}", content, None, 0.0)
+        scraper.record_industry_result(data, {'processed': 0, 'successful': 0, 'total_codes': 3}, naics_code, scraper.finish_industry(industry_data))
+    return scraper.save_all_data(sink.index if sink else data, base_filename)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_in_memory_and_streamed_outputs_match(tmp_path):
+    in_memory = save(str(tmp_path / 'in_memory'), None)
+    sink = RecordSink(str(tmp_path / 'streamed'))
+    streamed = save(str(tmp_path / 'streamed'), sink)
+    sink.close()
+
+    assert in_memory == streamed > 0
+    assert read(tmp_path / 'in_memory.json') == read(tmp_path / 'streamed.json')
+    assert read(tmp_path / 'in_memory.csv') == read(tmp_path / 'streamed.csv')
+    assert b'fingerprint' not in read(tmp_path / 'in_memory.json')
+    assert b',13520,' in read(tmp_path / 'in_memory.csv')
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from conftest import fixture_page
+from page_archive import PageArchive
+from record_sink import RecordSink
+
+pytest.importorskip('numpy')
+
+URL = 'https://example.test/businesses-entreprises/11'
+
+def test_unchanged_page_is_marked_seen_without_storing_it_again(tmp_path):
+    archive = PageArchive(str(tmp_path / 'archive'))
+    body = fixture_page('businesses.html')
+    assert archive.append('11', 'businesses', URL, 'Agriculture', body, fetched_at=100.0)
+    archive.sync()
+    stored_size = os.path.getsize(archive.data_file)
+
+    assert not archive.append('11', 'businesses', URL, 'Agriculture', body, fetched_at=200.0)
+    first = archive.latest_entries()['11']['businesses']
+    assert first[2] == 200.0
+    assert os.path.getsize(archive.data_file) == stored_size
+    archive.close()
+
+    # A reopened archive still knows the stored copy
+    archive = PageArchive(str(tmp_path / 'archive'))
+    assert not archive.append('11', 'businesses', URL, 'Agriculture', body, fetched_at=300.0)
+    assert archive.latest_entries()['11']['businesses'] == (first[0], first[1], 300.0)
+
+    assert archive.append('11', 'businesses', URL, 'Agriculture', body.replace(b'13,520', b'13,521'), fetched_at=400.0)
+    offset, _, fetched_at = archive.latest_entries()['11']['businesses']
+    assert offset == stored_size and fetched_at == 400.0
+    archive.close()
+
+def test_reextract_dates_data_by_when_it_was_last_seen(tmp_path):
+    archive = PageArchive(str(tmp_path / 'archive'))
+    body = fixture_page('businesses.html')
+    archive.append('11', 'businesses', URL, 'Agriculture', body, fetched_at=1_700_000_000.0)
+    archive.append('11', 'businesses', URL, 'Agriculture', body, fetched_at=1_800_000_000.0)
+
+    sink = RecordSink(str(tmp_path / 'dataset'))
+    scraper = AllIndustriesScraper(sink=sink, archive=archive)
+    scraper.reextract_archive(processes=1)
+    assert sink.index['11']['metadata']['scrape_date'] == datetime.fromtimestamp(1_800_000_000.0).isoformat()
+    sink.close()
+    archive.close()
+
+def test_reextract_is_not_a_fetch(tmp_path):
+    from availability_index import AvailabilityIndex
+
+    archive = PageArchive(str(tmp_path / 'archive'))
+    archive.append('11', 'businesses', URL, 'Agriculture', fixture_page('businesses.html'), fetched_at=1_700_000_000.0)
+    archive.append('11', 'gdp', 'https://example.test/gdp-pid/11', 'Agriculture', b'<html><body>No data</body></html>', fetched_at=1_700_000_000.0)
+
+    availability = AvailabilityIndex(str(tmp_path / 'availability.sqlite'))
+    for endpoint, available in (('businesses', True), ('gdp', False)):
+        availability.record(endpoint, '11', available)
+    availability.db.execute("UPDATE availability SET checked_at = 1000")
+    availability.commit()
+
+    sink = RecordSink(str(tmp_path / 'dataset'))
+    scraper = AllIndustriesScraper(sink=sink, archive=archive, availability=availability)
+    scraper.reextract_archive(processes=1)
+    assert list(sink.index['11']['endpoints']) == ['businesses']
+    assert scraper.wasted_requests == 0
+    assert [(row['checked_at'], row['checks']) for row in availability.db.execute("SELECT * FROM availability")] == [(1000, 1), (1000, 1)]
+    sink.close()
+    availability.close()
+    archive.close()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+
+import pytest
+
+from all_industries_scraper import AllIndustriesScraper
+from page_cache import PageCache
+from stub_server import StubServer
+
+URL = 'https://example.test/businesses-entreprises/11'
+
+def age(cache, url, seconds):
+    """Pretend an entry was stored (and last used) seconds ago"""
+    cache.db.execute("UPDATE entries SET stored_at = stored_at - ?, last_access = last_access - ? WHERE url = ?", (seconds, seconds, url))
+    cache.db.commit()
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'), ttl=3600)
+    cache.store(URL, b'<table></table>', {'ETag': '"v1"', 'Last-Modified': 'Sat, 17 Oct 2026 12:00:00 GMT'})
+    assert cache.cached_body(URL) == b'<table></table>'
+
+    age(cache, URL, 3600)
+    assert cache.cached_body(URL) is None
+    # A stale entry is revalidated with its validators
+    assert cache.conditional_headers(URL) == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Sat, 17 Oct 2026 12:00:00 GMT'}
+    assert cache.conditional_headers('https://example.test/unknown') == {}
+    assert cache.stats['hits'] == 1
+    cache.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'), max_bytes=30)
+    for i, url in enumerate(['a', 'b', 'c']):
+        cache.store(url, f'body {url}'.encode(), {})
+        age(cache, url, 100 - i)
+    # Reading a makes b the least recently used
+    assert cache.cached_body('a') == b'body a'
+    b_object = cache.object_path(cache.lookup('b')['body_hash'])
+
+    cache.store('d', b'body d', {})
+    assert cache.stats['evicted'] == 0
+    cache.store('e', b'body e plus some', {})
+    assert [url for url in 'abcde' if cache.lookup(url)] == ['a', 'd', 'e']
+    assert cache.total_bytes() <= 30
+    assert not os.path.exists(b_object)
+    cache.close()
+
+    # A lower limit applies when the cache is opened again
+    cache = PageCache(str(tmp_path / 'cache'), max_bytes=20)
+    assert [url for url in 'ade' if cache.lookup(url)] == ['e']
+    cache.close()
+
+def test_shared_bodies_stay_while_referenced(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'))
+    cache.store('a', b'same body', {})
+    cache.store('b', b'same body', {})
+    path = cache.object_path(cache.lookup('a')['body_hash'])
+    cache.store('a', b'new body', {})
+    assert os.path.exists(path)
+    cache.store('b', b'new body', {})
+    assert not os.path.exists(path)
+    cache.close()
+
+def test_offline_mode_serves_stale_pages_and_never_fetches(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'), ttl=1)
+    with StubServer() as server:
+        url = f"{server.base_url}/businesses-entreprises/11"
+        cache.store(url, b'<table><tr><td>stale</td></tr></table>', {})
+        age(cache, url, 10)
+        cache.close()
+
+        offline = PageCache(str(tmp_path / 'cache'), ttl=1, offline=True)
+        scraper = AllIndustriesScraper(base_url=server.base_url, cache=offline)
+        assert scraper.fetch_result(url) == (b'<table><tr><td>stale</td></tr></table>', None)
+        assert scraper.fetch_result(f"{server.base_url}/businesses-entreprises/21") == (None, "not in offline cache")
+        offline.close()
+
+    assert server.requests == []
+    assert scraper.network_requests == 0
+    assert offline.stats['hits'] == offline.stats['misses'] == 1
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_not_modified_response_refreshes_the_stored_page(tmp_path, concurrent):
+    if concurrent:
+        pytest.importorskip('aiohttp')
+    cache = PageCache(str(tmp_path / 'cache'), ttl=3600)
+    with StubServer() as server:
+        scraper = AllIndustriesScraper(base_url=server.base_url, cache=cache, requests_per_second=0)
+        url = scraper.endpoint_url('businesses', '11')
+
+        async def fetch_async():
+            async with scraper.create_async_client() as client:
+                return await scraper.fetch_result_async(client, url, 'businesses')
+
+        def fetch():
+            return asyncio.run(fetch_async()) if concurrent else scraper.fetch_result(url, 'businesses')
+
+        body, error = fetch()
+        assert error is None and cache.stats['stored'] == 1
+        assert fetch() == (body, None)
+        assert server.hits('businesses-entreprises/11') == 1
+
+        age(cache, url, 3600)
+        server.fail('businesses-entreprises/11', 304, {'ETag': '"v2"'})
+        assert fetch() == (body, None)
+        assert server.hits('businesses-entreprises/11') == 2
+
+    entry = cache.lookup(url)
+    assert entry['etag'] == '"v2"'
+    assert cache.is_fresh(entry)
+    assert cache.stats == {'hits': 1, 'revalidated': 1, 'misses': 0, 'stored': 1, 'evicted': 0}
+    assert scraper.network_requests == 2
+    cache.close()
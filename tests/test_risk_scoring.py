@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+from industry_cube import IndustryCube, build_cube
+from risk_scoring import RiskScorer, load_weight_tables
+from test_industry_cube import industry, margin_rows, size_rows, status_rows
+
+@pytest.fixture
+def scorer(tmp_path):
+    data = {
+        '11': industry(
+            'Agriculture',
+            status_rows({'Ontario': (100, 300), 'Quebec': (100, 100)}) + size_rows({'Ontario': 80, 'Quebec': 70}),
+            margin_rows((-5.0, 1.0, 2.0, 3.0), 100.0)
+        ),
+        '52': industry(
+            'Finance',
+            status_rows({'Ontario': (100, 100), 'Quebec': (300, 100)}) + size_rows({'Ontario': 60, 'Quebec': 250}),
+            margin_rows((4.0, 5.0, 6.0, 7.0), 1.0)
+        )
+    }
+    build_cube(data, lambda endpoint_info: endpoint_info['data'], str(tmp_path / 'cube'))
+    return RiskScorer(IndustryCube(str(tmp_path / 'cube')))
+
+def test_cells_are_employer_size_classes(scorer):
+    assert scorer.present.shape == (2, 2, 1)
+    rows = list(scorer.score().rows())
+    assert {row['employers'] for row in rows} == {80.0, 70.0, 60.0, 250.0}
+
+def test_location_quotient_uses_all_businesses(scorer):
+    # 11 has 400 of its 600 businesses in Ontario, which has 600 of all 1200
+    assert scorer.geographic[0, 0] == pytest.approx((400 / 600) / (600 / 1200))
+    assert scorer.geographic[1, 1] == pytest.approx((400 / 600) / (600 / 1200))
+
+def test_financial_ranks_quartile_means_only(scorer):
+    # The reporting share (100 vs 1) would flip the ranking if it were averaged in
+    assert scorer.financial.tolist() == [1.5, 0.5]
+
+def write_tables(tmp_path, tables):
+    path = tmp_path / 'weights.json'
+    path.write_text(json.dumps(tables))
+    return str(path)
+
+@pytest.mark.parametrize('tiers', [
+    [[1.0, 'standard'], [0.9, 'preferred'], [None, 'refer']],
+    [[0.9, 'preferred'], [None, 'rated'], [1.1, 'refer']],
+    [[0.9, 'preferred'], [0.9, 'standard']],
+    [['high', 'preferred']],
+    [[0.9]],
+    []
+])
+def test_bad_tiers_are_rejected(tmp_path, tiers):
+    with pytest.raises(ValueError):
+        load_weight_tables(write_tables(tmp_path, {'tiers': tiers}))
+
+def test_tiers_load_in_order(tmp_path, scorer):
+    tables = load_weight_tables(write_tables(tmp_path, {'tiers': [[0.95, 'low'], [None, 'high']]}))
+    assert tables['tiers'] == ((0.95, 'low'), (None, 'high'))
+    assert set(scorer.score(**tables).tier_counts()) == {'low', 'high'}
@@ -0,0 +1,98 @@
+import json
+import time
+
+from record_sink import RecordSink
+from run_metrics import STAGES, RunMetrics
+
+METADATA = {'naics_code': '11', 'industry_name': 'Agriculture', 'scrape_date': '2026-10-17T12:00:00'}
+
+def slow_items(count, seconds):
+    for i in range(count):
+        time.sleep(seconds)
+        yield i
+
+def test_timed_iter_counts_only_the_producer():
+    metrics = RunMetrics()
+    with metrics.timer('write', exclude='flatten'):
+        for _ in metrics.timed_iter('flatten', slow_items(3, 0.02)):
+            time.sleep(0.01)
+    assert metrics.stage_calls['flatten'] == metrics.stage_calls['write'] == 1
+    assert metrics.stage_seconds['flatten'] >= 0.06
+    assert 0.03 <= metrics.stage_seconds['write'] < metrics.stage_seconds['flatten']
+
+def test_abandoned_iteration_is_still_observed():
+    metrics = RunMetrics()
+    items = metrics.timed_iter('flatten', slow_items(3, 0.01))
+    next(items)
+    items.close()
+    assert metrics.stage_calls['flatten'] == 1
+    assert metrics.stage_seconds['flatten'] >= 0.01
+
+def test_sink_streams_records_through_the_flatten_timer(tmp_path):
+    records = [{'Province/territory': 'Ontario', 'Employers': 13520}, {'Province/territory': 'Quebec', 'Employers': 9874}]
+    endpoint_info = {'url': 'https://example.test/businesses-entreprises/11', 'tables_count': 1, 'records_count': 2}
+
+    timed = RecordSink(str(tmp_path / 'timed'), metrics=RunMetrics())
+    timed.write_endpoint(METADATA, 'businesses', dict(endpoint_info, data=iter(records)))
+    timed.close()
+    plain = RecordSink(str(tmp_path / 'plain'))
+    plain.write_endpoint(METADATA, 'businesses', dict(endpoint_info, data=records))
+    plain.close()
+
+    with open(timed.records_file, 'rb') as f, open(plain.records_file, 'rb') as g:
+        assert f.read() == g.read()
+    assert timed.metrics.stage_calls['flatten'] == timed.metrics.stage_calls['write'] == 1
+
+def filled_metrics(path=None):
+    metrics = RunMetrics(path, interval=60)
+    metrics.observe('fetch', 0.25)
+    metrics.inc('pages_total', source='network')
+    metrics.inc('pages_total', 2, source='cache')
+    metrics.inc('retries_total')
+    metrics.set('industries_processed', 7)
+    return metrics
+
+def test_snapshot_groups_labelled_metrics():
+    snapshot = filled_metrics().snapshot()
+    assert list(snapshot['stages']) == STAGES
+    assert snapshot['stages']['fetch'] == {'seconds': 0.25, 'calls': 1}
+    assert snapshot['counters'] == {'pages_total': {'source=network': 1, 'source=cache': 2}, 'retries_total': 1}
+    assert snapshot['gauges'] == {'industries_processed': 7}
+
+def test_prometheus_text_format():
+    lines = filled_metrics().prometheus_text().splitlines()
+    assert 'cis_scraper_stage_seconds_total{stage="fetch"} 0.25' in lines
+    assert 'cis_scraper_stage_calls_total{stage="fetch"} 1' in lines
+    assert 'cis_scraper_pages_total{source="cache"} 2' in lines
+    assert 'cis_scraper_pages_total{source="network"} 1' in lines
+    assert 'cis_scraper_retries_total 1' in lines
+    assert 'cis_scraper_industries_processed 7' in lines
+
+    # One TYPE line per metric, before its first sample
+    types = [line for line in lines if line.startswith('# TYPE')]
+    assert len(types) == len(set(types))
+    assert lines.index('# TYPE cis_scraper_pages_total counter') < lines.index('cis_scraper_pages_total{source="cache"} 2')
+    assert '# TYPE cis_scraper_industries_processed gauge' in lines
+
+def test_publish_picks_the_format_and_throttles(tmp_path):
+    json_file = tmp_path / 'metrics.json'
+    metrics = filled_metrics(str(json_file))
+    metrics.publish()
+    assert json.loads(json_file.read_text())['counters']['retries_total'] == 1
+
+    # Within the interval only a forced publish rewrites the file
+    metrics.inc('retries_total')
+    metrics.publish()
+    assert json.loads(json_file.read_text())['counters']['retries_total'] == 1
+    metrics.publish(force=True)
+    assert json.loads(json_file.read_text())['counters']['retries_total'] == 2
+
+    prom_file = tmp_path / 'metrics.prom'
+    filled_metrics(str(prom_file)).publish()
+    assert 'cis_scraper_retries_total 1' in prom_file.read_text().splitlines()
+    assert not (tmp_path / 'metrics.prom.tmp').exists()
+
+def test_publish_without_a_path_does_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    filled_metrics().publish(force=True)
+    assert list(tmp_path.iterdir()) == []
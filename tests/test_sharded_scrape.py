@@ -0,0 +1,129 @@
+import argparse
+import re
+import threading
+import time
+
+import sharded_scrape
+from all_industries_scraper import AllIndustriesScraper
+from record_sink import RecordSink
+from sharded_scrape import merge_outputs, run_worker, spawn_workers, worker_output
+from stub_server import StubServer, fixture_endpoint_page
+from work_queue import WorkQueue
+
+NAICS_CODES = {
+    '11': 'Agriculture, forestry, fishing and hunting',
+    '111': 'Crop production',
+    '1111': 'Oilseed and grain farming',
+    '1112': 'Vegetable and melon farming',
+    '21': 'Mining, quarrying, and oil and gas extraction',
+    '31-33': 'Manufacturing'
+}
+
+SCRAPE_DATE = re.compile(rb'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+')
+
+def code_page(endpoint, naics_code):
+    """Fixture pages with a row naming the code, except 1111 and 1112 which share theirs"""
+    body = fixture_endpoint_page(endpoint, naics_code)
+    if body is None or naics_code in ('1111', '1112'):
+        return body
+    head, tail = body.rsplit(b'</table>', 1)
+    return head + f'<tr><td>Code</td><td>{naics_code}</td></tr></table>'.encode() + tail
+
+def worker_scraper(server, base_filename, worker):
+    """A worker's scraper, streaming into its own partial output"""
+    sink = RecordSink(worker_output(base_filename, worker), resume=True)
+    scraper = AllIndustriesScraper(base_url=server.base_url, sink=sink, requests_per_second=0)
+    scraper.pause = lambda seconds: None
+    return scraper
+
+def work(server, queue_file, base_filename, worker, shard=None, lease_seconds=600):
+    """Run one worker until the queue is drained"""
+    queue = WorkQueue(queue_file, lease_seconds=lease_seconds)
+    scraper = worker_scraper(server, base_filename, worker)
+    run_worker(queue, worker, scraper, batch_size=1, shard=shard, poll_interval=0.05)
+    scraper.sink.close()
+    queue.close()
+
+def merged(queue_file, base_filename):
+    """Merge the partial outputs and return the merged files with scrape dates masked"""
+    queue = WorkQueue(queue_file)
+    merge_outputs(queue, base_filename).close()
+    queue.close()
+    files = {}
+    for extension in ('records.ndjson', 'index.json'):
+        with open(f"{base_filename}.{extension}", 'rb') as f:
+            files[extension] = SCRAPE_DATE.sub(b'<scrape_date>', f.read())
+    return files
+
+def single_worker_run(server, tmp_path):
+    """Merged output of one worker scraping every code"""
+    queue_file = str(tmp_path / 'single.sqlite')
+    queue = WorkQueue(queue_file)
+    queue.enqueue(NAICS_CODES)
+    queue.close()
+    work(server, queue_file, str(tmp_path / 'single'), 'only')
+    return merged(queue_file, str(tmp_path / 'single'))
+
+def test_expired_lease_of_a_dead_worker_is_requeued(tmp_path):
+    queue_file = str(tmp_path / 'queue.sqlite')
+    base_filename = str(tmp_path / 'dataset')
+    with StubServer(page=code_page) as server:
+        queue = WorkQueue(queue_file, lease_seconds=0.2)
+        queue.enqueue(NAICS_CODES)
+
+        # The worker dies after writing one industry, before completing any lease
+        crashed = worker_scraper(server, base_filename, 'crashed')
+        leased = queue.lease('crashed', 3)
+        naics_code, industry_name = next(iter(leased.items()))
+        crashed.scrape_single_industry(naics_code, industry_name)
+        crashed.sink.close()
+
+        # Its leases block other workers until they expire
+        assert set(queue.lease('survivor', 10)) == set(NAICS_CODES) - set(leased)
+        time.sleep(0.3)
+        work(server, queue_file, base_filename, 'survivor', lease_seconds=0.2)
+        assert queue.done_codes() == [(naics_code, 'survivor') for naics_code in NAICS_CODES]
+        assert not queue.has_open_work()
+        queue.close()
+
+        expected = single_worker_run(server, tmp_path)
+
+    # The dead worker's partial output is left out of the merge
+    assert merged(queue_file, base_filename) == expected
+
+def test_merged_output_does_not_depend_on_the_workers(tmp_path):
+    queue_file = str(tmp_path / 'queue.sqlite')
+    base_filename = str(tmp_path / 'dataset')
+    with StubServer(latency=0.01, page=code_page) as server:
+        queue = WorkQueue(queue_file)
+        queue.enqueue(NAICS_CODES, 2)
+        queue.close()
+
+        # Two workers on their own shards, interleaving as they go
+        workers = [
+            threading.Thread(target=work, args=(server, queue_file, base_filename, f"worker{shard}", shard))
+            for shard in range(2)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        expected = single_worker_run(server, tmp_path)
+
+    queue = WorkQueue(queue_file)
+    assert {worker for _, worker in queue.done_codes()} == {'worker0', 'worker1'}
+    queue.close()
+    assert merged(queue_file, base_filename) == expected
+
+def test_local_workers_get_the_coordinator_lease(monkeypatch):
+    commands = []
+    monkeypatch.setattr(sharded_scrape.subprocess, 'Popen', commands.append)
+    args = argparse.Namespace(
+        queue='queue.sqlite', output='dataset', batch_size=10, rps=5.0, max_in_flight=10, parser='auto',
+        cache_dir='http_cache', lease_seconds=45.0, concurrent=False, no_cache=False
+    )
+    spawn_workers(args, 2, 1)
+    assert len(commands) == 2
+    for command in commands:
+        assert command[command.index('--lease-seconds') + 1] == '45.0'
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR, fixture_page
+from table_parsers import SoupTableParser, decode_page, get_table_parser, utf8_body
+
+pytest.importorskip('lxml')
+from table_parsers import LxmlTableParser
+
+FIXTURES = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+
+@pytest.fixture(scope='module')
+def backends():
+    return SoupTableParser(), LxmlTableParser()
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_backends_return_the_same_tables(backends, name):
+    soup, lxml = backends
+    content = fixture_page(name)
+    assert lxml.parse_tables(content) == soup.parse_tables(content)
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_backends_return_the_same_links(backends, name):
+    soup, lxml = backends
+    content = fixture_page(name)
+    assert lxml.parse_links(content) == soup.parse_links(content)
+
+@pytest.mark.parametrize('name', ['utf8_no_meta.html', 'latin1_meta.html'])
+def test_accented_text_is_decoded(backends, name):
+    for backend in backends:
+        tables = backend.parse_tables(fixture_page(name))
+        assert tables[0][0] == ['Province/territory', 'Établissements']
+        assert tables[0][1][0] == 'Québec'
+        assert tables[0][2][0] == 'Île-du-Prince-Édouard'
+
+def test_windows_1252_without_declaration(backends):
+    for backend in backends:
+        tables = backend.parse_tables(fixture_page('cp1252_no_meta.html'))
+        assert [row[0] for row in tables[0]] == ['Province/territory', 'Québec', 'Total – all provinces']
+
+def test_unclosed_cells_and_rows_end_at_the_next_one(backends):
+    for backend in backends:
+        tables = backend.parse_tables(fixture_page('unclosed_cells.html'))
+        assert tables[0] == [
+            ['Province/territory', 'Employers', 'Non-employers'],
+            ['Alberta', '6,251', '7,110'],
+            ['Québec', '9,874', '10,337'],
+            ['Ontario', '13,520', '16,014']
+        ]
+        assert tables[1] == [['Item', 'Value'], ['One', '1'], ['Two', '2']]
+
+def test_scripts_and_comments_are_not_cell_text(backends):
+    for backend in backends:
+        tables = backend.parse_tables(fixture_page('businesses.html'))
+        assert len(tables) == 2
+        assert tables[0][4] == ['Ontario', '13,520', '16,014']
+
+def test_header_charset_is_applied_before_caching(backends):
+    body = '<table><tr><td>Québec</td></tr></table>'.encode('iso-8859-1')
+    normalized = utf8_body(body, 'text/html; charset=ISO-8859-1')
+    assert normalized == '<table><tr><td>Québec</td></tr></table>'.encode('utf-8')
+    for backend in backends:
+        assert backend.parse_tables(normalized) == [[['Québec']]]
+
+def test_utf8_body_leaves_other_bodies_alone():
+    body = 'Québec'.encode('utf-8')
+    assert utf8_body(body, 'text/html; charset=utf-8') is body
+    assert utf8_body(body, 'text/html') is body
+    assert utf8_body(body, None) is body
+    assert utf8_body(body, 'text/html; charset=no-such-charset') is body
+
+def test_declared_encoding_wins():
+    assert decode_page('Québec'.encode('iso-8859-1'), 'iso-8859-1') == 'Québec'
+    assert decode_page('Québec') == 'Québec'
+
+def test_auto_backend_is_lxml():
+    assert get_table_parser('auto').name == 'lxml'
+
+@pytest.mark.parametrize('name', ['businesses.html', 'performance.html', 'unclosed_cells.html'])
+def test_extracted_records_match(name):
+    from all_industries_scraper import AllIndustriesScraper
+
+    records = []
+    for backend in ('bs4', 'lxml'):
+        scraper = AllIndustriesScraper(parser_backend=backend)
+        tables = scraper.table_parser.parse_tables(fixture_page(name))
+        records.append([scraper.extract_table_data(table, 'businesses').to_list() for table in tables])
+    assert records[0] == records[1]
+    assert any(records[0])
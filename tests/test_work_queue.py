@@ -0,0 +1,64 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from sharded_scrape import work_async
+from work_queue import WorkQueue, shard_for
+
+def test_ranged_sectors_share_a_shard_with_their_subsectors():
+    naics_codes = ['11', '111', '31-33', '311', '3211', '336110', '44-45', '441', '453', '48-49', '493', '52']
+    sectors = ['11', '31-33', '44-45', '48-49', '52']
+    shards = {naics_code: shard_for(naics_code, 5, 'sector', sectors) for naics_code in naics_codes}
+    assert shards['31-33'] == shards['311'] == shards['3211'] == shards['336110']
+    assert shards['44-45'] == shards['441'] == shards['453']
+    assert shards['48-49'] == shards['493']
+    assert len(set(shards.values())) == 5
+
+def test_enqueue_by_sector(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    queue.enqueue({'31-33': 'Manufacturing', '321': 'Wood', '336': 'Transportation equipment', '52': 'Finance'}, 2, 'sector')
+    shards = dict(queue.db.execute("SELECT naics_code, shard FROM queue"))
+    assert shards['31-33'] == shards['321'] == shards['336'] != shards['52']
+    queue.close()
+
+class SlowScraper:
+    """Scrapes a batch slower than a lease lasts"""
+    endpoints = {'businesses': 'businesses-entreprises'}
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.sink = self
+
+    def checkpoint(self):
+        pass
+
+    @asynccontextmanager
+    async def create_async_client(self):
+        yield None
+
+    async def scrape_batch_async(self, client, batch):
+        await asyncio.sleep(self.seconds)
+        return [(naics_code, {'naics_code': naics_code}) for naics_code, _, _ in batch]
+
+def test_async_worker_renews_leases_of_a_slow_batch(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    queue = WorkQueue(path, lease_seconds=0.3)
+    queue.enqueue({'11': 'Agriculture', '21': 'Mining'})
+    other = WorkQueue(path, lease_seconds=0.3)
+
+    async def steal_while_scraping():
+        await asyncio.sleep(0.8)
+        return other.lease('thief', 10, steal=True)
+
+    async def run():
+        worker = asyncio.create_task(work_async(queue, 'slow', SlowScraper(1.2), 10, None, True, 0.05))
+        stolen = await steal_while_scraping()
+        await worker
+        return stolen
+
+    started = time.time()
+    assert asyncio.run(run()) == {}
+    assert time.time() - started >= 1.2
+    assert queue.done_codes() == [('11', 'slow'), ('21', 'slow')]
+    other.close()
+    queue.close()
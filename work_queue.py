@@ -0,0 +1,148 @@
+import logging
+import os
+import socket
+import sqlite3
+import time
+import zlib
+
+from naics_discovery import naics_sector
+
+logger = logging.getLogger(__name__)
+
+# Queue states: pending (waiting for a worker), leased (claimed until lease_expires),
+# done (worker's partial output holds its records), failed (scrape raised)
+QUEUE_STATUSES = ('pending', 'leased', 'done', 'failed')
+
+def shard_for(naics_code, shards, shard_by='hash', sectors=None):
+    """Return the shard of a code, by stable hash or by its NAICS sector"""
+    if shard_by == 'sector':
+        # Ranged sectors such as 31-33 share a shard with all their subsectors
+        return sectors.index(naics_sector(naics_code)) % shards
+    return zlib.crc32(naics_code.encode('utf-8')) % shards
+
+def default_worker_id():
+    """Return a worker id unique across nodes sharing a queue"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """SQLite (WAL) queue of industries shared by sharded workers, with leases that expire"""
+    def __init__(self, path="work_queue.sqlite", lease_seconds=600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                naics_code TEXT PRIMARY KEY,
+                industry_name TEXT,
+                position INTEGER NOT NULL,
+                shard INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                finished_at REAL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS queue_status ON queue (status, shard, position)")
+        self.db.commit()
+
+    def enqueue(self, naics_codes, shards=1, shard_by='hash'):
+        """Shard {naics_code: industry_name} into the queue, keeping the state of known codes"""
+        sectors = sorted({naics_sector(naics_code) for naics_code in naics_codes})
+        rows = [
+            (naics_code, industry_name, position, shard_for(naics_code, shards, shard_by, sectors))
+            for position, (naics_code, industry_name) in enumerate(naics_codes.items())
+        ]
+        with self.db:
+            self.db.executemany("""
+                INSERT INTO queue (naics_code, industry_name, position, shard)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (naics_code) DO UPDATE SET
+                    industry_name = excluded.industry_name,
+                    position = excluded.position,
+                    shard = excluded.shard
+            """, rows)
+
+    def reset(self):
+        """Forget all queued work"""
+        with self.db:
+            self.db.execute("DELETE FROM queue")
+
+    def lease(self, worker, count, shard=None, steal=False):
+        """Claim up to count pending codes (own shard first, then any if stealing), requeueing expired leases"""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            expired = self.db.execute(
+                "UPDATE queue SET status = 'pending', worker = NULL WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).rowcount
+            if expired:
+                logger.warning(f"⏰ Requeued {expired} industries whose lease expired")
+
+            rows = []
+            if shard is not None:
+                rows = self.db.execute(
+                    "SELECT naics_code, industry_name FROM queue WHERE status = 'pending' AND shard = ? ORDER BY position LIMIT ?",
+                    (shard, count)
+                ).fetchall()
+            if shard is None or (steal and not rows):
+                rows = self.db.execute(
+                    "SELECT naics_code, industry_name FROM queue WHERE status = 'pending' ORDER BY position LIMIT ?", (count,)
+                ).fetchall()
+
+            self.db.executemany(
+                "UPDATE queue SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE naics_code = ?",
+                [(worker, now + self.lease_seconds, row['naics_code']) for row in rows]
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return {row['naics_code']: row['industry_name'] for row in rows}
+
+    def renew(self, worker, naics_codes):
+        """Extend the leases a worker still holds"""
+        with self.db:
+            self.db.executemany(
+                "UPDATE queue SET lease_expires = ? WHERE naics_code = ? AND worker = ? AND status = 'leased'",
+                [(time.time() + self.lease_seconds, naics_code, worker) for naics_code in naics_codes]
+            )
+
+    def complete(self, worker, naics_code, status='done', error=None):
+        """Finish a leased code; ignored if the lease was lost to another worker"""
+        with self.db:
+            return self.db.execute(
+                "UPDATE queue SET status = ?, last_error = ?, finished_at = ?, lease_expires = NULL WHERE naics_code = ? AND worker = ? AND status = 'leased'",
+                (status, error, time.time(), naics_code, worker)
+            ).rowcount == 1
+
+    def requeue_failed(self):
+        """Put failed codes back in the queue"""
+        with self.db:
+            self.db.execute("UPDATE queue SET status = 'pending', worker = NULL WHERE status = 'failed'")
+
+    def has_open_work(self):
+        """Check if any code is still pending or leased"""
+        return self.db.execute("SELECT 1 FROM queue WHERE status IN ('pending', 'leased') LIMIT 1").fetchone() is not None
+
+    def done_codes(self):
+        """Return [(naics_code, worker)] of finished codes in queue order"""
+        return [
+            (row['naics_code'], row['worker'])
+            for row in self.db.execute("SELECT naics_code, worker FROM queue WHERE status = 'done' ORDER BY position")
+        ]
+
+    def status_counts(self):
+        """Return the number of codes in each state"""
+        counts = {status: 0 for status in QUEUE_STATUSES}
+        for row in self.db.execute("SELECT status, COUNT(*) AS n FROM queue GROUP BY status"):
+            counts[row['status']] = row['n']
+        return counts
+
+    def close(self):
+        """Close the queue database"""
+        self.db.close()